@@ -1,5 +1,6 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from real_estate.routes import real_estate
+from real_estate.metrics import metrics_payload
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
@@ -10,34 +11,108 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
-@app.route('/')
-def home():
-    return jsonify({
-        "status": "ok",
-        "name": "Real Estate Search API",
-        "version": "1.0",
-        "endpoints": {
-            "POST /api/search": {
-                "description": "Busca imóveis com base em texto",
-                "parameters": {
-                    "query": "string - texto para busca",
-                    "limit": "integer (opcional) - número máximo de resultados"
-                },
-                "example": {
-                    "request": {
-                        "query": "apartamento com piscina em Copacabana",
-                        "limit": 5
+# Descrição da API servida na rota raiz (também usada pelo modo ASGI em asgi.py)
+API_INFO = {
+    "status": "ok",
+    "name": "Real Estate Search API",
+    "version": "1.0",
+    "endpoints": {
+        "POST /api/search": {
+            "description": "Busca imóveis com base em texto",
+            "parameters": {
+                "query": "string - texto para busca",
+                "limit": "integer (opcional, padrão 5) - número máximo de resultados, de 1 a SEARCH_MAX_LIMIT (50)",
+                "filters": "object (opcional) - filtros estruturados: bedrooms, area, sale_price, rent_price "
+                           "(número ou {min, max}); city, state, neighborhood, business_type, type "
+                           "(texto ou lista); amenities (lista, todas obrigatórias)",
+                "use_summary_cache": "boolean (opcional, padrão true) - permite reaproveitar resumos em cache",
+                "facets": "boolean ou lista (opcional) - contagens por faceta (city, neighborhood, type, "
+                          "business_type, bedrooms, sale_price, rent_price, amenities) dos candidatos da busca"
+            },
+            "example": {
+                "request": {
+                    "query": "apartamento com piscina em Copacabana",
+                    "limit": 5,
+                    "filters": {
+                        "bedrooms": {"min": 2},
+                        "sale_price": {"max": 800000},
+                        "neighborhood": "Copacabana"
                     }
                 }
+            }
+        },
+        "POST /api/search/stream": {
+            "description": "Busca imóveis em streaming (Server-Sent Events): resultados primeiro, resumo token a token",
+            "parameters": {
+                "query": "string - texto para busca",
+                "limit": "integer (opcional, padrão 5) - número máximo de resultados, de 1 a SEARCH_MAX_LIMIT (50)"
             },
-            "GET /api/property/<id>": {
-                "description": "Retorna detalhes de um imóvel específico",
-                "parameters": {
-                    "id": "string - identificador do imóvel"
+            "events": ["results", "summary", "done", "error"]
+        },
+        "POST /api/search/batch": {
+            "description": "Executa várias buscas em uma requisição (um único embedding em lote, buscas em paralelo)",
+            "parameters": {
+                "queries": "array - textos ou objetos {query, limit, filters, use_summary_cache}",
+                "summary": "boolean (opcional, padrão false) - gera o resumo de cada busca"
+            },
+            "example": {
+                "request": {
+                    "queries": [
+                        "apartamento com piscina em Copacabana",
+                        {"query": "casa com jardim", "limit": 3, "filters": {"city": "Curitiba"}}
+                    ],
+                    "summary": False
                 }
             }
+        },
+        "GET /api/property/<id>": {
+            "description": "Retorna detalhes de um imóvel específico (suporta ETag/If-None-Match e If-Modified-Since)",
+            "parameters": {
+                "id": "string - identificador do imóvel"
+            }
+        },
+        "GET /api/property/<id>/similar": {
+            "description": "Retorna os imóveis semelhantes (vizinhos pré-calculados na ingestão)",
+            "parameters": {
+                "id": "string - identificador do imóvel",
+                "limit": "integer (opcional) - número máximo de semelhantes",
+                "details": "boolean (opcional, padrão false) - inclui os detalhes de cada imóvel"
+            }
+        },
+        "GET /api/properties": {
+            "description": "Retorna vários imóveis em uma única consulta",
+            "parameters": {
+                "ids": "string - identificadores separados por vírgula"
+            }
+        },
+        "GET /api/facets": {
+            "description": "Contagens por faceta do catálogo inteiro (resumo mantido pela ingestão)",
+            "parameters": {
+                "fields": "string (opcional) - facetas separadas por vírgula"
+            }
+        },
+        "GET /api/ready": {
+            "description": "Readiness do worker: abre as conexões com o MongoDB e a OpenAI; 200 quando prontas, 503 caso contrário"
+        },
+        "GET /api/cache/stats": {
+            "description": "Retorna os contadores de hit/miss dos caches do worker"
+        },
+        "GET /metrics": {
+            "description": "Métricas no formato do Prometheus: latência por rota e por estágio da busca "
+                           "(embed, vector_search, summary), resultados, eventos dos caches e tokens da OpenAI. "
+                           "As respostas da busca também trazem o header Server-Timing"
         }
-    }), 200  # Adicionado código de status explícito
+    }
+}
+
+@app.route('/')
+def home():
+    return jsonify(API_INFO), 200  # Adicionado código de status explícito
+
+@app.route('/metrics')
+def metrics():
+    payload, content_type = metrics_payload()
+    return Response(payload, content_type=content_type)
 
 # Registra o blueprint
 app.register_blueprint(real_estate, url_prefix='/api')
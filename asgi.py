@@ -0,0 +1,32 @@
+from quart import Quart, Response, jsonify
+from quart_cors import cors
+from dotenv import load_dotenv
+from app import API_INFO
+from real_estate.metrics import metrics_payload
+from real_estate.async_routes import real_estate_async, warm_up
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+# Modo ASGI: mesmas rotas do app Flask, com handlers assíncronos, AsyncOpenAI e driver assíncrono do MongoDB.
+# Executar com: hypercorn asgi:app --workers 4 --bind 0.0.0.0:$PORT
+app = Quart(__name__)
+app = cors(app, allow_origin="*")
+
+@app.before_serving
+async def startup():
+    # Em segundo plano: a subida não espera pelo MongoDB nem pela OpenAI, e o /api/ready responde 503
+    # até as conexões abrirem
+    app.add_background_task(warm_up)
+
+@app.route('/')
+async def home():
+    return jsonify(API_INFO), 200
+
+@app.route('/metrics')
+async def metrics():
+    payload, content_type = metrics_payload()
+    return Response(payload, content_type=content_type)
+
+# Registra o blueprint
+app.register_blueprint(real_estate_async, url_prefix='/api')
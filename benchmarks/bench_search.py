@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# O config lê estas variáveis na importação; o benchmark não usa os serviços reais
+os.environ.setdefault("MONGODB_DATABASE", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from benchmarks.fakes import FakeDatabase, FakeOpenAI  # noqa: E402
+
+
+STAGES = ("embed", "vector_search", "summary", "serialization")
+
+
+class StageTimer:
+    """
+    Acumula as durações (ms) de cada estágio do caminho de busca, de todas as threads
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, elapsed: float) -> None:
+        with self._lock:
+            self.samples[stage].append(elapsed * 1000)
+
+    def wrap(self, stage: str, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return timed
+
+    def wrap_iter(self, stage: str, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                yield from func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return timed
+
+
+def build_catalog(size: int, embeddings, seed: int = 42,
+                  matrix_path: Optional[str] = None) -> Tuple[List[Dict], np.ndarray]:
+    """
+    Catálogo sintético gerado pelo mock_catalog (reprodutível pela seed); o anúncio é a descrição
+    enriquecida com os campos principais, e o embedding vem do stub determinístico.
+    Os embeddings são gravados bloco a bloco em uma matriz float32 pré-alocada (um memmap em
+    `matrix_path`, se informado) e cada documento guarda só a visão da sua linha, sem listas Python:
+    catálogos de 1M de imóveis cabem na memória.
+    """
+    from mock_catalog import iter_mock_properties
+
+    shape = (size, embeddings.dimensions)
+    matrix = np.memmap(matrix_path, dtype=np.float32, mode="w+", shape=shape) if matrix_path \
+        else np.empty(shape, dtype=np.float32)
+    documents = []
+    for chunk in iter_mock_properties(size, seed):
+        for property in chunk:
+            anuncio = (f"{property['title']}. {property['description']}. {property['location']['city']}. "
+                       f"{', '.join(property['amenities'])}")
+            row = len(documents)
+            matrix[row] = embeddings.embed(anuncio)
+            documents.append({"_id": property["id"], "dados": property, "anuncio": anuncio, "embedding": matrix[row]})
+    return documents, matrix
+
+
+def build_queries(documents: List[Dict], count: int, seed: int) -> List[str]:
+    """
+    Consultas realistas montadas a partir do catálogo (tipo, amenidade, bairro)
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        dados = rng.choice(documents)["dados"]
+        queries.append(f"{dados['type'].lower()} com {rng.choice(dados['amenities']).lower()} "
+                       f"em {dados['location']['neighborhood']}")
+    return queries
+
+
+def install_fakes(args, timer: StageTimer):
+    """
+    Substitui os clientes reais pelos stubs e instrumenta os estágios da rota de busca
+    """
+    import config
+    from real_estate import catalog, routes, search_backends
+
+    fake_openai = FakeOpenAI(args.dimensions, args.embed_latency_ms / 1000, args.summary_tokens,
+                             args.first_token_latency_ms / 1000, args.token_latency_ms / 1000)
+    for module in (config, routes):
+        module.get_openai_client = lambda: fake_openai
+
+    database = FakeDatabase()
+    if args.mongo == "fake":
+        for module in (config, routes, catalog, search_backends):
+            module.get_mongo_collection = database.get_collection
+
+    routes.get_search_embedding = timer.wrap("embed", routes.get_search_embedding)
+    routes.get_summary = timer.wrap("summary", routes.get_summary)
+    routes.generate_summary_stream = timer.wrap_iter("summary", routes.generate_summary_stream)
+    routes.jsonify = timer.wrap("serialization", routes.jsonify)
+
+    backend = search_backends.LocalSearchBackend(args.local_index) if args.backend == "local" \
+        else search_backends.AtlasSearchBackend()
+    backend.search = timer.wrap("vector_search", backend.search)
+    search_backends._backend = backend
+
+    return fake_openai, database
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"count": len(samples), "p50": round(float(p50), 2), "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2)}
+
+
+def run(args) -> Dict:
+    timer = StageTimer()
+    fake_openai, database = install_fakes(args, timer)
+
+    started = time.perf_counter()
+    # Backend local: a matriz do catálogo fica em disco, como o próprio índice
+    matrix_path = args.local_index + ".catalog.f32" if args.backend == "local" else None
+    documents, matrix = build_catalog(args.catalog_size, fake_openai.embeddings, args.seed, matrix_path)
+    if args.mongo == "fake":
+        database.get_collection("properties").load(documents, matrix)
+    else:
+        from pymongo import ReplaceOne
+        from config import get_mongo_collection
+        collection = get_mongo_collection("properties")
+        for i in range(0, len(documents), 1000):
+            collection.bulk_write([ReplaceOne({"_id": d["_id"]}, {**d, "embedding": d["embedding"].tolist()}, upsert=True)
+                                   for d in documents[i:i + 1000]], ordered=False)
+    if args.backend == "local":
+        from real_estate.search_backends import build_local_index
+        build_local_index(args.local_index)
+    print(f"Catálogo de {len(documents)} imóveis preparado em {time.perf_counter() - started:.1f}s")
+
+    queries = build_queries(documents, args.distinct_queries, args.seed)
+    rng = random.Random(args.seed)
+    # Distribuição de Zipf: poucas consultas concentram a maior parte do tráfego, como em produção
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+    workload = rng.choices(queries, weights=weights, k=args.requests)
+
+    from app import app
+    endpoint = "/api/search/stream" if args.endpoint == "stream" else "/api/search"
+    local = threading.local()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def request(query: str) -> None:
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        body = {"query": query, "limit": args.limit, "use_summary_cache": not args.no_cache}
+        request_started = time.perf_counter()
+        response = local.client.post(endpoint, json=body)
+        response.get_data()
+        elapsed = (time.perf_counter() - request_started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    if args.no_cache:
+        from real_estate import routes
+        routes.embedding_cache.local.max_size = 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(request, workload))
+    wall = time.perf_counter() - started
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "stages": {stage: percentiles(timer.samples.get(stage, [])) for stage in STAGES},
+        "end_to_end": percentiles(latencies),
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "errors": len(errors),
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{'estágio':<15}{'n':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in [*report["stages"].items(), ("end_to_end", report["end_to_end"])]:
+        print(f"{stage:<15}{stats['count']:>8}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}")
+    print(f"\nVazão: {report['throughput_rps']} req/s, erros: {report['errors']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta da rota de busca com stubs locais")
+    parser.add_argument("--catalog-size", type=int, default=1000, help="ex.: 1000, 100000, 1000000")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct-queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--endpoint", choices=["search", "stream"], default="search")
+    parser.add_argument("--backend", choices=["atlas", "local"], default="atlas",
+                        help="atlas: $vectorSearch (força bruta no FakeCollection); local: índice NumPy mapeado")
+    parser.add_argument("--mongo", choices=["fake", "real"], default="fake",
+                        help="real: usa MONGODB_CONNECTION_STRING (ex.: mongod local, com --backend local)")
+    parser.add_argument("--local-index", default=os.path.join(tempfile.gettempdir(), "bench_vector_index"))
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--embed-latency-ms", type=float, default=40)
+    parser.add_argument("--first-token-latency-ms", type=float, default=300)
+    parser.add_argument("--token-latency-ms", type=float, default=10)
+    parser.add_argument("--summary-tokens", type=int, default=60)
+    parser.add_argument("--no-cache", action="store_true", help="desativa os caches de embedding e de resumo")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="grava o relatório em JSON neste arquivo (para comparar execuções)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
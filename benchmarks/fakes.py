@@ -0,0 +1,408 @@
+import hashlib
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson.binary import Binary
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+
+# Substitutos locais e determinísticos da OpenAI e do MongoDB usados pelo benchmark
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _sleep(latency: float, timeout: Optional[float] = None) -> None:
+    # Como o cliente real: quando a latência passa do timeout da chamada, espera o timeout e falha
+    if timeout is not None and latency > timeout:
+        time.sleep(timeout)
+        raise TimeoutError("Request timed out.")
+    if latency:
+        time.sleep(latency)
+
+
+class FakeEmbeddings:
+    """
+    embeddings.create determinístico: soma normalizada de vetores aleatórios fixos por palavra,
+    para que textos com palavras em comum tenham embeddings próximos (como no modelo real)
+    """
+
+    def __init__(self, dimensions: int, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self._words: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        vector = self._words.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+            with self._lock:
+                self._words[word] = vector
+        return vector
+
+    def embed(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.casefold()) or [""]
+        vector = np.sum([self._word_vector(word) for word in words], axis=0)
+        return vector / np.linalg.norm(vector)
+
+    def create(self, input, model: str = "", encoding_format: str = "float", dimensions: Optional[int] = None,
+               timeout: Optional[float] = None):
+        _sleep(self.latency, timeout)
+        texts = [input] if isinstance(input, str) else list(input)
+        data = [SimpleNamespace(index=i, embedding=self.embed(text).tolist()) for i, text in enumerate(texts)]
+        usage = SimpleNamespace(prompt_tokens=sum(len(text.split()) for text in texts), total_tokens=0)
+        return SimpleNamespace(data=data, usage=usage)
+
+
+class FakeChatCompletions:
+    """
+    chat.completions.create com latência até o primeiro token e por token; suporta stream=True
+    """
+
+    def __init__(self, tokens: int = 60, first_token_latency: float = 0.0, token_latency: float = 0.0):
+        self.tokens = tokens
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+
+    def _words(self) -> List[str]:
+        return [f"palavra{i} " for i in range(self.tokens)]
+
+    def _stream(self, timeout: Optional[float] = None):
+        _sleep(self.first_token_latency, timeout)
+        for word in self._words():
+            _sleep(self.token_latency, timeout)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))], usage=None)
+
+    def create(self, model: str = "", messages=None, stream: bool = False, timeout: Optional[float] = None, **kwargs):
+        if stream:
+            return self._stream(timeout)
+        _sleep(self.first_token_latency + self.token_latency * self.tokens, timeout)
+        message = SimpleNamespace(content="".join(self._words()))
+        usage = SimpleNamespace(prompt_tokens=0, completion_tokens=self.tokens, total_tokens=self.tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeOpenAI:
+    """
+    Cliente com a mesma interface usada pela API (embeddings, chat.completions, models)
+    """
+
+    def __init__(self, dimensions: int, embed_latency: float = 0.0, tokens: int = 60,
+                 first_token_latency: float = 0.0, token_latency: float = 0.0):
+        self.embeddings = FakeEmbeddings(dimensions, embed_latency)
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(tokens, first_token_latency, token_latency))
+        self.models = SimpleNamespace(retrieve=lambda model: SimpleNamespace(id=model))
+
+    def with_options(self, **kwargs):
+        return self
+
+
+def _get_path(document: Dict, path: str):
+    value = document
+    for part in path.split("."):
+        if isinstance(value, list):
+            # Caminho dentro de um array de subdocumentos (ex.: similar.id)
+            value = [item[part] for item in value if isinstance(item, dict) and part in item]
+        elif not isinstance(value, dict) or part not in value:
+            return None
+        else:
+            value = value[part]
+    return value
+
+
+def _match_value(value, condition) -> bool:
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        condition = {"$eq": condition}
+    for operator, operand in condition.items():
+        values = value if isinstance(value, list) else [value]
+        if operator == "$eq":
+            # Como no MongoDB, um array casa com o array inteiro ou com qualquer um dos elementos
+            ok = value == operand or any(item == operand for item in values)
+        elif operator == "$ne":
+            ok = all(item != operand for item in values)
+        elif operator == "$in":
+            ok = any(item in operand for item in values)
+        elif operator == "$nin":
+            ok = all(item not in operand for item in values)
+        elif operator == "$exists":
+            ok = (value is not None) == bool(operand)
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            compare = {"$gt": lambda a: a > operand, "$gte": lambda a: a >= operand,
+                       "$lt": lambda a: a < operand, "$lte": lambda a: a <= operand}[operator]
+            ok = any(item is not None and compare(item) for item in values)
+        else:
+            raise NotImplementedError(f"Operador não suportado no FakeCollection: {operator}")
+        if not ok:
+            return False
+    return True
+
+
+def matches(document: Dict, query: Optional[Dict]) -> bool:
+    """
+    Subconjunto do MQL usado pela API: $and, $or, $eq, $ne, $in, $nin, $exists, $gt/$gte/$lt/$lte e caminhos com ponto
+    """
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, sub) for sub in condition):
+                return False
+        elif not _match_value(_get_path(document, key), condition):
+            return False
+    return True
+
+
+def _project(document: Dict, projection: Optional[Dict]) -> Dict:
+    if not projection:
+        return dict(document)
+    included = [field for field, flag in projection.items() if flag and not isinstance(flag, dict)]
+    if included:
+        result = {"_id": document["_id"]}
+        result.update({field: document[field] for field in included if field in document})
+        return result
+    return {field: value for field, value in document.items() if projection.get(field, 1)}
+
+
+def _as_vector(value) -> np.ndarray:
+    # BinData vectors (float32 ou int8) entram no produto escalar com os valores brutos, sem
+    # desquantizar: como no Atlas, o score de vetores int8 não fica na escala dos vetores float
+    if isinstance(value, Binary):
+        value = value.as_vector().data
+    return np.asarray(value, dtype=np.float32)
+
+
+def _is_operator(condition) -> bool:
+    return isinstance(condition, dict) and any(key.startswith("$") for key in condition)
+
+
+def _apply_update(document: Dict, update: Dict) -> None:
+    document.update(update.get("$set", {}))
+    for field in update.get("$unset", {}):
+        document.pop(field, None)
+    for field, delta in update.get("$inc", {}).items():
+        document[field] = document.get(field, 0) + delta
+
+
+class FakeCursor(list):
+    def sort(self, key, direction: int = 1):
+        super().sort(key=lambda document: document.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, count: int):
+        return FakeCursor(self[:count]) if count else self
+
+
+class FakeCollection:
+    """
+    Coleção em memória com busca vetorial por força bruta ($vectorSearch com dotProduct)
+    """
+
+    def __init__(self, name: str = "", database: Optional["FakeDatabase"] = None):
+        self.name = name
+        self.database = database
+        self.documents: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._ids: List[str] = []
+        self._counter = 0
+
+    def load(self, documents: Iterable[Dict], matrix: Optional[np.ndarray] = None) -> None:
+        """
+        Carrega documentos prontos. Com `matrix` (uma linha por documento, na mesma ordem, e o
+        `embedding` de cada documento sendo a própria linha), a busca usa a matriz sem copiá-la.
+        """
+        with self._lock:
+            empty = not self.documents
+            documents = list(documents)
+            for document in documents:
+                self.documents[document["_id"]] = document
+            self._matrix = None
+            if matrix is not None and empty:
+                self._ids = [document["_id"] for document in documents]
+                self._matrix = matrix
+
+    def _index(self):
+        with self._lock:
+            if self._matrix is None:
+                self._ids = [key for key, document in self.documents.items() if "embedding" in document]
+                self._matrix = np.asarray([_as_vector(self.documents[key]["embedding"]) for key in self._ids],
+                                          dtype=np.float32)
+            return self._ids, self._matrix
+
+    def aggregate(self, pipeline: List[Dict]):
+        stage = pipeline[0]["$vectorSearch"]
+        ids, matrix = self._index()
+        scores = matrix @ _as_vector(stage["queryVector"])
+        if stage.get("filter"):
+            mask = np.fromiter((matches(self.documents[key], stage["filter"]) for key in ids), dtype=bool, count=len(ids))
+            scores = np.where(mask, scores, -np.inf)
+        k = min(stage["limit"], len(ids))
+        top = np.argpartition(-scores, k - 1)[:k] if k else []
+        top = sorted(top, key=lambda i: -scores[i])
+        projection = pipeline[1]["$project"] if len(pipeline) > 1 else {}
+        results = []
+        for i in top:
+            if not np.isfinite(scores[i]):
+                continue
+            result = _project(self.documents[ids[i]], {k: v for k, v in projection.items() if k != "score"})
+            result["score"] = float((1 + scores[i]) / 2)
+            results.append(result)
+        return iter(results)
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None, **kwargs) -> FakeCursor:
+        if query and set(query) == {"_id"} and isinstance(query["_id"], dict) and "$in" in query["_id"]:
+            candidates = (self.documents[key] for key in query["_id"]["$in"] if key in self.documents)
+        else:
+            candidates = (document for document in list(self.documents.values()) if matches(document, query))
+        return FakeCursor(_project(document, projection) for document in candidates)
+
+    def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None, sort=None, **kwargs):
+        if query and set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            document = self.documents.get(query["_id"])
+            return _project(document, projection) if document else None
+        cursor = self.find(query, projection)
+        if sort:
+            cursor.sort(*sort[0])
+        return cursor[0] if cursor else None
+
+    def distinct(self, field: str, query: Optional[Dict] = None) -> List:
+        return list({_get_path(document, field) for document in self.documents.values() if matches(document, query)})
+
+    def count_documents(self, query: Optional[Dict] = None, **kwargs) -> int:
+        return sum(1 for document in self.documents.values() if matches(document, query))
+
+    def insert_one(self, document: Dict):
+        with self._lock:
+            self._counter += 1
+            document.setdefault("_id", self._counter)
+            self.documents[document["_id"]] = document
+            self._matrix = None
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    def insert_many(self, documents: Iterable[Dict], ordered: bool = True):
+        ids = [self.insert_one(document).inserted_id for document in documents]
+        return SimpleNamespace(inserted_ids=ids)
+
+    def _update(self, query: Dict, update: Dict, upsert: bool) -> Tuple[Optional[Dict], Optional[Dict], bool]:
+        """
+        Aplica o update ao primeiro documento que casa com o filtro (ou cria um, com upsert).
+        Retorna (antes, depois, criado); chamado com o lock.
+        """
+        if "_id" in query and not _is_operator(query["_id"]):
+            document = self.documents.get(query["_id"])
+            document = document if document is not None and matches(document, query) else None
+        else:
+            document = next((item for item in self.documents.values() if matches(item, query)), None)
+        if document is None:
+            if not upsert:
+                return None, None, False
+            # Como no MongoDB: o documento novo leva os campos de igualdade do filtro
+            document = {key: value for key, value in query.items()
+                        if not key.startswith("$") and not _is_operator(value)}
+            if "_id" not in document:
+                self._counter += 1
+                document["_id"] = self._counter
+            if document["_id"] in self.documents:
+                raise DuplicateKeyError(f"E11000 duplicate key error: _id {document['_id']!r}", 11000)
+            document.update(update.get("$setOnInsert", {}))
+            _apply_update(document, update)
+            self.documents[document["_id"]] = document
+            self._matrix = None
+            return None, document, True
+        before = dict(document)
+        _apply_update(document, update)
+        self._matrix = None
+        return before, document, False
+
+    def update_one(self, query: Dict, update: Dict, upsert: bool = False):
+        with self._lock:
+            before, after, created = self._update(query, update, upsert)
+        return SimpleNamespace(matched_count=int(before is not None), modified_count=int(before is not None),
+                               upserted_id=after["_id"] if created else None)
+
+    def find_one_and_update(self, query: Dict, update: Dict, projection: Optional[Dict] = None,
+                            upsert: bool = False, return_document: bool = ReturnDocument.BEFORE, **kwargs):
+        with self._lock:
+            before, after, _ = self._update(query, update, upsert)
+            document = after if return_document == ReturnDocument.AFTER else before
+            return _project(document, projection) if document is not None else None
+
+    def bulk_write(self, operations, ordered: bool = True):
+        """
+        Apenas UpdateOne; erros de chave duplicada (upsert sobre um _id existente que não casou
+        com o filtro) são reportados em um BulkWriteError, como no MongoDB
+        """
+        result = {"nMatched": 0, "nModified": 0, "nUpserted": 0, "upserted": [], "writeErrors": []}
+        for index, operation in enumerate(operations):
+            try:
+                with self._lock:
+                    before, after, created = self._update(operation._filter, operation._doc, bool(operation._upsert))
+            except DuplicateKeyError as e:
+                result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e), "op": operation._doc})
+                if ordered:
+                    break
+                continue
+            if created:
+                result["nUpserted"] += 1
+                result["upserted"].append({"index": index, "_id": after["_id"]})
+            elif before is not None:
+                result["nMatched"] += 1
+                result["nModified"] += 1
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return SimpleNamespace(
+            matched_count=result["nMatched"], modified_count=result["nModified"], upserted_count=result["nUpserted"],
+            upserted_ids={item["index"]: item["_id"] for item in result["upserted"]}, bulk_api_result=result
+        )
+
+    def create_index(self, *args, **kwargs) -> str:
+        return "fake_index"
+
+    def delete_one(self, query: Dict):
+        with self._lock:
+            self.documents.pop(query["_id"], None)
+            self._matrix = None
+
+    def delete_many(self, query: Optional[Dict] = None):
+        with self._lock:
+            removed = [key for key, document in self.documents.items() if matches(document, query)]
+            for key in removed:
+                del self.documents[key]
+            self._matrix = None
+        return SimpleNamespace(deleted_count=len(removed))
+
+    def drop(self) -> None:
+        with self._lock:
+            self.documents = {}
+            self._matrix = None
+
+    def rename(self, new_name: str, dropTarget: bool = False) -> None:
+        self.database._rename(self, new_name, dropTarget)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections: Dict[str, FakeCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_collection(self, name: str) -> FakeCollection:
+        with self._lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(name, self)
+            return self.collections[name]
+
+    def _rename(self, collection: FakeCollection, new_name: str, drop_target: bool) -> None:
+        with self._lock:
+            if new_name in self.collections and self.collections[new_name].documents and not drop_target:
+                raise RuntimeError(f"target namespace exists: {new_name}")
+            self.collections.pop(collection.name, None)
+            collection.name = new_name
+            self.collections[new_name] = collection
@@ -1,7 +1,6 @@
 import os
-from pymongo import MongoClient
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI
 
 
 load_dotenv()
@@ -10,16 +9,217 @@ load_dotenv()
 MONGODB_CONNECTION_STRING = os.getenv("MONGODB_CONNECTION_STRING")
 MONGODB_DATABASE = os.getenv("MONGODB_DATABASE")
 
-# Conexão com o MongoDB
-mongo_client = MongoClient(MONGODB_CONNECTION_STRING)
-db = mongo_client[MONGODB_DATABASE]
+# Pool de conexões do MongoDB (por processo)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+
+# Configuração da API do OpenAI
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Timeout (s) das chamadas e conexões HTTP mantidas abertas (keep-alive) por processo
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 30))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+OPENAI_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_KEEPALIVE_CONNECTIONS", 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 60))
+# Espera máxima (s) do aquecimento das conexões de cada worker (ver /api/ready)
+WARM_UP_TIMEOUT = float(os.getenv("WARM_UP_TIMEOUT", 5))
+
+# Busca: orçamento de tempo por requisição (s), timeouts das chamadas de embedding e de resumo (limitados
+# ao tempo restante), chamadas simultâneas por worker a cada uma e espera máxima por uma vaga (s)
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", 10))
+SEARCH_EMBED_TIMEOUT = float(os.getenv("SEARCH_EMBED_TIMEOUT", 3))
+SEARCH_SUMMARY_TIMEOUT = float(os.getenv("SEARCH_SUMMARY_TIMEOUT", 8))
+SEARCH_EMBED_MAX_CONCURRENCY = int(os.getenv("SEARCH_EMBED_MAX_CONCURRENCY", 32))
+SEARCH_SUMMARY_MAX_CONCURRENCY = int(os.getenv("SEARCH_SUMMARY_MAX_CONCURRENCY", 16))
+OPENAI_QUEUE_TIMEOUT = float(os.getenv("OPENAI_QUEUE_TIMEOUT", 0.5))
+# Circuit breaker do resumo: falhas seguidas para abrir e tempo (s) até a chamada de teste
+SUMMARY_BREAKER_FAILURES = int(os.getenv("SUMMARY_BREAKER_FAILURES", 5))
+SUMMARY_BREAKER_RESET = float(os.getenv("SUMMARY_BREAKER_RESET", 30))
+
+
+# Clientes criados no primeiro uso e por processo: nada conecta na importação, e um worker
+# criado por fork (gunicorn --preload) nunca reaproveita os sockets e threads do processo pai
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+
+def _get_client(name, factory):
+    global _clients, _clients_pid, _clients_lock
+    if _clients_pid != os.getpid():
+        # Processo novo: descarta os clientes (e o lock) herdados do pai
+        _clients, _clients_pid, _clients_lock = {}, os.getpid(), threading.Lock()
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def _mongo_options():
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
+
+
+def _openai_limits(http_client_class):
+    # Limits da biblioteca HTTP que o SDK da OpenAI usa (httpx ou, nas versões novas, httpx2),
+    # obtida da classe base do cliente padrão do SDK
+    import importlib
+    http = importlib.import_module(http_client_class.__mro__[1].__module__.split(".")[0])
+    return http.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+
+def _create_mongo_client():
+    from pymongo import MongoClient
+    return MongoClient(MONGODB_CONNECTION_STRING, **_mongo_options())
+
+
+def _create_openai_client():
+    from openai import OpenAI, DefaultHttpxClient
+    return OpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=OPENAI_TIMEOUT,
+        http_client=DefaultHttpxClient(limits=_openai_limits(DefaultHttpxClient), timeout=OPENAI_TIMEOUT)
+    )
+
+
+def get_mongo_client():
+    return _get_client("mongo", _create_mongo_client)
 
 
 # Função para obter uma coleção do MongoDB
 def get_mongo_collection(name):
-    collection = db[name]
+    collection = get_mongo_client()[MONGODB_DATABASE][name]
     return collection
 
-# Configuração da API do OpenAI
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+
+def get_openai_client():
+    return _get_client("openai", _create_openai_client)
+
+
+# Clientes assíncronos (modo ASGI), criados no primeiro uso dentro do event loop do worker
+def _create_async_mongo_client():
+    from pymongo import AsyncMongoClient
+    return AsyncMongoClient(MONGODB_CONNECTION_STRING, **_mongo_options())
+
+
+def _create_async_openai_client():
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=OPENAI_TIMEOUT,
+        http_client=DefaultAsyncHttpxClient(limits=_openai_limits(DefaultAsyncHttpxClient), timeout=OPENAI_TIMEOUT)
+    )
+
+
+def get_async_mongo_collection(name):
+    return _get_client("async_mongo", _create_async_mongo_client)[MONGODB_DATABASE][name]
+
+
+def get_async_openai_client():
+    return _get_client("async_openai", _create_async_openai_client)
+
+
+def __getattr__(name):
+    # Compatibilidade com `from config import openai_client, mongo_client, db`
+    if name == "openai_client":
+        return get_openai_client()
+    if name == "mongo_client":
+        return get_mongo_client()
+    if name == "db":
+        return get_mongo_client()[MONGODB_DATABASE]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Perfil de embedding usado na busca, na ingestão e no índice (ver real_estate/embeddings.py)
+# EMBEDDING_DIMENSIONS: dimensões pedidas à OpenAI (ex.: 512 ou 256); padrão = dimensão nativa do modelo
+# EMBEDDING_STORAGE: "double" (array BSON), "float32" ou "int8" (BinData vector)
+# EMBEDDING_RESCORE: com int8, guarda uma cópia float32 e reordena os candidatos em precisão total
+# (sem ela, o score dos candidatos int8 é recalculado com o próprio vetor desquantizado)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", 0)) or None
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "double")
+EMBEDDING_INT8_RANGE = float(os.getenv("EMBEDDING_INT8_RANGE", 0)) or None
+EMBEDDING_RESCORE = os.getenv("EMBEDDING_RESCORE", "false").lower() in ("1", "true", "yes")
+EMBEDDING_RESCORE_FACTOR = int(os.getenv("EMBEDDING_RESCORE_FACTOR", 4))
+
+# Cache de embeddings de busca: LRU em memória + camada compartilhada opcional
+# EMBEDDING_CACHE_SHARED: "" (desativada), "mongo" ou "sqlite:/caminho/arquivo.db"
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", 7 * 24 * 3600))
+EMBEDDING_CACHE_SHARED = os.getenv("EMBEDDING_CACHE_SHARED", "")
+
+# Backend de busca vetorial: "atlas" ($vectorSearch) ou "local" (matriz NumPy mapeada em arquivo)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "atlas")
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "data/vector_index")
+
+# Coalescência de buscas idênticas simultâneas (mesmo texto normalizado, limite e filtros):
+# "off", "local" (por worker) ou "mongo" (também entre workers, via coleção search_flights)
+SEARCH_COALESCING = os.getenv("SEARCH_COALESCING", "local")
+# Tempo máximo (s) que um worker aguarda o resultado de outro antes de executar a busca por conta própria
+SEARCH_COALESCING_TIMEOUT = float(os.getenv("SEARCH_COALESCING_TIMEOUT", 30))
+# Tempo (s) em que o resultado fica disponível para as buscas que chegaram enquanto ele era gravado
+SEARCH_COALESCING_GRACE = float(os.getenv("SEARCH_COALESCING_GRACE", 1))
+
+# Cache de resumos gerados pelo LLM
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", 2000))
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", 6 * 3600))
+
+# Cache semântico da busca: reaproveita resultados e resumo de consultas recentes com embedding
+# quase idêntico (similaridade de cosseno >= SEMANTIC_CACHE_THRESHOLD); SEMANTIC_CACHE_SIZE=0 desativa
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 2000))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", 600))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+
+# Intervalo (s) com que cada worker verifica alterações do catálogo feitas pela ingestão
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", 5))
+
+# Ingestão: tamanho do lote, chamadas simultâneas à OpenAI e tentativas em rate limit
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 50))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 8))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 5))
+INGEST_CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH", ".ingest_checkpoint.json")
+
+# Geração dos anúncios: "llm" (uma chamada por imóvel), "batch" (LISTING_BATCH_SIZE imóveis por chamada
+# do LISTING_BATCH_MODEL) ou "template" (modelos locais, sem OpenAI). Imóveis premium (área > 200 m² ou
+# mais de duas suítes) usam LISTING_PREMIUM_STRATEGY, que por padrão é a mesma estratégia dos demais
+LISTING_STRATEGY = os.getenv("LISTING_STRATEGY", "llm")
+LISTING_PREMIUM_STRATEGY = os.getenv("LISTING_PREMIUM_STRATEGY", LISTING_STRATEGY)
+LISTING_BATCH_MODEL = os.getenv("LISTING_BATCH_MODEL", "gpt-4o-mini")
+LISTING_BATCH_SIZE = int(os.getenv("LISTING_BATCH_SIZE", 20))
+
+# Importação de catálogos externos (import_catalog.py): documentos por bulk_write e lotes gravados em paralelo
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+IMPORT_WRITERS = int(os.getenv("IMPORT_WRITERS", 4))
+
+# Busca: máximo de resultados por busca (`limit`)
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", 50))
+
+# Busca em lote: máximo de buscas por requisição e buscas simultâneas por worker
+BATCH_SEARCH_MAX_QUERIES = int(os.getenv("BATCH_SEARCH_MAX_QUERIES", 50))
+BATCH_SEARCH_WORKERS = int(os.getenv("BATCH_SEARCH_WORKERS", 8))
+
+# Imóveis semelhantes (GET /api/property/<id>/similar): vizinhos pré-calculados por imóvel na ingestão
+# e tamanho dos blocos da multiplicação de matrizes (memória ~ SIMILAR_BLOCK_SIZE² floats)
+SIMILAR_K = int(os.getenv("SIMILAR_K", 10))
+SIMILAR_BLOCK_SIZE = int(os.getenv("SIMILAR_BLOCK_SIZE", 2048))
+
+# Facetas: validade (s) do resumo do catálogo em memória (GET /api/facets) e candidatos da busca vetorial
+# usados nas contagens do bloco `facets` da busca
+FACETS_CACHE_TTL = int(os.getenv("FACETS_CACHE_TTL", 60))
+FACETS_CANDIDATES = int(os.getenv("FACETS_CANDIDATES", 200))
+
+# Cache dos detalhes de imóveis (GET /api/property/<id> e /api/properties)
+PROPERTY_CACHE_SIZE = int(os.getenv("PROPERTY_CACHE_SIZE", 20000))
+PROPERTY_CACHE_TTL = int(os.getenv("PROPERTY_CACHE_TTL", 3600))
+PROPERTIES_MAX_IDS = int(os.getenv("PROPERTIES_MAX_IDS", 100))
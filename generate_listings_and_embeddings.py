@@ -1,27 +1,111 @@
-from openai import OpenAI
-from config import get_mongo_collection
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    get_mongo_collection, get_openai_client, SEARCH_BACKEND, EMBEDDING_MODEL,
+    INGEST_BATCH_SIZE, INGEST_WORKERS, OPENAI_MAX_RETRIES, INGEST_CHECKPOINT_PATH,
+    LISTING_STRATEGY, LISTING_PREMIUM_STRATEGY, LISTING_BATCH_MODEL, LISTING_BATCH_SIZE
+)
+from real_estate.catalog import record_catalog_change
+from real_estate.embeddings import embedding_profile, stored_profile_name
+from real_estate.facets import write_with_facets
+import argparse
+import hashlib
 import json
 import os
-from typing import List, Dict
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Tuple
 import random
 
-def create_listing(property: Dict) -> str:
+# O SDK da OpenAI (~0,8 s para importar) só é carregado pelas funções que chamam a API: mock_catalog,
+# import_catalog e a estratégia template importam este módulo sem precisar dele
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Limites de textos e de tokens (estimados, com folga sobre os 300 mil da API) por chamada de embeddings
+EMBEDDING_INPUT_LIMIT = 2048
+EMBEDDING_TOKEN_LIMIT = 250000
+
+# Modelo usado para gerar os anúncios (gravado em cada documento junto do hash do conteúdo)
+LISTING_MODEL = "gpt-4"
+
+# Nome gravado em listing_model para os anúncios gerados pelos modelos locais (mudar ao alterar os modelos)
+TEMPLATE_LISTING_MODEL = "template-v1"
+LISTING_STRATEGIES = ("llm", "batch", "template")
+
+
+def retryable_errors() -> Tuple[type, ...]:
+    """
+    Erros transitórios da OpenAI que justificam nova tentativa
+    """
+    from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+    return (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def get_ingest_client() -> "OpenAI":
+    """
+    Cliente da OpenAI da ingestão, sem as novas tentativas automáticas do SDK: quem repete é o with_retry
+    """
+    return get_openai_client().with_options(max_retries=0)
+
+def with_retry(func: Callable, *args, max_retries: int = OPENAI_MAX_RETRIES, **kwargs):
+    """
+    Executa a chamada repetindo com backoff exponencial (com jitter) em erros de rate limit e de rede.
+    Use com um cliente de get_ingest_client, para que as tentativas do SDK não se multipliquem com estas.
+    """
+    retryable = retryable_errors()
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except retryable as e:
+            if attempt == max_retries:
+                raise
+            delay = min(60, 2 ** attempt) * (0.5 + random.random())
+            print(f"    ! {type(e).__name__}, nova tentativa em {delay:.1f}s")
+            time.sleep(delay)
+
+def listing_inputs(property: Dict) -> Dict:
+    """
+    Campos do imóvel que entram no anúncio (e portanto no texto do embedding) em qualquer das estratégias;
+    create_listing, create_listings_batch e render_listing leem daqui, e o content_hash é calculado sobre eles
+    """
+    features, location, prices = property['features'], property['location'], property['prices']
+    return {
+        'type': property['type'],
+        'area': features['area'],
+        'bedrooms': features['bedrooms'],
+        'suites': features.get('suites', 0),
+        'bathrooms': features.get('bathrooms', 0),
+        'parking_spots': features.get('parking_spots', 0),
+        'neighborhood': location['neighborhood'],
+        'city': location['city'],
+        'sale_price': prices.get('sale_price'),
+        'rent_price': prices.get('rent_price'),
+        'condo_fee': prices.get('condo_fee'),
+        'property_tax': prices.get('property_tax'),
+        'amenities': property['amenities'][:5]
+    }
+
+def _main_price(inputs: Dict):
+    return inputs['sale_price'] if inputs['sale_price'] is not None else inputs['rent_price']
+
+def create_listing(property: Dict, client: Optional["OpenAI"] = None) -> str:
     """
     Cria um anúncio criativo e envolvente para o imóvel usando a API da OpenAI
     """
-    client = OpenAI()
+    client = client or get_ingest_client()
+    inputs = listing_inputs(property)
     prompt = f"""
     Crie um anúncio imobiliário criativo e envolvente para o seguinte imóvel:
-    - Tipo: {property['type']}
-    - Área: {property['features']['area']}m²
-    - Quartos: {property['features']['bedrooms']}
-    - Localização: {property['location']['neighborhood']}, {property['location']['city']}
-    - Preço: R$ {property['prices']['sale_price'] if 'sale_price' in property['prices'] else property['prices']['rent_price']}
-    - Amenidades principais: {', '.join(property['amenities'][:3])}
+    - Tipo: {inputs['type']}
+    - Área: {inputs['area']}m²
+    - Quartos: {inputs['bedrooms']}
+    - Localização: {inputs['neighborhood']}, {inputs['city']}
+    - Preço: R$ {_main_price(inputs)}
+    - Amenidades principais: {', '.join(inputs['amenities'][:3])}
     """
     
-    response = client.chat.completions.create(
-        model="gpt-4",
+    response = with_retry(
+        client.chat.completions.create,
+        model=LISTING_MODEL,
         messages=[
             {"role": "system", "content": "Você é um especialista em marketing imobiliário."},
             {"role": "user", "content": prompt}
@@ -32,158 +116,657 @@ def create_listing(property: Dict) -> str:
     
     return response.choices[0].message.content.strip()
 
-def get_embedding(client: OpenAI, text: str) -> List[float]:
+def _format_brl(value) -> str:
+    return f"R$ {value:,.0f}".replace(",", ".")
+
+def _plural(count: int, singular: str, plural: str) -> str:
+    return f"{count} {singular if count == 1 else plural}"
+
+def _join(items: List[str]) -> str:
+    return items[0] if len(items) == 1 else f"{', '.join(items[:-1])} e {items[-1]}"
+
+def render_listing(property: Dict) -> str:
+    """
+    Gera o anúncio localmente a partir dos modelos de texto, sem chamar a OpenAI: abertura conforme o
+    porte do imóvel, cômodos, vagas, amenidades e valores. A escolha dos modelos é sorteada pelo id,
+    então o mesmo imóvel sempre recebe o mesmo texto enquanto seus dados não mudarem.
+    """
+    rng = random.Random(property['id'])
+    inputs = listing_inputs(property)
+    suites = inputs['suites']
+    if is_premium(inputs['area'], suites):
+        openings = PREMIUM_LISTING_OPENINGS
+    elif is_compact(inputs['area']):
+        openings = COMPACT_LISTING_OPENINGS
+    else:
+        openings = LISTING_OPENINGS
+    fields = {
+        'type': inputs['type'].lower(), 'area': inputs['area'],
+        'neighborhood': inputs['neighborhood'], 'city': inputs['city']
+    }
+    opening = rng.choice(openings).format(**fields)
+    sentences = [opening[0].upper() + opening[1:]]
+
+    rooms = [_plural(inputs['bedrooms'], "quarto", "quartos")]
+    if suites:
+        rooms[0] += f", sendo {_plural(suites, 'suíte', 'suítes')}"
+    if inputs['bathrooms']:
+        rooms.append(_plural(inputs['bathrooms'], "banheiro", "banheiros"))
+    if inputs['parking_spots']:
+        rooms.append(_plural(inputs['parking_spots'], "vaga de garagem", "vagas de garagem"))
+    sentences.append(f"O imóvel tem {_join(rooms)}.")
+
+    if inputs['amenities']:
+        amenities = [amenity.lower() for amenity in inputs['amenities']]
+        sentences.append(rng.choice(LISTING_AMENITY_SENTENCES).format(amenities=_join(amenities)))
+
+    values = []
+    if inputs['sale_price'] is not None:
+        values.append(f"venda por {_format_brl(inputs['sale_price'])}")
+    if inputs['rent_price'] is not None:
+        values.append(f"aluguel de {_format_brl(inputs['rent_price'])}/mês")
+    costs = []
+    if inputs['condo_fee']:
+        costs.append(f"condomínio de {_format_brl(inputs['condo_fee'])}")
+    if inputs['property_tax']:
+        costs.append(f"IPTU de {_format_brl(inputs['property_tax'])}")
+    if values:
+        sentences.append(f"Disponível para {_join(values)}" + (f", com {_join(costs)}." if costs else "."))
+
+    sentences.append(rng.choice(LISTING_CLOSINGS))
+    return " ".join(sentences)
+
+def create_listings_batch(properties: List[Dict], client: Optional["OpenAI"] = None) -> List[Optional[str]]:
     """
-    Gera embedding usando o modelo text-embedding-3-small da OpenAI
+    Cria os anúncios de vários imóveis em uma única chamada do LISTING_BATCH_MODEL, com resposta em JSON.
+    Imóveis que faltarem na resposta ficam com None.
     """
-    response = client.embeddings.create(
-        input=text,
-        model="text-embedding-3-small",
-        encoding_format="float"
+    client = client or get_ingest_client()
+    items = []
+    for property in properties:
+        inputs = listing_inputs(property)
+        items.append({
+            "id": property['id'],
+            "tipo": inputs['type'],
+            "area_m2": inputs['area'],
+            "quartos": inputs['bedrooms'],
+            "suites": inputs['suites'],
+            "vagas": inputs['parking_spots'],
+            "localizacao": f"{inputs['neighborhood']}, {inputs['city']}",
+            "preco": _main_price(inputs),
+            "amenidades": inputs['amenities']
+        })
+    prompt = (
+        "Crie um anúncio imobiliário criativo e envolvente, de um parágrafo, para cada imóvel abaixo. "
+        'Responda em JSON no formato {"anuncios": [{"id": "<id do imóvel>", "anuncio": "<texto>"}]}.\n'
+        + "\n".join(json.dumps(item, ensure_ascii=False) for item in items)
     )
-    return response.data[0].embedding
 
-def process_batch(client: OpenAI, batch: List[Dict], collection) -> None:
+    response = with_retry(
+        client.chat.completions.create,
+        model=LISTING_BATCH_MODEL,
+        messages=[
+            {"role": "system", "content": "Você é um especialista em marketing imobiliário."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=250 * len(properties),
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+
+    try:
+        anuncios = json.loads(response.choices[0].message.content).get("anuncios", [])
+        by_id = {str(item["id"]): str(item["anuncio"]).strip() for item in anuncios
+                 if isinstance(item, dict) and item.get("id") and item.get("anuncio")}
+    except (json.JSONDecodeError, AttributeError):
+        by_id = {}
+    return [by_id.get(property['id']) or None for property in properties]
+
+def listing_strategy_for(property: Dict, strategy: str = LISTING_STRATEGY,
+                         premium_strategy: str = LISTING_PREMIUM_STRATEGY) -> str:
     """
-    Processa um lote de imóveis, gerando anúncios criativos, embeddings e salvando no MongoDB
+    Estratégia de anúncio do imóvel: imóveis premium usam premium_strategy, os demais strategy
+    """
+    features = property['features']
+    return premium_strategy if is_premium(features['area'], features.get('suites', 0)) else strategy
+
+def listing_model_for(strategy: str) -> str:
     """
-    for idx, property in enumerate(batch):
-        print(f"  Processing property {property['id']}...")
+    Nome gravado em listing_model para os anúncios gerados com a estratégia
+    """
+    if strategy not in LISTING_STRATEGIES:
+        raise ValueError(f"Estratégia de anúncio inválida: {strategy} (use {', '.join(LISTING_STRATEGIES)})")
+    return {"llm": LISTING_MODEL, "batch": LISTING_BATCH_MODEL, "template": TEMPLATE_LISTING_MODEL}[strategy]
+
+def create_listings(batch: List[Dict], client: "OpenAI", executor: ThreadPoolExecutor,
+                    strategy: str = LISTING_STRATEGY,
+                    premium_strategy: str = LISTING_PREMIUM_STRATEGY) -> List[Tuple[Optional[str], str]]:
+    """
+    Gera os anúncios do lote conforme a estratégia de cada imóvel, retornando (anúncio, listing_model)
+    na ordem do lote; o anúncio é None quando a geração falhou. Imóveis que a chamada em lote não
+    devolveu recebem o anúncio dos modelos locais (e voltam a ser processados na próxima ingestão).
+    """
+    results: List[Tuple[Optional[str], str]] = [(None, "")] * len(batch)
+    groups = {name: [] for name in LISTING_STRATEGIES}
+    for i, property in enumerate(batch):
+        groups[listing_strategy_for(property, strategy, premium_strategy)].append(i)
+
+    for i in groups["template"]:
+        results[i] = (render_listing(batch[i]), TEMPLATE_LISTING_MODEL)
+
+    def listing_or_error(i):
         try:
-            anuncio = create_listing(property)
-            print(f"    ✓ Anúncio gerado")
-            
-            embedding = get_embedding(client, anuncio)
-            print(f"    ✓ Embedding gerado")
-            
-            documento = {
-                '_id': property['id'],
-                'dados': property,
-                'anuncio': anuncio,
-                'embedding': embedding
-            }
-            
-            collection.update_one(
-                {'_id': property['id']},
-                {'$set': documento},
-                upsert=True
-            )
-            print(f"    ✓ Salvo no MongoDB")
-            
+            return create_listing(batch[i], client)
         except Exception as e:
-            print(f"    ✗ Erro processando propriedade {property['id']}: {e}")
+            print(f"    ✗ Erro gerando anúncio da propriedade {batch[i]['id']}: {e}")
+            return None
+
+    def batch_or_error(chunk):
+        try:
+            return create_listings_batch([batch[i] for i in chunk], client)
+        except Exception as e:
+            print(f"    ✗ Erro gerando anúncios em lote ({len(chunk)} imóveis): {e}")
+            return [None] * len(chunk)
+
+    chunks = [groups["batch"][i:i + LISTING_BATCH_SIZE] for i in range(0, len(groups["batch"]), LISTING_BATCH_SIZE)]
+    llm_results = executor.map(listing_or_error, groups["llm"])
+    batch_results = executor.map(batch_or_error, chunks)
+
+    for i, anuncio in zip(groups["llm"], llm_results):
+        results[i] = (anuncio, LISTING_MODEL)
+    for chunk, anuncios in zip(chunks, batch_results):
+        for i, anuncio in zip(chunk, anuncios):
+            results[i] = (anuncio, LISTING_BATCH_MODEL) if anuncio else (render_listing(batch[i]), TEMPLATE_LISTING_MODEL)
+    return results
+
+def get_embedding(client: "OpenAI", text: str) -> List[float]:
+    """
+    Gera embedding usando o perfil de embedding configurado (modelo e dimensões)
+    """
+    return get_embeddings(client, [text])[0]
+
+def estimate_tokens(text: str) -> int:
+    # Estimativa conservadora (cerca de 3 bytes UTF-8 por token em português), sem depender de um tokenizador
+    return len(text.encode('utf-8')) // 3 + 1
+
+def embedding_batches(texts: List[str]) -> List[Tuple[int, int]]:
+    """
+    Divide os textos em intervalos [início, fim) com até EMBEDDING_INPUT_LIMIT textos e EMBEDDING_TOKEN_LIMIT
+    tokens estimados cada, para que descrições longas não façam a API rejeitar o lote inteiro
+    """
+    batches, start, tokens = [], 0, 0
+    for i, text in enumerate(texts):
+        size = estimate_tokens(text)
+        if i > start and (i - start == EMBEDDING_INPUT_LIMIT or tokens + size > EMBEDDING_TOKEN_LIMIT):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += size
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+def get_embeddings(client: "OpenAI", texts: List[str]) -> List[List[float]]:
+    """
+    Gera os embeddings de vários textos em chamadas limitadas por quantidade de textos e de tokens
+    """
+    embeddings = []
+    for start, end in embedding_batches(texts):
+        response = with_retry(
+            client.embeddings.create,
+            input=texts[start:end],
+            **embedding_profile.request_kwargs()
+        )
+        embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return embeddings
+
+def content_hash(property: Dict) -> str:
+    """
+    Hash de listing_inputs: se não mudar, o anúncio e o embedding continuam válidos
+    """
+    fields = listing_inputs(property)
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def select_changed(batch: List[Dict], collection, strategy: str = LISTING_STRATEGY,
+                   premium_strategy: str = LISTING_PREMIUM_STRATEGY) -> List[Dict]:
+    """
+    Filtra o lote, mantendo apenas os imóveis novos ou cujo conteúdo/modelos mudaram desde a última ingestão
+    """
+    stored = {
+        doc['_id']: doc
+        for doc in collection.find(
+            {'_id': {'$in': [property['id'] for property in batch]}},
+            {'content_hash': 1, 'listing_model': 1, 'embedding_profile': 1}
+        )
+    }
+    changed = []
+    for property in batch:
+        doc = stored.get(property['id'])
+        listing_model = listing_model_for(listing_strategy_for(property, strategy, premium_strategy))
+        if (doc is None or doc.get('content_hash') != content_hash(property)
+                or doc.get('listing_model') != listing_model or stored_profile_name(doc) != embedding_profile.name):
+            changed.append(property)
+    return changed
+
+def save_property_data(collection, properties: List[Dict]) -> List[str]:
+    """
+    Grava `dados` dos imóveis que não precisam de novo anúncio nem embedding (ex.: mudou só o condomínio
+    ou a descrição), para que filtros e detalhes não fiquem desatualizados. Retorna os ids regravados.
+    """
+    if not properties:
+        return []
+    stored = {doc['_id']: doc.get('dados') for doc in collection.find(
+        {'_id': {'$in': [property['id'] for property in properties]}}, {'dados': 1}
+    )}
+    changed = [property for property in properties if stored.get(property['id']) != property]
+    if not changed:
+        return []
+    write_with_facets(collection, [(property, {'$set': {'dados': property}}) for property in changed])
+    # Avisa a API para invalidar os caches que dependem destes imóveis
+    record_catalog_change(property['id'] for property in changed)
+    return [property['id'] for property in changed]
 
-def generate_embeddings(mock_data: List[Dict], batch_size: int = 10) -> None:
+def process_batch(client: "OpenAI", batch: List[Dict], collection,
+                  executor: Optional[ThreadPoolExecutor] = None, strategy: str = LISTING_STRATEGY,
+                  premium_strategy: str = LISTING_PREMIUM_STRATEGY) -> List[Dict]:
     """
-    Gera embeddings em lotes e salva no MongoDB
+    Processa um lote de imóveis: gera os anúncios conforme a estratégia (chamadas em paralelo),
+    os embeddings em uma única chamada e grava tudo no MongoDB com um bulk_write (write_with_facets, que também mantém as facetas).
+    Retorna os documentos gravados com sucesso.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as own_executor:
+            listings = create_listings(batch, client, own_executor, strategy, premium_strategy)
+    else:
+        listings = create_listings(batch, client, executor, strategy, premium_strategy)
+
+    ready = [(property, anuncio, listing_model) for property, (anuncio, listing_model) in zip(batch, listings)
+             if anuncio is not None]
+    if not ready:
+        return []
+    print(f"    ✓ {len(ready)} anúncios gerados")
+
+    try:
+        embeddings = get_embeddings(client, [anuncio for _, anuncio, _ in ready])
+    except Exception as e:
+        print(f"    ✗ Erro gerando embeddings do lote: {e}")
+        return []
+    print(f"    ✓ {len(embeddings)} embeddings gerados")
+
+    indexed_at = datetime.now(timezone.utc)
+    saved = [{
+        '_id': property['id'],
+        'dados': property,
+        'anuncio': anuncio,
+        **embedding_profile.document_fields(embedding),
+        'content_hash': content_hash(property),
+        'listing_model': listing_model,
+        'embedding_model': EMBEDDING_MODEL,
+        'indexed_at': indexed_at
+    } for (property, anuncio, listing_model), embedding in zip(ready, embeddings)]
+
+    try:
+        write_with_facets(collection, [
+            (documento['dados'], {'$set': documento, '$unset': {'pending_enrichment': ''}}) for documento in saved
+        ])
+    except Exception as e:
+        print(f"    ✗ Erro salvando lote no MongoDB: {e}")
+        return []
+    print(f"    ✓ Salvo no MongoDB")
+
+    # Avisa a API para invalidar os caches que dependem destes imóveis
+    record_catalog_change(documento['_id'] for documento in saved)
+
+    return saved
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Converte uma data ISO 8601 em datetime com fuso (UTC quando não informado)
+    """
+    timestamp = datetime.fromisoformat(value)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+def _load_checkpoint(path: str, source: str, total: int) -> int:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+    if checkpoint.get('source') != source or checkpoint.get('total') != total:
+        print(f"Checkpoint {path} é de outra execução, ignorando")
+        return 0
+    return checkpoint['position']
+
+def _save_checkpoint(path: str, source: str, total: int, position: int) -> None:
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'total': total, 'position': position,
+                   'updated_at': datetime.now(timezone.utc).isoformat()}, f)
+    os.replace(tmp_path, path)
+
+def generate_embeddings(mock_data: List[Dict], batch_size: int = INGEST_BATCH_SIZE,
+                        workers: int = INGEST_WORKERS, only_changed: bool = True,
+                        since: Optional[datetime] = None, checkpoint: Optional[str] = None,
+                        source: str = '', strategy: str = LISTING_STRATEGY,
+                        premium_strategy: str = LISTING_PREMIUM_STRATEGY) -> None:
+    """
+    Gera anúncios e embeddings em lotes e salva no MongoDB, reportando a vazão (imóveis/s).
+
+    - only_changed: não gera de novo anúncio e embedding dos imóveis cujo hash de conteúdo e modelos não
+      mudaram (os `dados` deles são regravados quando diferentes)
+    - since: processa apenas registros com `updated_at` posterior (registros sem o campo são mantidos)
+    - checkpoint: arquivo com a posição do último lote concluído, para retomar após interrupção
+    - strategy / premium_strategy: estratégia de anúncio dos imóveis comuns e dos premium
     """
     collection = get_mongo_collection("properties")
-    client = OpenAI()
+    client = get_ingest_client()
+
+    if since is not None:
+        mock_data = [
+            property for property in mock_data
+            if 'updated_at' not in property or parse_timestamp(property['updated_at']) >= since
+        ]
+
+    start = _load_checkpoint(checkpoint, source, len(mock_data)) if checkpoint else 0
+    if start:
+        print(f"Retomando a partir do imóvel {start} (checkpoint {checkpoint})")
     
     total_batches = len(mock_data) // batch_size + (1 if len(mock_data) % batch_size > 0 else 0)
-    print(f"Iniciando processamento de {len(mock_data)} propriedades em {total_batches} lotes")
+    print(f"Iniciando processamento de {len(mock_data)} propriedades em {total_batches} lotes ({workers} workers)")
     
+    updated_embeddings = {}
+    saved_ids = []
+    processed = 0
+    skipped = 0
+    started = time.perf_counter()
+
     # Processa os dados em lotes
-    for i in range(0, len(mock_data), batch_size):
-        batch = mock_data[i:i + batch_size]
-        print(f"\nProcessando lote {i//batch_size + 1} de {total_batches}")
-        process_batch(client, batch, collection)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i in range(start - start % batch_size, len(mock_data), batch_size):
+            batch = mock_data[i:i + batch_size]
+            print(f"\nProcessando lote {i//batch_size + 1} de {total_batches}")
+            if only_changed:
+                changed = select_changed(batch, collection, strategy, premium_strategy)
+                changed_ids = {property['id'] for property in changed}
+                unchanged = [property for property in batch if property['id'] not in changed_ids]
+                skipped += len(unchanged)
+                if unchanged:
+                    try:
+                        updated = save_property_data(collection, unchanged)
+                        print(f"    - {len(unchanged)} imóveis sem alteração no anúncio "
+                              f"({len(updated)} com `dados` atualizados)")
+                    except Exception as e:
+                        print(f"    ✗ Erro salvando dados do lote no MongoDB: {e}")
+                batch = changed
+            if batch:
+                batch_started = time.perf_counter()
+                saved = process_batch(client, batch, collection, executor, strategy, premium_strategy)
+                processed += len(saved)
+                saved_ids.extend(documento['_id'] for documento in saved)
+                batch_elapsed = time.perf_counter() - batch_started
+                print(f"    {len(saved)}/{len(batch)} imóveis em {batch_elapsed:.1f}s "
+                      f"({len(saved) / batch_elapsed:.1f} imóveis/s)")
+                if SEARCH_BACKEND == "local":
+                    for documento in saved:
+                        updated_embeddings[documento['_id']] = documento.get('embedding_full', documento['embedding'])
+            if checkpoint:
+                _save_checkpoint(checkpoint, source, len(mock_data), i + batch_size)
 
-def generate_mock_properties(num_properties: int = 100) -> List[Dict]:
+    elapsed = time.perf_counter() - started
+    print(f"\n{processed} imóveis processados e {skipped} sem alteração no anúncio em {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.1f} imóveis/s)")
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    refresh_derived(updated_embeddings, saved_ids)
+
+def refresh_derived(updated_embeddings: Dict[str, object], saved_ids: List[str]) -> None:
     """
-    Generates mock property listings
+    Atualiza o que é derivado dos embeddings depois de uma ingestão: índice local e listas de semelhantes
+    """
+    # Atualiza o índice local de busca com os documentos novos ou alterados
+    if updated_embeddings:
+        from real_estate.search_backends import refresh_local_index
+        total = refresh_local_index(updated_embeddings)
+        print(f"Índice local de busca atualizado ({total} imóveis)")
+
+    # Atualiza as listas de imóveis semelhantes afetadas pelos documentos gravados
+    if saved_ids:
+        from real_estate.similar import update_similar
+        print(f"Listas de semelhantes atualizadas ({update_similar(saved_ids)} imóveis)")
+
+def enrich_pending(batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS,
+                   limit: Optional[int] = None, strategy: str = LISTING_STRATEGY,
+                   premium_strategy: str = LISTING_PREMIUM_STRATEGY) -> None:
+    """
+    Gera anúncios e embeddings dos imóveis marcados com pending_enrichment pela importação
+    (import_catalog.py). Os imóveis são lidos lote a lote em ordem de _id, então a memória não
+    depende do tamanho do catálogo e uma execução interrompida continua de onde parou.
+    Imóveis com erro continuam pendentes para a próxima execução.
     """
-    property_types = [
-        "Apartamento", "Casa", "Cobertura", "Studio", "Loft", "Garden",
-        "Duplex", "Triplex", "Flat", "Vila", "Casa em Condomínio", "Mansão",
-        "Kitnet", "Chalé", "Condomínio"
+    collection = get_mongo_collection("properties")
+    client = get_ingest_client()
+    query = {'pending_enrichment': True}
+    total = collection.count_documents(query)
+    if limit is not None:
+        total = min(total, limit)
+    print(f"Gerando anúncios e embeddings de {total} imóveis pendentes ({workers} workers)")
+
+    updated_embeddings = {}
+    saved_ids = []
+    last_id = None
+    read = 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while read < total:
+            page = dict(query, _id={'$gt': last_id}) if last_id is not None else query
+            documents = list(collection.find(page, {'dados': 1}).sort('_id', 1).limit(min(batch_size, total - read)))
+            if not documents:
+                break
+            last_id = documents[-1]['_id']
+            read += len(documents)
+            saved = process_batch(client, [document['dados'] for document in documents], collection, executor,
+                                  strategy, premium_strategy)
+            saved_ids.extend(documento['_id'] for documento in saved)
+            if SEARCH_BACKEND == "local":
+                for documento in saved:
+                    updated_embeddings[documento['_id']] = documento.get('embedding_full', documento['embedding'])
+            elapsed = time.perf_counter() - started
+            print(f"  {read}/{total} imóveis lidos, {len(saved_ids)} processados "
+                  f"({len(saved_ids) / elapsed if elapsed else 0:.1f} imóveis/s)")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{len(saved_ids)} imóveis processados e {read - len(saved_ids)} com erro em {elapsed:.1f}s")
+    refresh_derived(updated_embeddings, saved_ids)
+
+# Valores usados na geração dos imóveis de teste (também pelo gerador em larga escala, mock_catalog.py)
+PROPERTY_TYPES = [
+    "Apartamento", "Casa", "Cobertura", "Studio", "Loft", "Garden",
+    "Duplex", "Triplex", "Flat", "Vila", "Casa em Condomínio", "Mansão",
+    "Kitnet", "Chalé", "Condomínio"
+]
+
+NEIGHBORHOODS = {
+    "SP": [
+        "Vila Mariana", "Pinheiros", "Itaim Bibi", "Jardins", "Vila Madalena",
+        "Moema", "Brooklin", "Perdizes", "Paraíso", "Vila Olímpia",
+        "Santana", "Tatuapé", "Morumbi", "Campo Belo", "Higienópolis",
+        "Consolação", "Aclimação", "Saúde", "Jabaquara", "Butantã",
+        "Lapa", "Pompeia", "Vila Leopoldina", "Santo Amaro", "Chácara Flora"
+    ],
+    "RJ": [
+        "Copacabana", "Ipanema", "Leblon", "Botafogo", "Flamengo",
+        "Barra da Tijuca", "Recreio", "Laranjeiras", "Tijuca", "Gávea",
+        "Jardim Botânico", "Urca", "São Conrado", "Lagoa", "Humaitá",
+        "Grajaú", "Vila Isabel", "Méier", "Maracanã", "Freguesia",
+        "Pechincha", "Taquara", "Jardim Oceânico", "Joá", "Barra"
+    ],
+    "POA": [
+        "Moinhos de Vento", "Bela Vista", "Menino Deus", "Petrópolis", "Rio Branco",
+        "Cidade Baixa", "Auxiliadora", "Mont'Serrat", "Independência", "Boa Vista",
+        "Três Figueiras", "Higienópolis", "Chácara das Pedras", "Vila Ipiranga", "Jardim Europa",
+        "Tristeza", "Vila Assunção", "Ipanema", "Cavalhada", "Cristal"
+    ],
+    "CWB": [
+        "Batel", "Água Verde", "Bigorrilho", "Centro", "Mercês",
+        "Alto da XV", "Juvevê", "Cabral", "Hugo Lange", "Cristo Rei",
+        "Jardim Social", "Ahú", "São Francisco", "Alto da Glória", "Rebouças"
+    ],
+    "BH": [
+        "Savassi", "Lourdes", "Funcionários", "Serra", "Sion",
+        "Luxemburgo", "Santo Agostinho", "Carmo", "São Pedro", "Cidade Jardim",
+        "Belvedere", "Mangabeiras", "Santo Antônio", "Cruzeiro", "Anchieta"
     ]
+}
+
+AMENITIES = [
+    # Lazer
+    "Piscina", "Piscina Aquecida", "Piscina Coberta", "Academia", "Academia 24h",
+    "Salão de Festas", "Playground", "Brinquedoteca", "Quadra Poliesportiva",
+    "Quadra de Tênis", "Quadra de Squash", "Campo de Futebol", "Pista de Corrida",
     
-    neighborhoods = {
-        "SP": [
-            "Vila Mariana", "Pinheiros", "Itaim Bibi", "Jardins", "Vila Madalena",
-            "Moema", "Brooklin", "Perdizes", "Paraíso", "Vila Olímpia",
-            "Santana", "Tatuapé", "Morumbi", "Campo Belo", "Higienópolis",
-            "Consolação", "Aclimação", "Saúde", "Jabaquara", "Butantã",
-            "Lapa", "Pompeia", "Vila Leopoldina", "Santo Amaro", "Chácara Flora"
-        ],
-        "RJ": [
-            "Copacabana", "Ipanema", "Leblon", "Botafogo", "Flamengo",
-            "Barra da Tijuca", "Recreio", "Laranjeiras", "Tijuca", "Gávea",
-            "Jardim Botânico", "Urca", "São Conrado", "Lagoa", "Humaitá",
-            "Grajaú", "Vila Isabel", "Méier", "Maracanã", "Freguesia",
-            "Pechincha", "Taquara", "Jardim Oceânico", "Joá", "Barra"
-        ],
-        "POA": [
-            "Moinhos de Vento", "Bela Vista", "Menino Deus", "Petrópolis", "Rio Branco",
-            "Cidade Baixa", "Auxiliadora", "Mont'Serrat", "Independência", "Boa Vista",
-            "Três Figueiras", "Higienópolis", "Chácara das Pedras", "Vila Ipiranga", "Jardim Europa",
-            "Tristeza", "Vila Assunção", "Ipanema", "Cavalhada", "Cristal"
-        ],
-        "CWB": [
-            "Batel", "Água Verde", "Bigorrilho", "Centro", "Mercês",
-            "Alto da XV", "Juvevê", "Cabral", "Hugo Lange", "Cristo Rei",
-            "Jardim Social", "Ahú", "São Francisco", "Alto da Glória", "Rebouças"
-        ],
-        "BH": [
-            "Savassi", "Lourdes", "Funcionários", "Serra", "Sion",
-            "Luxemburgo", "Santo Agostinho", "Carmo", "São Pedro", "Cidade Jardim",
-            "Belvedere", "Mangabeiras", "Santo Antônio", "Cruzeiro", "Anchieta"
-        ]
-    }
+    # Bem-estar
+    "Spa", "Sauna Seca", "Sauna Úmida", "Sala de Massagem", "Espaço Zen",
+    "Estúdio de Yoga", "Sala de Meditação", "Jardim Zen",
     
-    amenities = [
-        # Lazer
-        "Piscina", "Piscina Aquecida", "Piscina Coberta", "Academia", "Academia 24h",
-        "Salão de Festas", "Playground", "Brinquedoteca", "Quadra Poliesportiva",
-        "Quadra de Tênis", "Quadra de Squash", "Campo de Futebol", "Pista de Corrida",
-        
-        # Bem-estar
-        "Spa", "Sauna Seca", "Sauna Úmida", "Sala de Massagem", "Espaço Zen",
-        "Estúdio de Yoga", "Sala de Meditação", "Jardim Zen",
-        
-        # Gastronomia
-        "Terraço Gourmet", "Churrasqueira", "Forno de Pizza", "Adega Climatizada",
-        "Espaço Gourmet", "Jardim de Cerveja", "Horta Comunitária", "Pomar",
-        
-        # Trabalho e Estudo
-        "Espaço Coworking", "Centro Empresarial", "Sala de Reunião", "Biblioteca",
-        "Sala de Estudos", "Internet Fibra Ótica", "Sala de Videoconferência",
-        
-        # Conveniência
-        "Lavanderia", "Sala de Entregas", "Espaço Pet", "Pet Care", "Pet Wash",
-        "Bicicletário", "Oficina de Bicicletas", "Lava Rápido", "Serviço de Manobrista",
-        
-        # Entretenimento
-        "Cinema", "Sala de Games", "Sala de Jogos", "Lounge", "Espaço Musical",
-        "Salão de Jogos", "Pub", "Bar Esportivo", "Karaokê",
-        
-        # Família
-        "Espaço Kids", "Berçário", "Playground Coberto", "Brinquedoteca",
-        "Sala de Artes", "Espaço Família", "Área de Piquenique",
-        
-        # Segurança e Serviços
-        "Segurança 24h", "Portaria Blindada", "Circuito CFTV", "Gerador",
-        "Concierge", "Serviço de Manobrista", "Depósito Privativo",
-        
-        # Sustentabilidade
-        "Energia Solar", "Captação de Água da Chuva", "Coleta Seletiva",
-        "Carregador para Carro Elétrico", "Composteira"
-    ]
+    # Gastronomia
+    "Terraço Gourmet", "Churrasqueira", "Forno de Pizza", "Adega Climatizada",
+    "Espaço Gourmet", "Jardim de Cerveja", "Horta Comunitária", "Pomar",
     
-    cities = {
-        "SP": "São Paulo",
-        "RJ": "Rio de Janeiro",
-        "POA": "Porto Alegre",
-        "CWB": "Curitiba",
-        "BH": "Belo Horizonte"
-    }
+    # Trabalho e Estudo
+    "Espaço Coworking", "Centro Empresarial", "Sala de Reunião", "Biblioteca",
+    "Sala de Estudos", "Internet Fibra Ótica", "Sala de Videoconferência",
     
+    # Conveniência
+    "Lavanderia", "Sala de Entregas", "Espaço Pet", "Pet Care", "Pet Wash",
+    "Bicicletário", "Oficina de Bicicletas", "Lava Rápido", "Serviço de Manobrista",
+    
+    # Entretenimento
+    "Cinema", "Sala de Games", "Sala de Jogos", "Lounge", "Espaço Musical",
+    "Salão de Jogos", "Pub", "Bar Esportivo", "Karaokê",
+    
+    # Família
+    "Espaço Kids", "Berçário", "Playground Coberto", "Brinquedoteca",
+    "Sala de Artes", "Espaço Família", "Área de Piquenique",
+    
+    # Segurança e Serviços
+    "Segurança 24h", "Portaria Blindada", "Circuito CFTV", "Gerador",
+    "Concierge", "Serviço de Manobrista", "Depósito Privativo",
+    
+    # Sustentabilidade
+    "Energia Solar", "Captação de Água da Chuva", "Coleta Seletiva",
+    "Carregador para Carro Elétrico", "Composteira"
+]
+
+CITIES = {
+    "SP": "São Paulo",
+    "RJ": "Rio de Janeiro",
+    "POA": "Porto Alegre",
+    "CWB": "Curitiba",
+    "BH": "Belo Horizonte"
+}
+
+# Faixa do preço por m² (R$) de cada estado
+PRICE_PER_SQM = {
+    "SP": (8000, 15000),
+    "RJ": (7000, 14000),
+    "POA": (6000, 11000),
+    "CWB": (5500, 10000),
+    "BH": (5000, 9500)
+}
+
+BUSINESS_TYPES = ["venda", "aluguel", "venda_aluguel"]
+
+# Preços derivados do valor do imóvel
+PROPERTY_TAX_RATE = 0.02
+RENT_RATE = 0.004
+
+# Modelos de descrição, de simples a luxuosos; os premium valem para imóveis grandes ou com
+# mais de duas suítes e os compactos para imóveis pequenos
+DESCRIPTION_TEMPLATES = [
+    # Descrições mais simples e diretas
+    "Ótimo {type} com {area}m², {bedrooms} quartos em {neighborhood}",
+    "{type} bem localizado, {bedrooms} dormitórios e infraestrutura completa",
+    "{type} aconchegante em região tranquila, próximo a comércios e transporte",
+    "Excelente {type} para moradia ou investimento em localização estratégica",
+    "{type} com boa distribuição dos ambientes e localização privilegiada",
+
+    # Descrições intermediárias
+    "{type} em ótimo estado, com {bedrooms} quartos e área de lazer completa",
+    "Amplo {type} com {area}m² em região bem servida de comércio e serviços",
+    "{type} reformado com acabamento moderno e excelente área de convivência",
+    "Ótima oportunidade: {type} com {bedrooms} dormitórios em localização nobre",
+    "{type} com boa iluminação natural e vista livre em {neighborhood}",
+
+    # Descrições mais elaboradas
+    "Lindo {type} com acabamento de alto padrão e total infraestrutura",
+    "Espetacular {type} com vista privilegiada em {neighborhood}",
+    "Exclusivo {type} em localização premium com {area}m² bem distribuídos",
+    "Moderno {type} com conceito aberto e ambientes integrados",
+    "Elegante {type} em região nobre com total privacidade"
+]
+
+PREMIUM_DESCRIPTION_TEMPLATES = [
+    "Magnífico {type} com projeto arquitetônico diferenciado e {area}m² de puro conforto",
+    "Sofisticado {type} em prédio novo com lazer completo e acabamento premium",
+    "Imponente {type} com {bedrooms} dormitórios e vista deslumbrante de {neighborhood}"
+]
+
+COMPACT_DESCRIPTION_TEMPLATES = [
+    "{type} compacto e funcional, perfeito para solteiros ou casal",
+    "{type} prático com ótimo aproveitamento de espaço em {neighborhood}",
+    "Charmoso {type} com planta inteligente e localização privilegiada"
+]
+
+# Trechos dos anúncios gerados localmente (render_listing)
+LISTING_OPENINGS = [
+    "{type} de {area}m² em {neighborhood}, {city}, pronto para receber você.",
+    "Conheça este {type} de {area}m² em {neighborhood}, uma das regiões mais procuradas de {city}.",
+    "Oportunidade em {neighborhood}: {type} de {area}m² com ótima distribuição dos ambientes.",
+    "Viva bem em {neighborhood}, {city}, neste {type} de {area}m² bem iluminado e arejado."
+]
+
+PREMIUM_LISTING_OPENINGS = [
+    "Exclusividade em {neighborhood}: {type} de {area}m² com acabamento de alto padrão.",
+    "Sofisticação e espaço em {city}: {type} de {area}m² em {neighborhood}, pensado para quem exige o melhor.",
+    "Raro {type} de {area}m² em {neighborhood}, com ambientes amplos e privacidade total."
+]
+
+COMPACT_LISTING_OPENINGS = [
+    "{type} compacto de {area}m² em {neighborhood}, {city}, com planta inteligente e fácil manutenção.",
+    "Praticidade em {neighborhood}: {type} de {area}m² ideal para quem busca uma rotina sem complicação.",
+    "Seu {type} de {area}m² em {neighborhood}, perto de tudo o que {city} oferece."
+]
+
+LISTING_AMENITY_SENTENCES = [
+    "Para o seu lazer e conforto: {amenities}.",
+    "O condomínio conta com {amenities}.",
+    "Entre os diferenciais estão {amenities}."
+]
+
+LISTING_CLOSINGS = [
+    "Agende sua visita!",
+    "Entre em contato e venha conhecer.",
+    "Não perca esta oportunidade, agende uma visita.",
+    "Fale com a gente e conheça pessoalmente."
+]
+
+def is_premium(area: int, suites: int) -> bool:
+    return area > 200 or suites > 2
+
+def is_compact(area: int) -> bool:
+    return area < 70
+
+def generate_mock_properties(num_properties: int = 100) -> List[Dict]:
+    """
+    Generates mock property listings
+    """
     properties = []
     
     for i in range(num_properties):
-        state = random.choice(list(cities.keys()))
-        city = cities[state]
+        state = random.choice(list(CITIES.keys()))
+        city = CITIES[state]
         
         area = random.randint(30, 500)
         bedrooms = random.randint(1, 5)
@@ -191,24 +774,17 @@ def generate_mock_properties(num_properties: int = 100) -> List[Dict]:
         parking_spots = random.randint(1, 4)
         bathrooms = random.randint(1, bedrooms + 2)
         
-        # Seleciona o tipo de imóvel primeiro
-        property_type = random.choice(property_types)
+        # Seleciona o tipo de imóvel e o bairro primeiro (usados no título, na descrição e na localização)
+        property_type = random.choice(PROPERTY_TYPES)
+        neighborhood = random.choice(NEIGHBORHOODS[state])
         
-        base_price_sqm = {
-            "SP": random.randint(8000, 15000),
-            "RJ": random.randint(7000, 14000),
-            "POA": random.randint(6000, 11000),
-            "CWB": random.randint(5500, 10000),
-            "BH": random.randint(5000, 9500)
-        }
-        
-        base_price = area * base_price_sqm[state]
+        base_price = area * random.randint(*PRICE_PER_SQM[state])
         
         property_data = {
             "id": f"property_{str(i+1).zfill(3)}",
-            "title": f"{property_type} em {random.choice(neighborhoods[state])}",
+            "title": f"{property_type} em {neighborhood}",
             "type": property_type,
-            "business_type": random.choice(["venda", "aluguel", "venda_aluguel"]),
+            "business_type": random.choice(BUSINESS_TYPES),
             "description": generate_description({
                 "type": property_type,
                 "features": {
@@ -217,7 +793,7 @@ def generate_mock_properties(num_properties: int = 100) -> List[Dict]:
                     "suites": suites
                 },
                 "location": {
-                    "neighborhood": random.choice(neighborhoods[state])
+                    "neighborhood": neighborhood
                 }
             }),
             "features": {
@@ -228,21 +804,21 @@ def generate_mock_properties(num_properties: int = 100) -> List[Dict]:
                 "bathrooms": bathrooms
             },
             "location": {
-                "neighborhood": random.choice(neighborhoods[state]),
+                "neighborhood": neighborhood,
                 "city": city,
                 "state": state
             },
             "prices": {
                 "condo_fee": random.randint(500, 3000),
-                "property_tax": int(base_price * 0.02)
+                "property_tax": int(base_price * PROPERTY_TAX_RATE)
             },
-            "amenities": random.sample(amenities, random.randint(4, 10))
+            "amenities": random.sample(AMENITIES, random.randint(4, 10))
         }
         
         if property_data["business_type"] in ["venda", "venda_aluguel"]:
             property_data["prices"]["sale_price"] = base_price
         if property_data["business_type"] in ["aluguel", "venda_aluguel"]:
-            property_data["prices"]["rent_price"] = int(base_price * 0.004)
+            property_data["prices"]["rent_price"] = int(base_price * RENT_RATE)
         
         properties.append(property_data)
     
@@ -253,62 +829,59 @@ def generate_description(property_data: Dict) -> str:
     Generates varied property descriptions from simple to luxurious
     """
     area = property_data['features']['area']
-    bedrooms = property_data['features']['bedrooms']
-    neighborhood = property_data['location']['neighborhood']
-    property_type = property_data['type'].lower()
     
-    descriptions = [
-        # Descrições mais simples e diretas
-        f"Ótimo {property_type} com {area}m², {bedrooms} quartos em {neighborhood}",
-        f"{property_type} bem localizado, {bedrooms} dormitórios e infraestrutura completa",
-        f"{property_type} aconchegante em região tranquila, próximo a comércios e transporte",
-        f"Excelente {property_type} para moradia ou investimento em localização estratégica",
-        f"{property_type} com boa distribuição dos ambientes e localização privilegiada",
-        
-        # Descrições intermediárias
-        f"{property_type} em ótimo estado, com {bedrooms} quartos e área de lazer completa",
-        f"Amplo {property_type} com {area}m² em região bem servida de comércio e serviços",
-        f"{property_type} reformado com acabamento moderno e excelente área de convivência",
-        f"Ótima oportunidade: {property_type} com {bedrooms} dormitórios em localização nobre",
-        f"{property_type} com boa iluminação natural e vista livre em {neighborhood}",
-        
-        # Descrições mais elaboradas
-        f"Lindo {property_type} com acabamento de alto padrão e total infraestrutura",
-        f"Espetacular {property_type} com vista privilegiada em {neighborhood}",
-        f"Exclusivo {property_type} em localização premium com {area}m² bem distribuídos",
-        f"Moderno {property_type} com conceito aberto e ambientes integrados",
-        f"Elegante {property_type} em região nobre com total privacidade"
-    ]
+    templates = list(DESCRIPTION_TEMPLATES)
     
     # Adiciona detalhes específicos para imóveis maiores ou de alto padrão
-    if area > 200 or property_data['features']['suites'] > 2:
-        premium_descriptions = [
-            f"Magnífico {property_type} com projeto arquitetônico diferenciado e {area}m² de puro conforto",
-            f"Sofisticado {property_type} em prédio novo com lazer completo e acabamento premium",
-            f"Imponente {property_type} com {bedrooms} dormitórios e vista deslumbrante de {neighborhood}"
-        ]
-        descriptions.extend(premium_descriptions)
+    if is_premium(area, property_data['features']['suites']):
+        templates.extend(PREMIUM_DESCRIPTION_TEMPLATES)
     
     # Adiciona detalhes específicos para imóveis compactos
-    if area < 70:
-        compact_descriptions = [
-            f"{property_type} compacto e funcional, perfeito para solteiros ou casal",
-            f"{property_type} prático com ótimo aproveitamento de espaço em {neighborhood}",
-            f"Charmoso {property_type} com planta inteligente e localização privilegiada"
-        ]
-        descriptions.extend(compact_descriptions)
+    if is_compact(area):
+        templates.extend(COMPACT_DESCRIPTION_TEMPLATES)
     
-    return random.choice(descriptions)
+    return random.choice(templates).format(
+        type=property_data['type'].lower(),
+        area=area,
+        bedrooms=property_data['features']['bedrooms'],
+        neighborhood=property_data['location']['neighborhood']
+    )
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera anúncios e embeddings dos imóveis e salva no MongoDB")
+    parser.add_argument("--input", default="mock_data.json", help="arquivo JSON com os imóveis")
+    parser.add_argument("--only-changed", action=argparse.BooleanOptionalAction, default=True,
+                        help="processa apenas imóveis novos ou alterados (padrão)")
+    parser.add_argument("--since", type=parse_timestamp,
+                        help="processa apenas registros com updated_at a partir desta data (ISO 8601)")
+    parser.add_argument("--checkpoint", default=INGEST_CHECKPOINT_PATH,
+                        help="arquivo de checkpoint para retomar uma execução interrompida")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--pending", action="store_true",
+                        help="processa os imóveis importados com import_catalog.py que aguardam anúncio e embedding")
+    parser.add_argument("--listing-strategy", choices=LISTING_STRATEGIES, default=LISTING_STRATEGY,
+                        help="llm: uma chamada por imóvel; batch: vários imóveis por chamada; template: modelos locais")
+    parser.add_argument("--premium-listing-strategy", choices=LISTING_STRATEGIES, default=LISTING_PREMIUM_STRATEGY,
+                        help="estratégia dos imóveis premium (área > 200 m² ou mais de duas suítes)")
+    args = parser.parse_args()
+
+    if args.pending:
+        enrich_pending(batch_size=args.batch_size, workers=args.workers, strategy=args.listing_strategy,
+                       premium_strategy=args.premium_listing_strategy)
+        exit(0)
+
     # Carrega os dados do arquivo JSON
     try:
-        with open('mock_data.json', 'r', encoding='utf-8') as f:
+        with open(args.input, 'r', encoding='utf-8') as f:
             mock_data = json.load(f)
     except FileNotFoundError:
-        print("Arquivo mock_data.json não encontrado!")
+        print(f"Arquivo {args.input} não encontrado!")
         exit(1)
     
     # Gera os embeddings
-    generate_embeddings(mock_data)
-    print("Embeddings gerados e salvos com sucesso!") 
\ No newline at end of file
+    generate_embeddings(mock_data, batch_size=args.batch_size, workers=args.workers,
+                        only_changed=args.only_changed, since=args.since,
+                        checkpoint=args.checkpoint, source=os.path.abspath(args.input),
+                        strategy=args.listing_strategy, premium_strategy=args.premium_listing_strategy)
+    print("Embeddings gerados e salvos com sucesso!")
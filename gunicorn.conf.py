@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+
+# Configuração lida automaticamente pelo gunicorn (Procfile: gunicorn app:app ...).
+# Com vários workers, o prometheus_client grava as métricas de cada processo em arquivos
+# neste diretório, e o /metrics de qualquer worker agrega todos eles.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "real_estate_metrics"))
+
+# O app (Flask, NumPy, OpenAI, PyMongo) é importado uma vez no processo mestre e os workers
+# nascem por fork já com tudo carregado. Isso é seguro porque nenhum cliente é criado na
+# importação: cada worker abre as próprias conexões (ver config.get_mongo_client).
+preload_app = True
+
+
+def on_starting(server):
+    # Arquivos de uma execução anterior somariam contadores antigos
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def post_worker_init(worker):
+    # Abre as conexões do worker em segundo plano: se a OpenAI ou o MongoDB estiverem fora, a inicialização
+    # não pode passar do timeout do gunicorn (o /api/ready responde 503 até as conexões abrirem)
+    from real_estate.routes import start_warm_up
+    start_warm_up()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
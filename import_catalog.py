@@ -0,0 +1,266 @@
+from config import get_mongo_collection, IMPORT_BATCH_SIZE, IMPORT_WRITERS
+from generate_listings_and_embeddings import BUSINESS_TYPES, select_changed, enrich_pending
+from real_estate.catalog import record_catalog_change
+from real_estate.facets import write_with_facets
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import gzip
+import json
+import math
+import time
+
+
+# Importação de catálogos de parceiros (exportações de vários GB) em NDJSON ou CSV:
+# os registros são lidos em streaming, validados, convertidos para o esquema de `dados`
+# e gravados com bulk_write não ordenado (write_with_facets, que mantém as contagens de facetas).
+# Os novos ou alterados ficam com `pending_enrichment`, e os anúncios/embeddings são gerados
+# depois, em uma etapa separada (enrich_pending).
+
+# Campo plano (coluna do CSV) -> caminho no esquema de `dados`
+FIELD_PATHS = {
+    "area": ("features", "area"),
+    "bedrooms": ("features", "bedrooms"),
+    "suites": ("features", "suites"),
+    "parking_spots": ("features", "parking_spots"),
+    "bathrooms": ("features", "bathrooms"),
+    "neighborhood": ("location", "neighborhood"),
+    "city": ("location", "city"),
+    "state": ("location", "state"),
+    "condo_fee": ("prices", "condo_fee"),
+    "property_tax": ("prices", "property_tax"),
+    "sale_price": ("prices", "sale_price"),
+    "rent_price": ("prices", "rent_price"),
+}
+INTEGER_FIELDS = ("area", "bedrooms", "suites", "parking_spots", "bathrooms")
+PRICE_FIELDS = ("condo_fee", "property_tax", "sale_price", "rent_price")
+REQUIRED_FIELDS = ("id", "type", "business_type", "area", "bedrooms", "neighborhood", "city", "state")
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+def _open(path: str):
+    return gzip.open(path, "rt", encoding="utf-8", newline="") if path.endswith(".gz") \
+        else open(path, "r", encoding="utf-8", newline="")
+
+def iter_records(path: str, format: str) -> Iterator[Tuple[int, object]]:
+    """
+    Lê o arquivo registro a registro (memória constante), retornando (linha, registro).
+    Linhas NDJSON com JSON inválido são retornadas como a exceção, para contarem como rejeitadas.
+    """
+    with _open(path) as f:
+        if format == "csv":
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row
+            return
+        for line, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as e:
+                yield line, ValueError(f"JSON inválido: {e.msg}")
+
+def _flatten(record: Dict) -> Dict:
+    # Registros já no esquema de `dados` (como os de mock_catalog.py) viram campos planos
+    flat = {key: value for key, value in record.items() if key not in ("features", "location", "prices")}
+    for group in ("features", "location", "prices"):
+        if isinstance(record.get(group), dict):
+            flat.update(record[group])
+    return flat
+
+def _is_empty(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def _number(field: str, value, integer: bool):
+    try:
+        number = float(str(value).replace(",", ".")) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} inválido: {value!r}")
+    # inf e nan (aceitos pelo float e pelo json.loads) não cabem em int nem viram JSON válido na API
+    if not math.isfinite(number):
+        raise ValueError(f"{field} inválido: {value!r}")
+    if number < 0:
+        raise ValueError(f"{field} negativo: {value!r}")
+    if integer or number.is_integer():
+        return int(number)
+    return number
+
+def _amenities(value) -> List[str]:
+    if _is_empty(value):
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if not _is_empty(item)]
+    separator = ";" if ";" in value else "|" if "|" in value else ","
+    return [item.strip() for item in value.split(separator) if item.strip()]
+
+def map_record(record: Dict) -> Dict:
+    """
+    Valida o registro e o converte para o esquema de `dados` usado pela API.
+    Lança ValueError com o motivo quando o registro é inválido.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("registro não é um objeto")
+    flat = _flatten(record)
+
+    missing = [field for field in REQUIRED_FIELDS if _is_empty(flat.get(field))]
+    if missing:
+        raise ValueError(f"campos obrigatórios ausentes: {', '.join(missing)}")
+    business_type = str(flat["business_type"]).strip()
+    if business_type not in BUSINESS_TYPES:
+        raise ValueError(f"business_type inválido: {business_type!r}")
+
+    property_type = str(flat["type"]).strip()
+    neighborhood = str(flat["neighborhood"]).strip()
+    property = {
+        "id": str(flat["id"]).strip(),
+        "title": str(flat.get("title") or f"{property_type} em {neighborhood}").strip(),
+        "type": property_type,
+        "business_type": business_type,
+        "description": str(flat.get("description") or "").strip(),
+        "features": {},
+        "location": {},
+        "prices": {},
+        "amenities": _amenities(flat.get("amenities"))
+    }
+    for field, (group, key) in FIELD_PATHS.items():
+        value = flat.get(field)
+        if _is_empty(value):
+            if field in INTEGER_FIELDS:
+                property[group][key] = 0
+            continue
+        if field in INTEGER_FIELDS or field in PRICE_FIELDS:
+            value = _number(field, value, integer=field in INTEGER_FIELDS)
+        else:
+            value = str(value).strip()
+        property[group][key] = value
+
+    if not property["features"]["area"]:
+        raise ValueError("area deve ser maior que zero")
+    # O anúncio e os filtros de preço usam o preço do tipo de negócio
+    prices = property["prices"]
+    if business_type == "venda" and "sale_price" not in prices:
+        raise ValueError("imóvel à venda sem sale_price")
+    if business_type == "aluguel" and "rent_price" not in prices:
+        raise ValueError("imóvel para aluguel sem rent_price")
+    if business_type == "venda_aluguel" and "sale_price" not in prices and "rent_price" not in prices:
+        raise ValueError("imóvel sem sale_price nem rent_price")
+    if not _is_empty(flat.get("updated_at")):
+        property["updated_at"] = str(flat["updated_at"]).strip()
+    return property
+
+def write_batch(collection, batch: List[Dict]) -> Dict[str, int]:
+    """
+    Grava um lote com um único bulk_write não ordenado (write_with_facets, que atualiza as contagens
+    de facetas com a diferença entre as facet_keys antigas e as novas de cada imóvel). Imóveis novos
+    ou com alteração nos campos usados pelo anúncio ficam marcados com pending_enrichment para a etapa
+    de anúncios e embeddings.
+    """
+    pending = {property["id"] for property in select_changed(batch, collection)}
+    imported_at = datetime.now(timezone.utc)
+    updates = []
+    for property in batch:
+        fields = {"dados": property, "imported_at": imported_at}
+        if property["id"] in pending:
+            fields["pending_enrichment"] = True
+        updates.append((property, {"$set": fields}))
+    upserted = write_with_facets(collection, updates)
+
+    # Avisa a API para invalidar os caches que dependem destes imóveis
+    record_catalog_change(property["id"] for property in batch)
+    return {"upserted": upserted, "modified": len(batch) - upserted, "pending": len(pending)}
+
+def import_catalog(path: str, format: Optional[str] = None, batch_size: int = IMPORT_BATCH_SIZE,
+                   writers: int = IMPORT_WRITERS, rejects: Optional[str] = None) -> Dict[str, int]:
+    """
+    Importa o arquivo para a coleção properties, reportando a vazão (registros/s).
+    Os lotes são gravados por `writers` threads enquanto o próximo lote é lido; no máximo
+    `writers` lotes ficam em memória ao mesmo tempo, qualquer que seja o tamanho do arquivo.
+    """
+    format = format or detect_format(path)
+    collection = get_mongo_collection("properties")
+    collection.create_index("pending_enrichment", partialFilterExpression={"pending_enrichment": True})
+
+    totals = {"read": 0, "rejected": 0, "failed": 0, "upserted": 0, "modified": 0, "pending": 0}
+    started = time.perf_counter()
+    rejects_file = open(rejects, "w", encoding="utf-8") if rejects else None
+    in_flight = []
+
+    def collect(future, size):
+        try:
+            for key, value in future.result().items():
+                totals[key] += value
+        except Exception as e:
+            totals["failed"] += size
+            print(f"    ✗ Erro salvando lote no MongoDB: {e}")
+
+    def report():
+        elapsed = time.perf_counter() - started
+        print(f"  {totals['read']} registros lidos, {totals['upserted']} novos, {totals['modified']} alterados, "
+              f"{totals['rejected']} rejeitados ({totals['read'] / elapsed if elapsed else 0:.0f} registros/s)")
+
+    def submit(executor, batch):
+        in_flight.append((executor.submit(write_batch, collection, batch), len(batch)))
+        if len(in_flight) >= writers:
+            collect(*in_flight.pop(0))
+            report()
+
+    try:
+        with ThreadPoolExecutor(max_workers=writers) as executor:
+            batch, ids = [], set()
+            for line, record in iter_records(path, format):
+                totals["read"] += 1
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    property = map_record(record)
+                except ValueError as e:
+                    totals["rejected"] += 1
+                    if rejects_file:
+                        rejects_file.write(json.dumps({"line": line, "error": str(e), "record": record},
+                                                      ensure_ascii=False, default=str) + "\n")
+                    continue
+                # O mesmo id duas vezes no lote faria as duas gravações concorrerem no bulk_write
+                if property["id"] in ids:
+                    submit(executor, batch)
+                    batch, ids = [], set()
+                batch.append(property)
+                ids.add(property["id"])
+                if len(batch) == batch_size:
+                    submit(executor, batch)
+                    batch, ids = [], set()
+            if batch:
+                submit(executor, batch)
+            while in_flight:
+                collect(*in_flight.pop(0))
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{totals['read']} registros lidos em {elapsed:.1f}s "
+          f"({totals['read'] / elapsed if elapsed else 0:.0f} registros/s): {totals['upserted']} novos, "
+          f"{totals['modified']} alterados, {totals['rejected']} rejeitados, {totals['failed']} com erro de gravação; "
+          f"{totals['pending']} aguardando anúncio e embedding")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa um catálogo de imóveis em NDJSON ou CSV para o MongoDB")
+    parser.add_argument("input", help="arquivo .ndjson, .jsonl ou .csv (opcionalmente .gz)")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="padrão: pela extensão do arquivo")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--writers", type=int, default=IMPORT_WRITERS)
+    parser.add_argument("--rejects", help="grava os registros rejeitados e o motivo neste arquivo NDJSON")
+    parser.add_argument("--enrich", action="store_true",
+                        help="gera em seguida os anúncios e embeddings dos imóveis importados")
+    args = parser.parse_args()
+
+    import_catalog(args.input, format=args.format, batch_size=args.batch_size,
+                   writers=args.writers, rejects=args.rejects)
+    if args.enrich:
+        enrich_pending()
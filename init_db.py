@@ -1,5 +1,8 @@
 from pymongo.operations import SearchIndexModel
 from config import get_mongo_collection
+from real_estate.catalog import CHANGES_TTL
+from real_estate.embeddings import embedding_profile
+from real_estate.filters import filter_index_fields
 from generate_listings_and_embeddings import generate_mock_properties, generate_embeddings
 import json
 
@@ -16,28 +19,42 @@ def init_vector_search():
     except Exception as e:
         print(f"Warning when creating collection: {e}")
     
-    # Defines vector index model
+    # Defines vector index model, with the structured search filters as filter fields
+    definition = {
+        "fields": [
+            {
+                "type": "vector",
+                "path": "embedding",
+                "similarity": "dotProduct",
+                "numDimensions": embedding_profile.dimensions,
+            },
+            *filter_index_fields()
+        ]
+    }
     search_index_model = SearchIndexModel(
-        definition = {
-            "fields": [
-                {
-                    "type": "vector",
-                    "path": "embedding",
-                    "similarity": "dotProduct",
-                    "numDimensions": 1536,
-                }
-            ]
-        },
+        definition = definition,
         name="vector_index",
         type="vectorSearch"
     )
     
     try:
-        collection.create_search_index(model = search_index_model)
-        print("Search index created successfully!")
+        if list(collection.list_search_indexes("vector_index")):
+            # Existing index: update the definition so new filter fields are indexed
+            collection.update_search_index("vector_index", definition)
+            print("Search index updated successfully!")
+        else:
+            collection.create_search_index(model = search_index_model)
+            print("Search index created successfully!")
     except Exception as e:
         print(f"Error creating search index: {e}")
 
+def init_indexes():
+    """
+    Creates the indexes of the auxiliary collections (expiration of catalog change records)
+    """
+    get_mongo_collection("catalog_changes").create_index("created_at", expireAfterSeconds=CHANGES_TTL)
+    print("Indexes created successfully!")
+
 def init_database():
     """
     Initializes database with mock data and vector search index
@@ -53,6 +70,7 @@ def init_database():
     # Initialize vector search index
     init_vector_search()
     print("Vector search index initialized")
+    init_indexes()
     
     # Generate embeddings and save to MongoDB
     generate_embeddings(mock_data)
@@ -0,0 +1,98 @@
+from pymongo import UpdateOne
+from config import get_mongo_collection, SEARCH_BACKEND
+from real_estate.embeddings import EmbeddingProfile, adapt_dimensions, embedding_profile, stored_profile_name
+from generate_listings_and_embeddings import get_embeddings, get_ingest_client
+from init_db import init_vector_search
+from typing import Dict, List
+import argparse
+import time
+
+
+def source_profile(document: Dict) -> EmbeddingProfile:
+    """
+    Perfil com que o documento foi gravado (documentos antigos: array de doubles do text-embedding-3-small)
+    """
+    return EmbeddingProfile.from_name(stored_profile_name(document))
+
+def migrate_batch(collection, documents: List[Dict], reembed: bool = False) -> int:
+    """
+    Converte um lote de documentos para o perfil de embedding atual.
+    Reduções de dimensão são feitas localmente (truncar + renormalizar); mudanças de modelo,
+    aumentos de dimensão ou --reembed geram novos embeddings a partir do anúncio.
+    """
+    vectors = {}
+    to_embed = []
+    for document in documents:
+        source = source_profile(document)
+        vector = source.decode(document.get('embedding_full', document['embedding']))
+        if reembed or source.model != embedding_profile.model or vector.shape[0] < embedding_profile.dimensions:
+            to_embed.append(document)
+        else:
+            vectors[document['_id']] = adapt_dimensions(vector, embedding_profile.dimensions).tolist()
+
+    if to_embed:
+        embeddings = get_embeddings(get_ingest_client(), [document['anuncio'] for document in to_embed])
+        for document, embedding in zip(to_embed, embeddings):
+            vectors[document['_id']] = embedding
+
+    operations = []
+    for property_id, vector in vectors.items():
+        update = {'$set': embedding_profile.document_fields(vector)}
+        if not embedding_profile.rescore:
+            update['$unset'] = {'embedding_full': ''}
+        operations.append(UpdateOne({'_id': property_id}, update))
+
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+def migrate_embeddings(batch_size: int = 500, reembed: bool = False) -> None:
+    """
+    Converte todos os documentos que não estão no perfil de embedding atual e atualiza o índice vetorial
+    """
+    collection = get_mongo_collection("properties")
+    query = {'embedding': {'$exists': True}}
+    if not reembed:
+        query['embedding_profile'] = {'$ne': embedding_profile.name}
+
+    total = collection.count_documents(query)
+    print(f"Migrando {total} documentos para o perfil {embedding_profile.name}")
+
+    started = time.perf_counter()
+    migrated = 0
+    batch = []
+    projection = {'embedding': 1, 'embedding_full': 1, 'embedding_profile': 1, 'anuncio': 1}
+    for document in collection.find(query, projection, batch_size=batch_size):
+        batch.append(document)
+        if len(batch) == batch_size:
+            migrated += migrate_batch(collection, batch, reembed)
+            batch = []
+            print(f"  {migrated}/{total} documentos migrados")
+    if batch:
+        migrated += migrate_batch(collection, batch, reembed)
+
+    elapsed = time.perf_counter() - started
+    print(f"{migrated} documentos migrados em {elapsed:.1f}s")
+
+    # O índice precisa refletir o novo número de dimensões
+    init_vector_search()
+    if SEARCH_BACKEND == "local":
+        from real_estate.search_backends import build_local_index
+        print(f"Índice local reconstruído ({build_local_index()} imóveis)")
+
+    # Os scores dos vizinhos dependem dos embeddings: recalcula todas as listas
+    from real_estate.similar import compute_similar
+    print(f"Listas de semelhantes recalculadas ({compute_similar()} imóveis)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Converte os embeddings armazenados para o perfil configurado "
+                    "(EMBEDDING_DIMENSIONS, EMBEDDING_STORAGE, EMBEDDING_RESCORE)"
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--reembed", action="store_true",
+                        help="gera novamente todos os embeddings a partir dos anúncios")
+    args = parser.parse_args()
+
+    migrate_embeddings(batch_size=args.batch_size, reembed=args.reembed)
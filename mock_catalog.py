@@ -0,0 +1,182 @@
+from generate_listings_and_embeddings import (
+    PROPERTY_TYPES, NEIGHBORHOODS, AMENITIES, CITIES, PRICE_PER_SQM, BUSINESS_TYPES,
+    PROPERTY_TAX_RATE, RENT_RATE, DESCRIPTION_TEMPLATES, PREMIUM_DESCRIPTION_TEMPLATES, COMPACT_DESCRIPTION_TEMPLATES
+)
+from typing import Dict, Iterator, List, Optional
+import argparse
+import gzip
+import json
+import time
+import numpy as np
+
+
+# Gerador de catálogos de teste em larga escala (1M+ imóveis): mesmas distribuições de
+# generate_mock_properties, mas com os campos sorteados em lote pelo NumPy e gravados em
+# NDJSON (um imóvel por linha) bloco a bloco, com memória constante.
+
+STATES = list(CITIES.keys())
+MIN_AMENITIES, MAX_AMENITIES = 4, 10
+
+
+class SyntheticEmbeddings:
+    """
+    Embeddings sintéticos com estrutura semântica: soma normalizada de vetores fixos (derivados da seed)
+    do tipo, do bairro, da cidade e das amenidades, mais ruído. Imóveis parecidos ficam próximos,
+    como no modelo real, sem chamar a OpenAI.
+    """
+
+    def __init__(self, dimensions: int, seed: int, noise: float = 0.5):
+        rng = np.random.default_rng([seed, dimensions])
+        self.dimensions = dimensions
+        self.noise = noise
+        self.types = self._unit(rng.standard_normal((len(PROPERTY_TYPES), dimensions)))
+        self.neighborhoods = {state: self._unit(rng.standard_normal((len(names), dimensions)))
+                              for state, names in NEIGHBORHOODS.items()}
+        self.cities = self._unit(rng.standard_normal((len(STATES), dimensions)))
+        self.amenities = self._unit(rng.standard_normal((len(AMENITIES), dimensions)))
+
+    @staticmethod
+    def _unit(vectors: np.ndarray) -> np.ndarray:
+        return (vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)).astype(np.float32)
+
+    def embed(self, rng: np.random.Generator, type_index: np.ndarray, state_index: np.ndarray,
+              neighborhood_index: np.ndarray, amenity_mask: np.ndarray) -> np.ndarray:
+        vectors = self.types[type_index] + self.cities[state_index]
+        for state_position, state in enumerate(STATES):
+            rows = state_index == state_position
+            vectors[rows] += self.neighborhoods[state][neighborhood_index[rows]]
+        vectors += amenity_mask.astype(np.float32) @ self.amenities / np.sqrt(MAX_AMENITIES)
+        vectors += self.noise * rng.standard_normal(vectors.shape, dtype=np.float32) / np.sqrt(self.dimensions)
+        return self._unit(vectors)
+
+
+def _draw_amenities(rng: np.random.Generator, size: int):
+    """
+    Sorteia de 4 a 10 amenidades distintas por imóvel, como random.sample: uma permutação por linha,
+    da qual ficam os primeiros `counts` itens. Retorna (permutações, quantidades, máscara por amenidade)
+    """
+    counts = rng.integers(MIN_AMENITIES, MAX_AMENITIES + 1, size)
+    order = np.argsort(rng.random((size, len(AMENITIES))), axis=1)
+    mask = np.zeros(order.shape, dtype=bool)
+    np.put_along_axis(mask, order, np.arange(len(AMENITIES)) < counts[:, None], axis=1)
+    return order, counts, mask
+
+
+def generate_mock_chunk(rng: np.random.Generator, start: int, size: int,
+                        embeddings: Optional[SyntheticEmbeddings] = None) -> List[Dict]:
+    """
+    Gera `size` imóveis a partir do número `start` (ids property_<n>, como em generate_mock_properties)
+    """
+    state_index = rng.integers(0, len(STATES), size)
+    area = rng.integers(30, 501, size)
+    bedrooms = rng.integers(1, 6, size)
+    suites = rng.integers(0, bedrooms + 1)
+    parking_spots = rng.integers(1, 5, size)
+    bathrooms = rng.integers(1, bedrooms + 3)
+    type_index = rng.integers(0, len(PROPERTY_TYPES), size)
+    neighborhood_index = (rng.random(size) * np.array([len(NEIGHBORHOODS[s]) for s in STATES])[state_index]).astype(int)
+    business_index = rng.integers(0, len(BUSINESS_TYPES), size)
+    condo_fee = rng.integers(500, 3001, size)
+
+    low, high = np.array([PRICE_PER_SQM[s] for s in STATES]).T
+    base_price = area * rng.integers(low[state_index], high[state_index] + 1)
+    property_tax = (base_price * PROPERTY_TAX_RATE).astype(np.int64)
+    rent_price = (base_price * RENT_RATE).astype(np.int64)
+
+    # Modelo de descrição: sorteio uniforme entre os modelos válidos de cada imóvel
+    premium = (area > 200) | (suites > 2)
+    compact = area < 70
+    options = len(DESCRIPTION_TEMPLATES) + premium * len(PREMIUM_DESCRIPTION_TEMPLATES) \
+        + compact * len(COMPACT_DESCRIPTION_TEMPLATES)
+    template_index = (rng.random(size) * options).astype(int)
+
+    amenity_order, amenity_counts, amenity_mask = _draw_amenities(rng, size)
+    vectors = embeddings.embed(rng, type_index, state_index, neighborhood_index, amenity_mask) if embeddings else None
+
+    properties = []
+    for i in range(size):
+        state = STATES[state_index[i]]
+        property_type = PROPERTY_TYPES[type_index[i]]
+        neighborhood = NEIGHBORHOODS[state][neighborhood_index[i]]
+        business_type = BUSINESS_TYPES[business_index[i]]
+
+        templates = DESCRIPTION_TEMPLATES + (PREMIUM_DESCRIPTION_TEMPLATES if premium[i] else []) \
+            + (COMPACT_DESCRIPTION_TEMPLATES if compact[i] else [])
+        description = templates[template_index[i]].format(
+            type=property_type.lower(), area=int(area[i]), bedrooms=int(bedrooms[i]), neighborhood=neighborhood
+        )
+
+        prices = {"condo_fee": int(condo_fee[i]), "property_tax": int(property_tax[i])}
+        if business_type in ["venda", "venda_aluguel"]:
+            prices["sale_price"] = int(base_price[i])
+        if business_type in ["aluguel", "venda_aluguel"]:
+            prices["rent_price"] = int(rent_price[i])
+
+        property_data = {
+            "id": f"property_{str(start + i + 1).zfill(3)}",
+            "title": f"{property_type} em {neighborhood}",
+            "type": property_type,
+            "business_type": business_type,
+            "description": description,
+            "features": {
+                "area": int(area[i]),
+                "bedrooms": int(bedrooms[i]),
+                "suites": int(suites[i]),
+                "parking_spots": int(parking_spots[i]),
+                "bathrooms": int(bathrooms[i])
+            },
+            "location": {
+                "neighborhood": neighborhood,
+                "city": CITIES[state],
+                "state": state
+            },
+            "prices": prices,
+            "amenities": [AMENITIES[j] for j in amenity_order[i, :amenity_counts[i]]]
+        }
+        if vectors is not None:
+            property_data["embedding"] = np.round(vectors[i], 6).tolist()
+        properties.append(property_data)
+
+    return properties
+
+
+def iter_mock_properties(count: int, seed: int = 0, chunk_size: int = 10000,
+                         embedding_dimensions: Optional[int] = None) -> Iterator[List[Dict]]:
+    """
+    Gera o catálogo em blocos de `chunk_size` imóveis; a mesma seed sempre gera o mesmo catálogo
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = SyntheticEmbeddings(embedding_dimensions, seed) if embedding_dimensions else None
+    for start in range(0, count, chunk_size):
+        yield generate_mock_chunk(rng, start, min(chunk_size, count - start), embeddings)
+
+
+def write_mock_catalog(path: str, count: int, seed: int = 0, chunk_size: int = 10000,
+                       embedding_dimensions: Optional[int] = None) -> None:
+    """
+    Grava o catálogo em NDJSON (compactado com gzip quando o arquivo termina em .gz), reportando a vazão
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    started = time.perf_counter()
+    written = 0
+    with opener(path, "wt", encoding="utf-8") as f:
+        for chunk in iter_mock_properties(count, seed, chunk_size, embedding_dimensions):
+            f.write("".join(json.dumps(property, ensure_ascii=False) + "\n" for property in chunk))
+            written += len(chunk)
+            elapsed = time.perf_counter() - started
+            print(f"  {written}/{count} imóveis ({written / elapsed:.0f} imóveis/s)")
+    print(f"Catálogo com {written} imóveis gravado em {path} em {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um catálogo de imóveis de teste em NDJSON")
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--output", default="mock_catalog.ndjson", help="arquivo .ndjson ou .ndjson.gz")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--embedding-dimensions", type=int,
+                        help="inclui um embedding sintético com este número de dimensões em cada imóvel")
+    args = parser.parse_args()
+
+    write_mock_catalog(args.output, args.count, seed=args.seed, chunk_size=args.chunk_size,
+                       embedding_dimensions=args.embedding_dimensions)
@@ -0,0 +1,567 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from quart import Blueprint, Response, g, has_request_context, request, jsonify
+
+from config import (
+    get_async_mongo_collection, get_async_openai_client, SEARCH_COALESCING, SEARCH_DEADLINE,
+    SEARCH_EMBED_TIMEOUT, SEARCH_SUMMARY_TIMEOUT, SEARCH_EMBED_MAX_CONCURRENCY, SEARCH_SUMMARY_MAX_CONCURRENCY,
+    OPENAI_QUEUE_TIMEOUT, WARM_UP_TIMEOUT
+)
+from real_estate.coalescing import AsyncSingleFlight
+from real_estate.embeddings import embedding_profile
+from real_estate.catalog import catalog_poll_due, poll_catalog_changes
+from real_estate.metrics import (
+    Timings, stage, server_timing_header, record_request, record_results, record_usage
+)
+from real_estate.resilience import (
+    AsyncConcurrencyLimit, Deadline, DeadlineExceeded, call_timeout, record_degradation
+)
+from real_estate.routes import (
+    summary_breaker, is_unavailable, embedding_cache, summary_cache, semantic_cache, semantic_cache_context, summary_request, summary_cache_key,
+    SUMMARY_MODEL, search_flight_key, format_search_results, parse_search_params, parse_batch_search_params, sse_event,
+    property_cache, missing_property_ids,
+    cache_property_documents, is_not_modified, parse_property_ids, set_validators, PROPERTY_PROJECTION,
+    SIMILAR_PROJECTION, parse_similar_params, similar_response, candidates_limit, split_facets, facet_summary
+)
+from real_estate.facets import parse_facet_fields
+from real_estate.search_backends import get_search_backend
+
+
+# Versão assíncrona das rotas (modo ASGI): mesmas URLs, caches e formato de resposta do blueprint Flask
+real_estate_async = Blueprint('real_estate_async', __name__)
+
+# Coalescência das buscas idênticas simultâneas dentro do worker (o modo "mongo" vale só para o app Flask)
+search_flight = AsyncSingleFlight("search") if SEARCH_COALESCING != "off" else None
+
+# Misses simultâneos do mesmo texto geram um único embedding (como o EmbeddingCache no app Flask)
+embedding_flight = AsyncSingleFlight("embeddings")
+
+# Chamadas simultâneas do worker à OpenAI na busca (o circuit breaker do resumo é o mesmo do app Flask)
+embed_limit = AsyncConcurrencyLimit("embed", SEARCH_EMBED_MAX_CONCURRENCY, OPENAI_QUEUE_TIMEOUT)
+summary_limit = AsyncConcurrencyLimit("summary", SEARCH_SUMMARY_MAX_CONCURRENCY, OPENAI_QUEUE_TIMEOUT)
+
+# Indica se as conexões deste worker já foram abertas com sucesso (ver /ready)
+_ready = False
+
+
+@real_estate_async.before_request
+async def apply_catalog_changes():
+    g.request_started = time.perf_counter()
+    # A consulta ao MongoDB é síncrona e limitada por CATALOG_POLL_INTERVAL; roda fora do event loop,
+    # e só quando estiver na hora (as demais requisições não passam por uma thread)
+    if catalog_poll_due():
+        await asyncio.to_thread(poll_catalog_changes)
+
+
+@real_estate_async.after_request
+async def add_server_timing(response):
+    """
+    Publica os tempos de cada estágio no header Server-Timing e registra a duração da requisição
+    """
+    elapsed = time.perf_counter() - g.request_started
+    timings = g.get('server_timing')
+    if timings and response.mimetype != 'text/event-stream':
+        response.headers['Server-Timing'] = server_timing_header(timings + [('total', elapsed)])
+    record_request(request.endpoint, response.status_code, elapsed)
+    return response
+
+
+def request_timings() -> Optional[Timings]:
+    return g.setdefault('server_timing', []) if has_request_context() else None
+
+
+def search_openai_client():
+    """
+    Cliente da OpenAI usado pela busca: sem novas tentativas automáticas, que estourariam o orçamento da requisição
+    """
+    return get_async_openai_client().with_options(max_retries=0)
+
+async def _create_search_embeddings(texts, deadline: Optional[Deadline] = None) -> List[List[float]]:
+    async with embed_limit.slot(deadline):
+        timeout = call_timeout(deadline, SEARCH_EMBED_TIMEOUT)
+        response = await asyncio.wait_for(search_openai_client().embeddings.create(
+            input=texts, timeout=timeout, **embedding_profile.request_kwargs()
+        ), timeout)
+    record_usage(embedding_profile.model, response.usage)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+async def get_or_create_embeddings(queries: List[str], deadline: Optional[Deadline] = None) -> List[List[float]]:
+    """
+    Consulta o cache e gera os embeddings ausentes com uma única chamada; os textos que outra
+    requisição do worker já está gerando são aguardados em vez de pedidos de novo
+    """
+    lookups = await asyncio.to_thread(
+        lambda: [embedding_cache.lookup(query, embedding_profile.name) for query in queries]
+    )
+    missing = {key: text for key, text, embedding in lookups if embedding is None}
+    created = {}
+    if missing:
+        async def create_missing(keys: List[str]) -> Dict[str, List[float]]:
+            embeddings = dict(zip(keys, await _create_search_embeddings([missing[key] for key in keys], deadline)))
+            await asyncio.to_thread(
+                lambda: [embedding_cache.store(key, embedding_profile.name, embedding)
+                         for key, embedding in embeddings.items()]
+            )
+            return embeddings
+
+        created = await embedding_flight.do_many(list(missing), create_missing)
+    return [embedding if embedding is not None else created[key] for key, _, embedding in lookups]
+
+async def get_search_embedding(query: str, deadline: Optional[Deadline] = None) -> List[float]:
+    """
+    Gera embedding para o texto de busca, reaproveitando o cache quando possível
+    """
+    with stage('embed', request_timings()):
+        return (await get_or_create_embeddings([query], deadline))[0]
+
+async def get_search_embeddings(queries: List[str], deadline: Optional[Deadline] = None) -> List[List[float]]:
+    """
+    Gera os embeddings de várias buscas com uma única chamada à OpenAI para os textos fora do cache
+    """
+    with stage('embed', request_timings()):
+        return await get_or_create_embeddings(queries, deadline)
+
+async def generate_summary(results: List[Dict], query: str, deadline: Optional[Deadline] = None) -> str:
+    """
+    Gera um resumo dos resultados da pesquisa usando a API da OpenAI, dentro do orçamento da requisição
+    """
+    summary_breaker.check()
+    async with summary_limit.slot(deadline):
+        timeout = call_timeout(deadline, SEARCH_SUMMARY_TIMEOUT)
+        try:
+            response = await asyncio.wait_for(
+                search_openai_client().chat.completions.create(**summary_request(results, query), timeout=timeout),
+                timeout
+            )
+        except Exception:
+            summary_breaker.record_failure()
+            raise
+    summary_breaker.record_success()
+    record_usage(SUMMARY_MODEL, response.usage)
+    return response.choices[0].message.content.strip()
+
+async def get_summary(results: List[Dict], query: str, use_cache: bool = True,
+                      deadline: Optional[Deadline] = None) -> str:
+    """
+    Retorna o resumo dos resultados, reaproveitando o cache de resumos quando permitido
+    """
+    with stage('summary', request_timings()):
+        if not use_cache:
+            return await generate_summary(results, query, deadline)
+
+        key = summary_cache_key(results, query)
+        summary = summary_cache.get(key)
+        if summary is None:
+            summary = await generate_summary(results, query, deadline)
+            summary_cache.set(key, summary, [r['id'] for r in results])
+        return summary
+
+async def get_summary_or_degraded(results: List[Dict], query: str, use_cache: bool = True,
+                                  deadline: Optional[Deadline] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Resumo dos resultados, ou (None, motivo) quando ele não sai dentro do orçamento
+    """
+    try:
+        return await get_summary(results, query, use_cache, deadline), None
+    except Exception as e:
+        return None, record_degradation('summary', e)
+
+async def generate_summary_stream(results: List[Dict], query: str,
+                                  deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+    """
+    Gera o resumo dos resultados em streaming, devolvendo os tokens conforme chegam da OpenAI;
+    o orçamento total é verificado a cada chunk
+    """
+    summary_breaker.check()
+    async with summary_limit.slot(deadline):
+        timeout = call_timeout(deadline, SEARCH_SUMMARY_TIMEOUT)
+        try:
+            stream = await asyncio.wait_for(search_openai_client().chat.completions.create(
+                **summary_request(results, query), stream=True, stream_options={"include_usage": True},
+                timeout=timeout
+            ), timeout)
+            async for chunk in stream:
+                if deadline is not None and deadline.expired():
+                    await stream.close()
+                    raise DeadlineExceeded("Orçamento de tempo da requisição esgotado")
+                if getattr(chunk, 'usage', None):
+                    record_usage(SUMMARY_MODEL, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception:
+            summary_breaker.record_failure()
+            raise
+    summary_breaker.record_success()
+
+def start_prefilter(vector_filter) -> asyncio.Task:
+    """
+    Inicia a parte da busca vetorial que não depende do embedding da consulta (com o backend local,
+    a leitura dos ids que passam no filtro), para rodar em paralelo com o embedding
+    """
+    task = asyncio.ensure_future(get_search_backend().aprefilter(vector_filter))
+    # Descartada sem ser aguardada quando a resposta sai do cache semântico ou o embedding falha
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return task
+
+async def run_vector_search(query_embedding: List[float], limit: int, vector_filter=None,
+                            prefilter: Optional[asyncio.Task] = None) -> List[Dict]:
+    with stage('vector_search', request_timings()):
+        prefiltered = await prefilter if prefilter is not None else None
+        results = await get_search_backend().asearch(query_embedding, limit, vector_filter, prefiltered)
+    formatted_results = format_search_results(results)
+    record_results('candidates', len(results))
+    record_results('returned', len(formatted_results))
+    return formatted_results
+
+async def run_search(params: Dict, deadline: Optional[Deadline] = None) -> Dict:
+    """
+    Executa a busca completa: embedding, busca vetorial e resumo. O que a busca vetorial não precisa
+    esperar do embedding (a leitura do filtro no backend local) roda em paralelo com ele.
+    Consultas quase idênticas a uma recente são servidas pelo cache semântico logo após o embedding.
+    Se o resumo não sair dentro do orçamento, a resposta traz os resultados com summary None e o motivo em `degraded`.
+    """
+    prefilter = start_prefilter(params['vector_filter'])
+    try:
+        query_embedding = await get_search_embedding(params['query'], deadline)
+
+        context = semantic_cache_context(params)
+        if context:
+            cached = semantic_cache.get(query_embedding, context)
+            if cached is not None:
+                return cached
+
+        candidates = await run_vector_search(
+            query_embedding, candidates_limit(params), params['vector_filter'], prefilter
+        )
+    finally:
+        prefilter.cancel()
+    formatted_results, facets = split_facets(candidates, params)
+
+    summary, reason = await get_summary_or_degraded(
+        formatted_results, params['query'], params['use_summary_cache'], deadline
+    )
+
+    payload = {
+        'results': formatted_results,
+        'summary': summary
+    }
+    if facets is not None:
+        payload['facets'] = facets
+    if reason:
+        payload['degraded'] = {'summary': reason}
+    elif context:
+        semantic_cache.set(query_embedding, context, payload)
+    return payload
+
+async def _parse_search_request() -> Dict:
+    return parse_search_params(await request.get_json(silent=True))
+
+def unavailable_response(stage_name: str, error: Exception):
+    """
+    Resposta 503 quando a busca não pode continuar sem o estágio (embedding) por timeout, capacidade ou falha
+    """
+    reason = record_degradation(stage_name, error)
+    return jsonify({'error': 'Busca temporariamente indisponível', 'degraded': {stage_name: reason}}), 503, \
+        {'Retry-After': '1'}
+
+async def warm_up() -> Dict[str, str]:
+    """
+    Abre as conexões com o MongoDB e a OpenAI em paralelo, esperando no máximo WARM_UP_TIMEOUT segundos
+    (a chamada à OpenAI tem o mesmo timeout e nenhuma retentativa). Marca o worker como pronto quando as
+    duas respondem; retorna os erros por serviço.
+    """
+    global _ready
+    openai_client = get_async_openai_client().with_options(timeout=WARM_UP_TIMEOUT, max_retries=0)
+    names = ('mongo', 'openai')
+    results = await asyncio.gather(
+        asyncio.wait_for(get_async_mongo_collection("properties").database.command("ping"), WARM_UP_TIMEOUT),
+        asyncio.wait_for(openai_client.models.retrieve(embedding_profile.model), WARM_UP_TIMEOUT),
+        return_exceptions=True
+    )
+    errors = {}
+    for name, result in zip(names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            errors[name] = f"sem resposta em {WARM_UP_TIMEOUT:g}s"
+        elif isinstance(result, Exception):
+            errors[name] = str(result)
+        if name in errors:
+            print(f"Aviso: falha ao aquecer conexões ({name}): {errors[name]}")
+    if not errors:
+        _ready = True
+    return errors
+
+
+@real_estate_async.route('/search', methods=['POST'])
+async def search():
+    """
+    Endpoint para busca vetorial de imóveis
+    """
+    try:
+        params = await _parse_search_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    query = params['query']
+
+    if not query:
+        return jsonify({'error': 'Query não fornecida'}), 400
+
+    deadline = Deadline(SEARCH_DEADLINE)
+    try:
+        if search_flight is None:
+            return jsonify(await run_search(params, deadline))
+        return jsonify(await search_flight.do(search_flight_key(params), lambda: run_search(params, deadline)))
+
+    except Exception as e:
+        if is_unavailable(e):
+            return unavailable_response('embed', e)
+        return jsonify({'error': str(e)}), 500
+
+
+@real_estate_async.route('/search/stream', methods=['POST'])
+async def search_stream():
+    """
+    Endpoint de busca em streaming (Server-Sent Events), igual ao da versão Flask
+    """
+    try:
+        params = await _parse_search_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    query = params['query']
+
+    if not query:
+        return jsonify({'error': 'Query não fornecida'}), 400
+
+    deadline = Deadline(SEARCH_DEADLINE)
+
+    async def events():
+        timings = {}
+        started = time.perf_counter()
+        prefilter = start_prefilter(params['vector_filter'])
+        try:
+            stage_started = time.perf_counter()
+            query_embedding = await get_search_embedding(query, deadline)
+            timings['embedding_ms'] = (time.perf_counter() - stage_started) * 1000
+
+            context = semantic_cache_context(params)
+            cached = semantic_cache.get(query_embedding, context) if context else None
+            if cached is not None:
+                yield sse_event('results', {key: cached[key] for key in ('results', 'facets') if key in cached})
+                timings['time_to_results_ms'] = timings['time_to_first_token_ms'] = (time.perf_counter() - started) * 1000
+                yield sse_event('summary', {'token': cached['summary'], 'cached': True})
+                timings['total_ms'] = (time.perf_counter() - started) * 1000
+                yield sse_event('done', {'timings': {k: round(v, 1) for k, v in timings.items()}})
+                return
+
+            stage_started = time.perf_counter()
+            candidates = await run_vector_search(
+                query_embedding, candidates_limit(params), params['vector_filter'], prefilter
+            )
+            formatted_results, facets = split_facets(candidates, params)
+            timings['search_ms'] = (time.perf_counter() - stage_started) * 1000
+            yield sse_event('results', {'results': formatted_results, **({'facets': facets} if facets else {})})
+            timings['time_to_results_ms'] = (time.perf_counter() - started) * 1000
+
+            stage_started = time.perf_counter()
+            with stage('summary'):
+                key = summary_cache_key(formatted_results, query)
+                summary = summary_cache.get(key) if params['use_summary_cache'] else None
+                if summary is not None:
+                    timings['time_to_first_token_ms'] = (time.perf_counter() - started) * 1000
+                    yield sse_event('summary', {'token': summary, 'cached': True})
+                else:
+                    tokens = []
+                    try:
+                        async for token in generate_summary_stream(formatted_results, query, deadline):
+                            if 'time_to_first_token_ms' not in timings:
+                                timings['time_to_first_token_ms'] = (time.perf_counter() - started) * 1000
+                            tokens.append(token)
+                            yield sse_event('summary', {'token': token})
+                    except Exception as e:
+                        summary = None
+                        yield sse_event('degraded', {'stage': 'summary', 'reason': record_degradation('summary', e)})
+                    else:
+                        summary = ''.join(tokens).strip()
+                        if params['use_summary_cache']:
+                            summary_cache.set(key, summary, [r['id'] for r in formatted_results])
+            timings['summary_ms'] = (time.perf_counter() - stage_started) * 1000
+            if context and summary is not None:
+                semantic_cache.set(query_embedding, context, {'results': formatted_results, 'summary': summary,
+                                                              **({'facets': facets} if facets else {})})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+        finally:
+            prefilter.cancel()
+
+        timings['total_ms'] = (time.perf_counter() - started) * 1000
+        yield sse_event('done', {'timings': {k: round(v, 1) for k, v in timings.items()}})
+
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@real_estate_async.route('/search/batch', methods=['POST'])
+async def search_batch():
+    """
+    Endpoint para várias buscas em uma requisição, igual ao da versão Flask
+    """
+    try:
+        params = parse_batch_search_params(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    items = params['items']
+    deadline = Deadline(SEARCH_DEADLINE)
+    prefilters = [start_prefilter(item['vector_filter']) for item in items]
+
+    try:
+        embeddings = await get_search_embeddings([item['query'] for item in items], deadline)
+    except Exception as e:
+        for prefilter in prefilters:
+            prefilter.cancel()
+        if is_unavailable(e):
+            return unavailable_response('embed', e)
+        return jsonify({'error': str(e)}), 500
+
+    async def run(item: Dict, query_embedding: List[float], prefilter: asyncio.Task) -> Dict:
+        result = {'query': item['query']}
+        try:
+            candidates = await run_vector_search(
+                query_embedding, candidates_limit(item), item['vector_filter'], prefilter
+            )
+            result['results'], facets = split_facets(candidates, item)
+            if facets is not None:
+                result['facets'] = facets
+            if params['summary']:
+                result['summary'], reason = await get_summary_or_degraded(
+                    result['results'], item['query'], item['use_summary_cache'], deadline
+                )
+                if reason:
+                    result['degraded'] = {'summary': reason}
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+
+    return jsonify({'results': await asyncio.gather(*map(run, items, embeddings, prefilters))})
+
+
+@real_estate_async.route('/ready', methods=['GET'])
+async def ready():
+    """
+    Endpoint de readiness: 200 depois que as conexões do worker foram abertas, 503 enquanto falharem
+    """
+    if not _ready:
+        errors = await warm_up()
+        if errors:
+            return jsonify({'status': 'unavailable', 'errors': errors}), 503
+    return jsonify({'status': 'ready'})
+
+
+@real_estate_async.route('/facets', methods=['GET'])
+async def facets():
+    """
+    Endpoint com as contagens por faceta do catálogo inteiro, igual ao da versão Flask
+    """
+    try:
+        fields = parse_facet_fields(request.args.get('fields')) if request.args.get('fields') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # O resumo é lido do MongoDB com o driver síncrono; roda fora do event loop
+        return jsonify(await asyncio.to_thread(facet_summary.get, fields))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@real_estate_async.route('/cache/stats', methods=['GET'])
+async def cache_stats():
+    """
+    Endpoint com os contadores de hit/miss dos caches do worker
+    """
+    return jsonify({
+        'embeddings': embedding_cache.get_stats(),
+        'summaries': summary_cache.get_stats(),
+        'semantic': semantic_cache.get_stats(),
+        'properties': property_cache.get_stats()
+    })
+
+
+async def get_property_entries(property_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Retorna os imóveis pedidos, servindo do cache e lendo os ausentes com uma única consulta $in
+    """
+    entries = {}
+    missing = missing_property_ids(property_ids, entries)
+    if missing:
+        cursor = get_async_mongo_collection("properties").find({'_id': {'$in': missing}}, PROPERTY_PROJECTION)
+        cache_property_documents(await cursor.to_list(), entries)
+    return entries
+
+
+@real_estate_async.route('/property/<property_id>', methods=['GET'])
+async def get_property(property_id: str):
+    """
+    Endpoint para buscar detalhes de um imóvel específico por ID (com ETag/Last-Modified e 304)
+    """
+    try:
+        entry = (await get_property_entries([property_id])).get(property_id)
+
+        if not entry:
+            return jsonify({'error': 'Imóvel não encontrado'}), 404
+
+        if is_not_modified(entry, request):
+            return set_validators(Response('', status=304), entry)
+
+        return set_validators(jsonify(entry['property']), entry)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@real_estate_async.route('/property/<property_id>/similar', methods=['GET'])
+async def get_similar_properties(property_id: str):
+    """
+    Endpoint de imóveis semelhantes: uma leitura por _id da lista pré-calculada na ingestão
+    """
+    try:
+        params = parse_similar_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        document = await get_async_mongo_collection("properties").find_one({'_id': property_id}, SIMILAR_PROJECTION)
+
+        if not document:
+            return jsonify({'error': 'Imóvel não encontrado'}), 404
+
+        similar = document.get('similar', [])[:params['limit']]
+        entries = await get_property_entries([neighbor['id'] for neighbor in similar]) if params['details'] else None
+        return jsonify(similar_response(property_id, similar, entries))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@real_estate_async.route('/properties', methods=['GET'])
+async def get_properties():
+    """
+    Endpoint para buscar vários imóveis de uma vez: GET /api/properties?ids=id1,id2,...
+    """
+    try:
+        property_ids = parse_property_ids(request.args.get('ids'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        entries = await get_property_entries(property_ids)
+        return jsonify({
+            'results': [entries[property_id]['property'] for property_id in property_ids if property_id in entries],
+            'missing': [property_id for property_id in property_ids if property_id not in entries]
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
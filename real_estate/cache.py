@@ -0,0 +1,477 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from real_estate.coalescing import SingleFlight
+from real_estate.metrics import record_cache_event
+
+
+_MISSING = object()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza o texto da busca (unicode, caixa e espaços) para uso como chave de cache
+    """
+    query = unicodedata.normalize("NFC", query)
+    return " ".join(query.casefold().split())
+
+
+class TTLCache:
+    """
+    Cache LRU em memória com expiração por tempo (thread-safe)
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> bool:
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def delete_where(self, predicate: Callable) -> int:
+        """
+        Remove as entradas cujo valor satisfaz `predicate` e retorna quantas foram removidas
+        """
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MongoEmbeddingStore:
+    """
+    Camada compartilhada do cache de embeddings em uma coleção do MongoDB.
+    A expiração é feita pelo próprio MongoDB através de um índice TTL.
+    """
+
+    def __init__(self, collection_name: str, ttl: int):
+        self.collection_name = collection_name
+        self.ttl = ttl
+        self._index_ready = False
+
+    @property
+    def collection(self):
+        # Resolvida a cada uso: o cliente do MongoDB é criado por processo (ver config.get_mongo_client)
+        from config import get_mongo_collection
+        return get_mongo_collection(self.collection_name)
+
+    def _ensure_index(self) -> None:
+        if not self._index_ready:
+            self.collection.create_index("created_at", expireAfterSeconds=self.ttl)
+            self._index_ready = True
+
+    def get(self, key: str) -> Optional[List[float]]:
+        doc = self.collection.find_one({"_id": key}, {"embedding": 1})
+        return doc["embedding"] if doc else None
+
+    def set(self, key: str, model: str, embedding: List[float]) -> None:
+        self._ensure_index()
+        self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "model": model,
+                "embedding": embedding,
+                "created_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+
+
+class SQLiteEmbeddingStore:
+    """
+    Camada compartilhada do cache de embeddings em um arquivo SQLite local,
+    para que todos os workers do gunicorn na mesma máquina reaproveitem os resultados.
+    """
+
+    # Intervalo mínimo (s) entre as remoções das entradas expiradas (a leitura já ignora as expiradas)
+    EXPIRE_INTERVAL = 60
+
+    def __init__(self, path: str, ttl: int):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._next_expire = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Cada processo (worker) abre a sua própria conexão
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "key TEXT PRIMARY KEY, model TEXT, embedding BLOB, created_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embedding_cache_created_at ON embedding_cache (created_at)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT embedding FROM embedding_cache WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        if row is None:
+            return None
+        return array("f", row[0]).tolist()
+
+    def set(self, key: str, model: str, embedding: List[float]) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO embedding_cache VALUES (?, ?, ?, ?)",
+                    (key, model, array("f", embedding).tobytes(), now)
+                )
+                if now >= self._next_expire:
+                    conn.execute("DELETE FROM embedding_cache WHERE created_at < ?", (now - self.ttl,))
+                    self._next_expire = now + min(self.EXPIRE_INTERVAL, self.ttl)
+
+
+def build_embedding_store(spec: str, ttl: int):
+    """
+    Cria a camada compartilhada do cache de embeddings a partir da configuração:
+    "" (desativada), "mongo" ou "sqlite:<caminho do arquivo>"
+    """
+    if not spec:
+        return None
+    if spec == "mongo":
+        return MongoEmbeddingStore("embedding_cache", ttl)
+    if spec.startswith("sqlite:"):
+        return SQLiteEmbeddingStore(spec[len("sqlite:"):], ttl)
+    raise ValueError(f"EMBEDDING_CACHE_SHARED inválido: {spec}")
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings de busca em dois níveis: LRU em memória (por processo)
+    e uma camada compartilhada opcional entre os workers (MongoDB ou SQLite).
+    """
+
+    def __init__(self, max_size: int, ttl: int, shared=None):
+        self.local = TTLCache(max_size, ttl)
+        self.shared = shared
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "shared_errors": 0}
+        self._stats_lock = threading.Lock()
+        # Misses simultâneos do mesmo texto geram um único embedding
+        self._flight = SingleFlight("embeddings")
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+        record_cache_event("embeddings", name)
+
+    def lookup(self, query: str, model: str) -> Tuple[str, str, Optional[List[float]]]:
+        """
+        Procura o embedding nos dois níveis e retorna (chave, texto normalizado, embedding ou None).
+        Em caso de miss o chamador gera o embedding do texto normalizado e chama `store`.
+        """
+        text = normalize_query(query)
+        key = self.make_key(text, model)
+
+        embedding = self.local.get(key)
+        if embedding is not None:
+            self._count("hits")
+            return key, text, embedding
+
+        if self.shared is not None:
+            try:
+                embedding = self.shared.get(key)
+            except Exception as e:
+                self._count("shared_errors")
+                print(f"Aviso: falha ao ler cache compartilhado de embeddings: {e}")
+            if embedding is not None:
+                self._count("shared_hits")
+                self.local.set(key, embedding)
+                return key, text, embedding
+
+        self._count("misses")
+        return key, text, None
+
+    def store(self, key: str, model: str, embedding: List[float]) -> None:
+        self.local.set(key, embedding)
+
+        if self.shared is not None:
+            try:
+                self.shared.set(key, model, embedding)
+            except Exception as e:
+                self._count("shared_errors")
+                print(f"Aviso: falha ao gravar cache compartilhado de embeddings: {e}")
+
+    def get_or_create(self, query: str, model: str, create: Callable[[str], List[float]]) -> List[float]:
+        """
+        Retorna o embedding do texto normalizado, chamando `create` apenas em caso de miss
+        (uma única vez para misses simultâneos do mesmo texto)
+        """
+        key, text, embedding = self.lookup(query, model)
+        if embedding is None:
+            embedding = self._flight.do(key, lambda: self._create_and_store(key, text, model, create))
+        return embedding
+
+    def get_or_create_many(self, queries: List[str], model: str,
+                           create: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Versão em lote de get_or_create: os textos fora do cache são gerados com uma única chamada
+        `create(textos)`, exceto os que já estão sendo gerados por outra requisição, que são aguardados
+        """
+        lookups = [self.lookup(query, model) for query in queries]
+        missing = {key: text for key, text, embedding in lookups if embedding is None}
+        created = {}
+        if missing:
+            def create_missing(keys: List[str]) -> Dict[str, List[float]]:
+                embeddings = dict(zip(keys, create([missing[key] for key in keys])))
+                for key, embedding in embeddings.items():
+                    self.store(key, model, embedding)
+                return embeddings
+
+            created = self._flight.do_many(list(missing), create_missing)
+        return [embedding if embedding is not None else created[key] for key, _, embedding in lookups]
+
+    def _create_and_store(self, key: str, text: str, model: str, create: Callable[[str], List[float]]) -> List[float]:
+        embedding = create(text)
+        self.store(key, model, embedding)
+        return embedding
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["size"] = len(self.local)
+        stats["hit_rate"] = (stats["hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+class SummaryCache:
+    """
+    Cache dos resumos gerados pelo LLM, indexado pela consulta normalizada,
+    pela lista ordenada de ids dos resultados e pela versão do modelo/prompt
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.cache = TTLCache(max_size, ttl)
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, property_ids: Iterable[str], model: str, prompt_version: str) -> str:
+        payload = "\x00".join([model, prompt_version, normalize_query(query), *property_ids])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+        record_cache_event("summaries", name, amount)
+
+    def get(self, key: str) -> Optional[str]:
+        item = self.cache.get(key)
+        self._count("hits" if item is not None else "misses")
+        return item[0] if item is not None else None
+
+    def set(self, key: str, summary: str, property_ids: Iterable[str]) -> None:
+        self.cache.set(key, (summary, frozenset(property_ids)))
+
+    def invalidate_properties(self, property_ids: Iterable[str]) -> int:
+        """
+        Remove os resumos que citam algum dos imóveis alterados
+        """
+        changed = set(property_ids)
+        removed = self.cache.delete_where(lambda item: not changed.isdisjoint(item[1]))
+        self._count("invalidated", removed)
+        return removed
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["size"] = len(self.cache)
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class SemanticCache:
+    """
+    Cache semântico da busca: guarda os embeddings das consultas recentes em uma matriz e
+    reaproveita o resultado (imóveis e resumo) de uma consulta anterior quando a similaridade
+    de cosseno com a nova consulta atinge `threshold` e o contexto (limite, filtros, modelos) é o mesmo.
+    Qualquer alteração do catálogo limpa o cache: um imóvel novo pode mudar o resultado de qualquer consulta.
+    """
+
+    def __init__(self, max_size: int, ttl: float, threshold: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._matrix: Optional[np.ndarray] = None
+        self._active = np.zeros(max_size, dtype=bool)
+        self._contexts = np.empty(max_size, dtype=object)
+        # slot da matriz -> (expira em, resultado), da consulta usada há mais tempo para a mais recente
+        self._entries = OrderedDict()
+        self._free = list(range(max_size))
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def make_context(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+        record_cache_event("semantic", name, amount)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _release(self, slot: int) -> None:
+        del self._entries[slot]
+        self._active[slot] = False
+        self._contexts[slot] = None
+        self._free.append(slot)
+
+    def get(self, embedding: List[float], context: str) -> Optional[Dict]:
+        if not self.max_size:
+            return None
+        query = self._normalize(embedding)
+        with self._lock:
+            value = None
+            if self._entries and self._matrix is not None and self._matrix.shape[1] == query.shape[0]:
+                scores = self._matrix @ query
+                scores[~(self._active & (self._contexts == context))] = -np.inf
+                slot = int(np.argmax(scores))
+                if scores[slot] >= self.threshold:
+                    expires_at, value = self._entries[slot]
+                    if expires_at < time.monotonic():
+                        self._release(slot)
+                        value = None
+                    else:
+                        self._entries.move_to_end(slot)
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, embedding: List[float], context: str, value: Dict) -> None:
+        if not self.max_size:
+            return
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._clear()
+            if not self._free:
+                self._release(next(iter(self._entries)))
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._active[slot] = True
+            self._contexts[slot] = context
+            self._entries[slot] = (time.monotonic() + self.ttl, value)
+
+    def _clear(self) -> int:
+        removed = len(self._entries)
+        self._entries.clear()
+        self._active[:] = False
+        self._contexts[:] = None
+        self._free = list(range(self.max_size))
+        return removed
+
+    def invalidate_properties(self, property_ids: Iterable[str]) -> int:
+        with self._lock:
+            removed = self._clear()
+        self._count("invalidated", removed)
+        return removed
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["size"] = len(self._entries)
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class PropertyCache:
+    """
+    Cache dos imóveis já formatados para a resposta (com ETag e Last-Modified),
+    invalidado quando o imóvel é regravado pela ingestão
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.cache = TTLCache(max_size, ttl)
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+        record_cache_event("properties", name, amount)
+
+    def get(self, property_id: str) -> Optional[dict]:
+        entry = self.cache.get(property_id)
+        self._count("hits" if entry is not None else "misses")
+        return entry
+
+    def set(self, property_id: str, entry: dict) -> None:
+        self.cache.set(property_id, entry)
+
+    def invalidate_properties(self, property_ids: Iterable[str]) -> int:
+        removed = sum(self.cache.delete(property_id) for property_id in property_ids)
+        self._count("invalidated", removed)
+        return removed
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["size"] = len(self.cache)
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
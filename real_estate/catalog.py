@@ -0,0 +1,108 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional
+
+from pymongo import ReturnDocument
+
+from config import get_mongo_collection, CATALOG_POLL_INTERVAL
+
+
+# Retenção dos registros de alteração no MongoDB (s); o índice TTL é criado pelo init_db.py
+CHANGES_TTL = 24 * 3600
+
+# Os registros têm como _id um número sequencial gerado pelo servidor ($inc em um contador), e não um
+# ObjectId do cliente, que não é crescente entre processos e máquinas. Um número pode ficar visível depois
+# do seguinte (gravações concorrentes); a consulta espera até GAP_GRACE segundos por ele antes de seguir.
+COUNTER_ID = "catalog_changes"
+GAP_GRACE = 10
+
+_listeners: List[Callable[[List[str]], None]] = []
+_poll_lock = threading.Lock()
+_last_change_id = None
+_last_poll = 0.0
+_gap_seen_at: Optional[float] = None
+
+
+def on_catalog_change(callback: Callable[[List[str]], None]) -> Callable[[List[str]], None]:
+    """
+    Registra uma função chamada com os ids dos imóveis alterados (pode ser usada como decorator)
+    """
+    _listeners.append(callback)
+    return callback
+
+
+def notify_catalog_change(property_ids: Iterable[str]) -> None:
+    """
+    Notifica os caches deste processo sobre imóveis alterados
+    """
+    property_ids = list(property_ids)
+    if not property_ids:
+        return
+    for callback in _listeners:
+        try:
+            callback(property_ids)
+        except Exception as e:
+            print(f"Aviso: falha ao processar alteração do catálogo: {e}")
+
+
+def record_catalog_change(property_ids: Iterable[str]) -> None:
+    """
+    Usado pela ingestão após gravar imóveis: registra a alteração no MongoDB para que os
+    workers da API invalidem seus caches, e notifica o processo atual
+    """
+    property_ids = list(property_ids)
+    if not property_ids:
+        return
+    counter = get_mongo_collection("counters").find_one_and_update(
+        {"_id": COUNTER_ID}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    get_mongo_collection("catalog_changes").insert_one({
+        "_id": counter["seq"],
+        "property_ids": property_ids,
+        "created_at": datetime.now(timezone.utc)
+    })
+    notify_catalog_change(property_ids)
+
+
+def catalog_poll_due() -> bool:
+    """
+    Indica se já passou CATALOG_POLL_INTERVAL desde a última consulta (a rota assíncrona só cria a
+    thread da consulta quando ela vai de fato acontecer)
+    """
+    return time.monotonic() - _last_poll >= CATALOG_POLL_INTERVAL
+
+def poll_catalog_changes(force: bool = False) -> None:
+    """
+    Aplica neste processo as alterações registradas por outros processos.
+    Consulta o MongoDB no máximo uma vez a cada CATALOG_POLL_INTERVAL segundos.
+    """
+    global _last_change_id, _last_poll, _gap_seen_at
+
+    if not force and time.monotonic() - _last_poll < CATALOG_POLL_INTERVAL:
+        return
+    if not _poll_lock.acquire(blocking=False):
+        return
+    try:
+        _last_poll = time.monotonic()
+        if _last_change_id is None:
+            # Primeira consulta do processo: parte do último número gerado, sem reprocessar o histórico
+            counter = get_mongo_collection("counters").find_one({"_id": COUNTER_ID})
+            _last_change_id = counter["seq"] if counter else 0
+            return
+
+        collection = get_mongo_collection("catalog_changes")
+        for change in collection.find({"_id": {"$gt": _last_change_id}}).sort("_id", 1):
+            if change["_id"] != _last_change_id + 1:
+                # Lacuna: um registro anterior ainda não apareceu (ou a gravação dele falhou)
+                if _gap_seen_at is None:
+                    _gap_seen_at = time.monotonic()
+                if time.monotonic() - _gap_seen_at < GAP_GRACE:
+                    break
+            _gap_seen_at = None
+            _last_change_id = change["_id"]
+            notify_catalog_change(change["property_ids"])
+    except Exception as e:
+        print(f"Aviso: falha ao consultar alterações do catálogo: {e}")
+    finally:
+        _poll_lock.release()
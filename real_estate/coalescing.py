@@ -0,0 +1,235 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from real_estate.metrics import record_coalescing
+
+
+_MISSING = object()
+
+
+class SingleFlight:
+    """
+    Coalescência de chamadas concorrentes (single-flight) dentro do processo: enquanto uma chamada
+    com a mesma chave está em andamento, as demais aguardam e recebem o mesmo resultado (ou a mesma exceção)
+    """
+
+    def __init__(self, name: str, shared=None):
+        self.name = name
+        # Camada opcional entre workers (MongoFlight), consultada só pela chamada líder do processo
+        self.shared = shared
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], object], deadline=None):
+        """
+        `deadline` (real_estate.resilience.Deadline) limita a espera pelo líder de outro worker
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            record_coalescing(self.name, "follower")
+            return future.result()
+
+        record_coalescing(self.name, "leader")
+        try:
+            result = self.shared.do(key, func, deadline) if self.shared else func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do_many(self, keys: List[str], func: Callable[[List[str]], Dict[str, object]]) -> Dict[str, object]:
+        """
+        Versão em lote (sem a camada entre workers): as chaves já em andamento aguardam as chamadas
+        em curso, e as demais são calculadas por uma única chamada `func(chaves)`, que retorna {chave: resultado}
+        """
+        futures, leaders = {}, []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                future = self._calls.get(key)
+                if future is None:
+                    future = self._calls[key] = Future()
+                    leaders.append(key)
+                futures[key] = future
+        for key in futures:
+            record_coalescing(self.name, "leader" if key in leaders else "follower")
+
+        if leaders:
+            try:
+                results = func(leaders)
+                for key in leaders:
+                    futures[key].set_result(results[key])
+            except BaseException as e:
+                for key in leaders:
+                    if not futures[key].done():
+                        futures[key].set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    for key in leaders:
+                        self._calls.pop(key, None)
+        return {key: future.result() for key, future in futures.items()}
+
+
+class AsyncSingleFlight:
+    """
+    Versão para o event loop (modo ASGI): a computação roda em uma task própria, de modo que
+    o cancelamento de uma requisição (cliente desconectou) não cancela as que aguardam o mesmo resultado
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is None:
+            record_coalescing(self.name, "leader")
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            record_coalescing(self.name, "follower")
+        return await asyncio.shield(task)
+
+    async def do_many(self, keys: List[str], func: Callable[[List[str]], Awaitable[Dict[str, object]]]) -> Dict[str, object]:
+        """
+        Versão em lote: as chaves já em andamento aguardam as tasks em curso, e as demais são
+        calculadas por uma única chamada `func(chaves)`, que retorna {chave: resultado}
+        """
+        tasks, leaders = {}, []
+        for key in dict.fromkeys(keys):
+            task = self._calls.get(key)
+            if task is None:
+                leaders.append(key)
+            else:
+                record_coalescing(self.name, "follower")
+                tasks[key] = task
+        if leaders:
+            batch = asyncio.ensure_future(func(leaders))
+            for key in leaders:
+                record_coalescing(self.name, "leader")
+                task = tasks[key] = self._calls[key] = asyncio.ensure_future(self._pick(batch, key))
+                task.add_done_callback(lambda _, key=key: self._calls.pop(key, None))
+        results = await asyncio.shield(asyncio.gather(*tasks.values()))
+        return dict(zip(tasks, results))
+
+    @staticmethod
+    async def _pick(batch: asyncio.Future, key: str):
+        return (await asyncio.shield(batch))[key]
+
+
+class MongoFlight:
+    """
+    Coalescência entre workers (e máquinas) através de uma coleção do MongoDB: o worker que
+    consegue inserir o documento da chave executa a chamada e grava o resultado nele; os demais
+    aguardam o resultado consultando o documento. Se o líder falhar ou demorar mais que `timeout`,
+    cada worker executa a chamada por conta própria. Erros do MongoDB nunca impedem a busca.
+    """
+
+    def __init__(self, collection_name: str, timeout: float, grace: float, poll_interval: float = 0.05):
+        self.collection_name = collection_name
+        self.timeout = timeout
+        # Por quanto tempo o resultado fica disponível para quem chegou enquanto ele era gravado
+        self.grace = grace
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._index_ready = False
+
+    @property
+    def collection(self):
+        from config import get_mongo_collection
+        return get_mongo_collection(self.collection_name)
+
+    def _ensure_index(self) -> None:
+        if not self._index_ready:
+            # Remove os documentos de líderes que morreram (o TTL do MongoDB roda a cada ~60 s)
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+
+    def _acquire(self, key: str) -> bool:
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.now(timezone.utc)
+        document = {"_id": key, "owner": self.owner, "expires_at": now + timedelta(seconds=self.timeout)}
+        try:
+            self.collection.insert_one(document)
+            return True
+        except DuplicateKeyError:
+            # Documento vencido (líder morto ou resultado antigo) ainda não removido pelo TTL
+            if self.collection.delete_one({"_id": key, "expires_at": {"$lt": now}}).deleted_count:
+                return self._acquire(key)
+            return False
+
+    def _wait(self, key: str, timeout: float):
+        expires = time.monotonic() + timeout
+        while time.monotonic() < expires:
+            document = self.collection.find_one({"_id": key}, {"result": 1, "failed": 1})
+            if document is None or document.get("failed"):
+                return _MISSING
+            if "result" in document:
+                return document["result"]
+            time.sleep(self.poll_interval)
+        return _MISSING
+
+    def do(self, key: str, func: Callable[[], object], deadline=None):
+        try:
+            self._ensure_index()
+            leader = self._acquire(key)
+            if not leader:
+                # Não espera o líder além do orçamento da própria requisição
+                result = self._wait(key, min(self.timeout, deadline.remaining()) if deadline else self.timeout)
+                if result is not _MISSING:
+                    record_coalescing("mongo", "follower")
+                    return result
+        except Exception as e:
+            print(f"Aviso: falha na coalescência via MongoDB: {e}")
+            return func()
+
+        if not leader:
+            record_coalescing("mongo", "fallback")
+            return func()
+
+        record_coalescing("mongo", "leader")
+        try:
+            result = func()
+        except BaseException:
+            self._release(key, {"failed": True})
+            raise
+        self._release(key, {"result": result})
+        return result
+
+    def _release(self, key: str, fields: Dict) -> None:
+        fields["expires_at"] = datetime.now(timezone.utc) + timedelta(seconds=self.grace)
+        try:
+            self.collection.update_one({"_id": key, "owner": self.owner}, {"$set": fields})
+        except Exception as e:
+            print(f"Aviso: falha ao publicar resultado coalescido: {e}")
+
+
+def build_search_flight(mode: str, timeout: float, grace: float) -> Optional[SingleFlight]:
+    """
+    Cria a coalescência da busca a partir da configuração: "off", "local" (por worker)
+    ou "mongo" (por worker e entre workers)
+    """
+    if mode == "off":
+        return None
+    if mode == "local":
+        return SingleFlight("search")
+    if mode == "mongo":
+        return SingleFlight("search", shared=MongoFlight("search_flights", timeout, grace))
+    raise ValueError(f"SEARCH_COALESCING inválido: {mode}")
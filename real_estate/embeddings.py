@@ -0,0 +1,147 @@
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+
+from config import (
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, EMBEDDING_STORAGE, EMBEDDING_INT8_RANGE, EMBEDDING_RESCORE
+)
+
+
+# Dimensão nativa dos modelos de embedding da OpenAI
+NATIVE_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+# Formatos de armazenamento do campo `embedding`:
+# - double: array BSON de doubles (formato original, 8+ bytes por dimensão)
+# - float32: BinData vector float32 (4 bytes por dimensão)
+# - int8: BinData vector int8 quantizado (1 byte por dimensão)
+STORAGE_FORMATS = ("double", "float32", "int8")
+
+
+class EmbeddingProfile:
+    """
+    Perfil de embedding usado de forma consistente na ingestão, na busca e no índice:
+    modelo, número de dimensões (parâmetro `dimensions` da OpenAI) e formato de armazenamento
+    """
+
+    def __init__(self, model: str, dimensions: Optional[int] = None, storage: str = "double",
+                 int8_range: Optional[float] = None, rescore: bool = False):
+        if storage not in STORAGE_FORMATS:
+            raise ValueError(f"EMBEDDING_STORAGE inválido: {storage} (use {', '.join(STORAGE_FORMATS)})")
+        self.model = model
+        self.dimensions = dimensions or NATIVE_DIMENSIONS.get(model, 1536)
+        self.storage = storage
+        # Faixa de valores representada no int8; o padrão (~6 desvios padrão de um vetor
+        # unitário) cobre praticamente todos os componentes sem desperdiçar resolução
+        self.int8_range = int8_range or round(6 / math.sqrt(self.dimensions), 4)
+        # Reordenação em precisão total só faz sentido quando o vetor indexado é quantizado
+        self.rescore = rescore and storage == "int8"
+
+    @property
+    def local_scores(self) -> bool:
+        """
+        Com vetores int8, o vectorSearchScore do Atlas não está na escala (1 + dot) / 2 usada pelo limiar
+        de pontuação e pelo cache semântico: a busca recalcula o score de todos os candidatos localmente
+        """
+        return self.storage == "int8"
+
+    @property
+    def name(self) -> str:
+        """
+        Identificador gravado em cada documento (`embedding_profile`), usado pela migração
+        """
+        name = f"{self.model}:{self.dimensions}:{self.storage}"
+        return f"{name}:{self.int8_range}" if self.storage == "int8" else name
+
+    @classmethod
+    def from_name(cls, name: str) -> "EmbeddingProfile":
+        parts = name.split(":")
+        int8_range = float(parts[3]) if len(parts) > 3 else None
+        return cls(parts[0], int(parts[1]), parts[2], int8_range)
+
+    def request_kwargs(self) -> Dict:
+        """
+        Parâmetros da chamada embeddings.create
+        """
+        kwargs = {"model": self.model, "encoding_format": "float"}
+        if self.dimensions != NATIVE_DIMENSIONS.get(self.model):
+            kwargs["dimensions"] = self.dimensions
+        return kwargs
+
+    def _quantize(self, vector: np.ndarray) -> List[int]:
+        scale = 127 / self.int8_range
+        return np.clip(np.rint(vector * scale), -127, 127).astype(np.int8).tolist()
+
+    def encode(self, embedding: List[float]):
+        """
+        Converte o embedding retornado pela OpenAI no formato de armazenamento do perfil
+        """
+        if self.storage == "double":
+            return list(embedding)
+        if self.storage == "float32":
+            return Binary.from_vector(list(embedding), BinaryVectorDtype.FLOAT32)
+        return Binary.from_vector(self._quantize(np.asarray(embedding, dtype=np.float32)), BinaryVectorDtype.INT8)
+
+    def encode_query(self, embedding: List[float]):
+        """
+        Vetor de consulta do $vectorSearch, no mesmo tipo do vetor indexado
+        """
+        if self.storage == "int8":
+            return self.encode(embedding)
+        return list(embedding)
+
+    def decode(self, stored) -> np.ndarray:
+        """
+        Converte um embedding armazenado (em qualquer formato deste perfil) para float32
+        """
+        if isinstance(stored, Binary):
+            vector = stored.as_vector()
+            values = np.asarray(vector.data, dtype=np.float32)
+            if vector.dtype == BinaryVectorDtype.INT8:
+                values *= self.int8_range / 127
+            return values
+        return np.asarray(stored, dtype=np.float32)
+
+    def document_fields(self, embedding: List[float]) -> Dict:
+        """
+        Campos de embedding gravados em cada documento
+        """
+        fields = {"embedding": self.encode(embedding), "embedding_profile": self.name}
+        if self.rescore:
+            # Cópia em precisão total (float32) usada apenas para reordenar os candidatos
+            fields["embedding_full"] = Binary.from_vector(list(embedding), BinaryVectorDtype.FLOAT32)
+        return fields
+
+
+# Perfil dos documentos gravados antes dos perfis de embedding (sem `embedding_profile`):
+# array de doubles do text-embedding-3-small, qualquer que seja o EMBEDDING_MODEL configurado hoje
+LEGACY_PROFILE = EmbeddingProfile("text-embedding-3-small")
+
+
+def stored_profile_name(document: Dict) -> str:
+    """
+    Nome do perfil com que o embedding do documento foi gravado
+    """
+    return document.get("embedding_profile") or LEGACY_PROFILE.name
+
+
+def adapt_dimensions(vector: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    Reduz a dimensão de um embedding text-embedding-3 truncando e renormalizando,
+    o que equivale a pedir `dimensions` à API
+    """
+    if vector.shape[0] < dimensions:
+        raise ValueError(f"Não é possível aumentar a dimensão de {vector.shape[0]} para {dimensions}")
+    vector = vector[:dimensions]
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+embedding_profile = EmbeddingProfile(
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, EMBEDDING_STORAGE, EMBEDDING_INT8_RANGE, EMBEDDING_RESCORE
+)
@@ -0,0 +1,274 @@
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config import get_mongo_collection
+
+
+# Contagens por faceta (cidade, bairro, tipo, negócio, quartos, faixa de preço e amenidade).
+# O catálogo inteiro tem um resumo materializado na coleção facet_counts ({_id: "faceta:valor", count}),
+# atualizado de forma incremental pela ingestão: cada imóvel guarda em `facet_keys` as chaves com que
+# contribui, e uma regravação soma 1 nas chaves novas e subtrai 1 nas que deixaram de valer. Cada lote
+# é gravado com um único bulk_write em que a gravação de cada imóvel só vale se `facet_keys` ainda for o
+# que foi lido antes; os imóveis alterados no meio do caminho por outra gravação são relidos e regravados,
+# então gravações concorrentes do mesmo imóvel não descontam a mesma chave duas vezes.
+
+COLLECTION_NAME = "facet_counts"
+TOTAL_KEY = "total:all"
+WRITE_BATCH_SIZE = 1000
+# Tentativas de write_with_facets para imóveis regravados por outra gravação entre a leitura e o bulk_write
+WRITE_ATTEMPTS = 5
+DUPLICATE_KEY_ERROR = 11000
+
+# Limites inferiores das faixas de preço (R$); a última faixa é aberta ("5000000+")
+SALE_PRICE_BUCKETS = (0, 250000, 500000, 1000000, 2000000, 5000000)
+RENT_PRICE_BUCKETS = (0, 1500, 3000, 5000, 10000, 20000)
+
+FACET_FIELDS = ("city", "neighborhood", "type", "business_type", "bedrooms", "sale_price", "rent_price", "amenities")
+
+# Evita que as threads de gravação da importação recalculem o resumo ao mesmo tempo
+_rebuild_lock = threading.Lock()
+
+
+def price_bucket(value, buckets: Tuple[int, ...]) -> str:
+    for lower, upper in zip(buckets, buckets[1:]):
+        if value < upper:
+            return f"{lower}-{upper}"
+    return f"{buckets[-1]}+"
+
+
+def facet_values(property: Dict) -> Dict[str, List[str]]:
+    """
+    Valores de cada faceta para um imóvel (campo `dados`); amenidades podem ter vários valores
+    """
+    features, location, prices = property.get('features', {}), property.get('location', {}), property.get('prices', {})
+    values = {
+        "city": [location.get('city')],
+        "neighborhood": [location.get('neighborhood')],
+        "type": [property.get('type')],
+        "business_type": [property.get('business_type')],
+        "bedrooms": [features.get('bedrooms')],
+        "sale_price": [price_bucket(prices['sale_price'], SALE_PRICE_BUCKETS)] if 'sale_price' in prices else [],
+        "rent_price": [price_bucket(prices['rent_price'], RENT_PRICE_BUCKETS)] if 'rent_price' in prices else [],
+        "amenities": list(dict.fromkeys(property.get('amenities', [])))
+    }
+    return {facet: [str(value) for value in items if value is not None] for facet, items in values.items()}
+
+
+def facet_keys(property: Dict) -> List[str]:
+    """
+    Chaves "faceta:valor" com que o imóvel contribui para o resumo (inclui a do total)
+    """
+    return [TOTAL_KEY] + [f"{facet}:{value}" for facet, values in facet_values(property).items() for value in values]
+
+
+def _as_list(counts: Iterable[Tuple[str, int]]) -> List[Dict]:
+    # Lista (e não objeto) para manter a ordem da maior para a menor contagem no JSON
+    return [{"value": value, "count": count} for value, count in sorted(counts, key=lambda item: (-item[1], item[0]))]
+
+
+def count_facets(properties: Iterable[Dict], fields: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+    """
+    Contagens por faceta em uma única passada sobre os imóveis (campo `dados`), da maior para a menor
+    """
+    fields = fields or list(FACET_FIELDS)
+    counters = {facet: Counter() for facet in fields}
+    for property in properties:
+        values = facet_values(property)
+        for facet in fields:
+            counters[facet].update(values[facet])
+    return {facet: _as_list(counter.items()) for facet, counter in counters.items()}
+
+
+def parse_facet_fields(value) -> Optional[List[str]]:
+    """
+    Lê o parâmetro de facetas da busca: true (todas), uma lista de nomes ou um texto separado por vírgulas.
+    Retorna None quando as facetas não foram pedidas; lança ValueError para facetas desconhecidas.
+    """
+    if value is None or value is False:
+        return None
+    if value is True:
+        return list(FACET_FIELDS)
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(",") if item.strip()]
+    if not isinstance(value, list) or not value or not all(isinstance(item, str) for item in value):
+        raise ValueError("'facets' deve ser true ou uma lista de facetas")
+    unknown = [item for item in value if item not in FACET_FIELDS]
+    if unknown:
+        raise ValueError(f"Faceta desconhecida: '{unknown[0]}'. Facetas aceitas: {', '.join(FACET_FIELDS)}")
+    return list(dict.fromkeys(value))
+
+
+def _apply(deltas: Counter) -> None:
+    collection = get_mongo_collection(COLLECTION_NAME)
+    operations = []
+    for key, delta in deltas.items():
+        if delta:
+            facet, value = key.split(":", 1)
+            operations.append(UpdateOne({"_id": key}, {"$inc": {"count": delta},
+                                                      "$setOnInsert": {"facet": facet, "value": value}}, upsert=True))
+    for i in range(0, len(operations), WRITE_BATCH_SIZE):
+        collection.bulk_write(operations[i:i + WRITE_BATCH_SIZE], ordered=False)
+    if any(delta < 0 for delta in deltas.values()):
+        collection.delete_many({"count": {"$lte": 0}, "_id": {"$ne": TOTAL_KEY}})
+
+
+def rebuild_facets(collection_name: str = "properties") -> int:
+    """
+    Recalcula o resumo do catálogo inteiro e grava `facet_keys` em todos os imóveis.
+    O resumo é montado em uma coleção temporária que substitui facet_counts de uma vez (rename),
+    então a API nunca lê um resumo pela metade. Variações aplicadas por outro processo durante o
+    recálculo se perdem: execute com a ingestão parada.
+    """
+    properties = get_mongo_collection(collection_name)
+    totals, updates = Counter(), []
+    for doc in properties.find({"dados": {"$exists": True}}, {"dados": 1}):
+        keys = facet_keys(doc["dados"])
+        totals.update(keys)
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"facet_keys": keys}}))
+        if len(updates) == WRITE_BATCH_SIZE:
+            properties.bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        properties.bulk_write(updates, ordered=False)
+
+    # O total sempre existe (mesmo com o catálogo vazio): é por ele que a ingestão sabe que o resumo foi montado
+    totals.setdefault(TOTAL_KEY, 0)
+    rebuilt = get_mongo_collection(f"{COLLECTION_NAME}_rebuild")
+    rebuilt.drop()
+    documents = []
+    for key, count in totals.items():
+        facet, value = key.split(":", 1)
+        documents.append({"_id": key, "facet": facet, "value": value, "count": count})
+    for i in range(0, len(documents), WRITE_BATCH_SIZE):
+        rebuilt.insert_many(documents[i:i + WRITE_BATCH_SIZE], ordered=False)
+    rebuilt.rename(COLLECTION_NAME, dropTarget=True)
+    return totals[TOTAL_KEY]
+
+
+def _ensure_summary(collection) -> bool:
+    # Na primeira execução (resumo ainda inexistente) recalcula o resumo do catálogo já gravado;
+    # as demais threads de gravação esperam o recálculo antes de aplicar variações
+    try:
+        summary = get_mongo_collection(COLLECTION_NAME)
+        if not summary.count_documents({"_id": TOTAL_KEY}, limit=1):
+            with _rebuild_lock:
+                if not summary.count_documents({"_id": TOTAL_KEY}, limit=1):
+                    rebuild_facets(collection.name)
+        return True
+    except Exception as e:
+        print(f"Aviso: falha ao montar o resumo de facetas (execute python3 -m real_estate.facets): {e}")
+        return False
+
+
+def apply_facet_update(deltas: Counter) -> None:
+    try:
+        _apply(deltas)
+    except Exception as e:
+        print(f"Aviso: falha ao atualizar o resumo de facetas (execute python3 -m real_estate.facets): {e}")
+
+
+def write_with_facets(collection, updates: List[Tuple[Dict, Dict]]) -> int:
+    """
+    Usado pela ingestão para gravar um lote de imóveis com um único bulk_write não ordenado: cada par
+    (imóvel, update) vira um UpdateOne com upsert em que `facet_keys` entra no $set e o filtro exige as
+    `facet_keys` lidas antes da gravação. Quando outra gravação alterou o imóvel nesse intervalo, o filtro
+    não casa e o upsert esbarra no _id existente (chave duplicada): só esses imóveis são relidos e
+    regravados. A diferença entre as chaves novas e as anteriores é aplicada ao resumo no fim, inclusive
+    quando parte das gravações falhou. Falhas no resumo só geram um aviso; falhas na gravação são
+    propagadas. Retorna quantos imóveis foram criados.
+    """
+    if not updates:
+        return 0
+    summary_ready = _ensure_summary(collection)
+    deltas, created = Counter(), 0
+    pending = list(updates)
+    try:
+        for _ in range(WRITE_ATTEMPTS):
+            stored = {doc["_id"]: doc.get("facet_keys") for doc in collection.find(
+                {"_id": {"$in": [property["id"] for property, _ in pending]}}, {"facet_keys": 1}
+            )}
+            operations, keys = [], []
+            for property, update in pending:
+                keys.append(facet_keys(property))
+                previous = stored.get(property["id"])
+                condition = {"$exists": False} if previous is None else previous
+                operations.append(UpdateOne(
+                    {"_id": property["id"], "facet_keys": condition},
+                    {**update, "$set": {**update.get("$set", {}), "facet_keys": keys[-1]}},
+                    upsert=True
+                ))
+
+            error = None
+            try:
+                result = collection.bulk_write(operations, ordered=False).bulk_api_result
+            except BulkWriteError as e:
+                error, result = e, e.details
+            failed = {item["index"] for item in result.get("writeErrors", [])}
+            upserted = {item["index"] for item in result.get("upserted", [])}
+            for index, (property, _) in enumerate(pending):
+                if index not in failed:
+                    deltas.update(keys[index])
+                    # Criado pelo upsert: não havia chaves anteriores a descontar
+                    if index not in upserted:
+                        deltas.subtract(stored.get(property["id"]) or [])
+            created += len(upserted)
+
+            conflicts = {item["index"] for item in result.get("writeErrors", []) if item["code"] == DUPLICATE_KEY_ERROR}
+            if error is not None and failed - conflicts:
+                raise error
+            pending = [pending[index] for index in sorted(conflicts)]
+            if not pending:
+                return created
+        raise RuntimeError(f"{len(pending)} imóveis alterados por outras gravações em todas as {WRITE_ATTEMPTS} tentativas")
+    finally:
+        if summary_ready:
+            apply_facet_update(deltas)
+
+
+class FacetSummary:
+    """
+    Resumo de facetas do catálogo lido da coleção facet_counts e mantido em memória pelo worker
+    por até `ttl` segundos; invalidado quando a ingestão altera o catálogo
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._summary: Optional[Dict] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict:
+        facets = {facet: [] for facet in FACET_FIELDS}
+        total = 0
+        for doc in get_mongo_collection(COLLECTION_NAME).find({}, {"facet": 1, "value": 1, "count": 1}):
+            if doc["_id"] == TOTAL_KEY:
+                total = doc["count"]
+            elif doc.get("facet") in facets:
+                facets[doc["facet"]].append((doc["value"], doc["count"]))
+        return {
+            "total": total,
+            "facets": {facet: _as_list(values) for facet, values in facets.items()}
+        }
+
+    def get(self, fields: Optional[List[str]] = None) -> Dict:
+        with self._lock:
+            if self._summary is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._summary = self._load()
+                self._loaded_at = time.monotonic()
+            summary = self._summary
+        if not fields:
+            return summary
+        return {"total": summary["total"], "facets": {facet: summary["facets"][facet] for facet in fields}}
+
+    def invalidate_properties(self, property_ids: List[str]) -> None:
+        with self._lock:
+            self._summary = None
+
+
+if __name__ == "__main__":
+    print(f"Resumo de facetas recalculado ({rebuild_facets()} imóveis)")
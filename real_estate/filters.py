@@ -0,0 +1,77 @@
+from typing import Any, Dict, List, Optional
+
+
+# Filtros estruturados aceitos na busca: nome no request -> (caminho no documento, tipo)
+FILTER_FIELDS = {
+    "bedrooms": ("dados.features.bedrooms", "number"),
+    "area": ("dados.features.area", "number"),
+    "sale_price": ("dados.prices.sale_price", "number"),
+    "rent_price": ("dados.prices.rent_price", "number"),
+    "city": ("dados.location.city", "string"),
+    "state": ("dados.location.state", "string"),
+    "neighborhood": ("dados.location.neighborhood", "string"),
+    "business_type": ("dados.business_type", "string"),
+    "type": ("dados.type", "string"),
+    "amenities": ("dados.amenities", "all"),
+}
+
+RANGE_OPERATORS = {"min": "$gte", "max": "$lte"}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _number_condition(name: str, value: Any) -> Dict:
+    if _is_number(value):
+        return {"$eq": value}
+    if isinstance(value, dict) and value and set(value) <= set(RANGE_OPERATORS):
+        if not all(_is_number(bound) for bound in value.values()):
+            raise ValueError(f"Filtro '{name}': limites devem ser numéricos")
+        return {RANGE_OPERATORS[key]: bound for key, bound in value.items()}
+    raise ValueError(f"Filtro '{name}': use um número ou {{\"min\": ..., \"max\": ...}}")
+
+
+def _string_condition(name: str, value: Any) -> Dict:
+    if isinstance(value, str):
+        return {"$eq": value}
+    if isinstance(value, list) and value and all(isinstance(item, str) for item in value):
+        return {"$in": value}
+    raise ValueError(f"Filtro '{name}': use um texto ou uma lista de textos")
+
+
+def build_vector_filter(filters: Optional[Dict]) -> Optional[Dict]:
+    """
+    Converte os filtros do request no campo `filter` do $vectorSearch (MQL).
+    Os mesmos operadores também funcionam em um find() comum.
+    Lança ValueError para filtros desconhecidos ou mal formados.
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' deve ser um objeto")
+
+    conditions: List[Dict] = []
+    for name, value in filters.items():
+        if name not in FILTER_FIELDS:
+            raise ValueError(f"Filtro desconhecido: '{name}'. Filtros aceitos: {', '.join(FILTER_FIELDS)}")
+        path, kind = FILTER_FIELDS[name]
+        if kind == "number":
+            conditions.append({path: _number_condition(name, value)})
+        elif kind == "string":
+            conditions.append({path: _string_condition(name, value)})
+        else:
+            # Campos de lista: o imóvel precisa ter todas as amenidades pedidas
+            values = [value] if isinstance(value, str) else value
+            if not isinstance(values, list) or not values or not all(isinstance(item, str) for item in values):
+                raise ValueError(f"Filtro '{name}': use um texto ou uma lista de textos")
+            conditions.extend({path: {"$eq": item}} for item in values)
+
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def filter_index_fields() -> List[Dict]:
+    """
+    Declarações de campos de filtro para a definição do índice vetorial
+    """
+    return [{"type": "filter", "path": path} for path, _ in FILTER_FIELDS.values()]
@@ -0,0 +1,120 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+
+# Métricas da API no formato do Prometheus. Com PROMETHEUS_MULTIPROC_DIR definido (ver gunicorn.conf.py),
+# cada worker grava seus valores em arquivos nesse diretório e o /metrics agrega todos os workers.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_SECONDS = Histogram(
+    "api_request_seconds", "Duração das requisições da API", ["endpoint", "status"], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "search_stage_seconds", "Duração de cada estágio da busca", ["stage"], buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter("search_stage_errors_total", "Erros por estágio da busca", ["stage"])
+SEARCH_RESULTS = Histogram(
+    "search_results", "Quantidade de documentos retornados pela busca vetorial", ["kind"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+CACHE_EVENTS = Counter("cache_events_total", "Eventos dos caches (hits, misses, invalidações)", ["cache", "event"])
+OPENAI_TOKENS = Counter("openai_tokens_total", "Tokens consumidos na OpenAI", ["model", "kind"])
+COALESCED_CALLS = Counter(
+    "coalesced_calls_total", "Chamadas coalescidas: líderes executam, seguidores reaproveitam o resultado",
+    ["flight", "role"]
+)
+DEGRADED_STAGES = Counter(
+    "search_degraded_total", "Estágios da busca pulados ou interrompidos (timeout, capacidade, circuito aberto)",
+    ["stage", "reason"]
+)
+CIRCUIT_OPEN = Gauge(
+    "circuit_open", "1 enquanto o circuit breaker está aberto em algum worker", ["circuit"], multiprocess_mode="livemax"
+)
+
+# Par (estágio, duração em segundos) acumulado durante a requisição para o header Server-Timing
+Timings = List[Tuple[str, float]]
+
+
+@contextmanager
+def stage(name: str, timings: Optional[Timings] = None):
+    """
+    Mede um estágio da busca: alimenta o histograma, o contador de erros e, opcionalmente,
+    a lista de tempos da requisição usada no header Server-Timing
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def server_timing_header(timings: Timings) -> str:
+    """
+    Monta o header Server-Timing (durações em ms), somando estágios repetidos
+    """
+    totals = {}
+    for name, elapsed in timings:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in totals.items())
+
+
+def record_request(endpoint: Optional[str], status: int, elapsed: float) -> None:
+    REQUEST_SECONDS.labels(endpoint or "unknown", str(status)).observe(elapsed)
+
+
+def record_results(kind: str, count: int) -> None:
+    SEARCH_RESULTS.labels(kind).observe(count)
+
+
+def record_cache_event(cache: str, event: str, amount: int = 1) -> None:
+    if amount:
+        CACHE_EVENTS.labels(cache, event).inc(amount)
+
+
+def record_coalescing(flight: str, role: str) -> None:
+    COALESCED_CALLS.labels(flight, role).inc()
+
+
+def record_degraded(stage: str, reason: str) -> None:
+    DEGRADED_STAGES.labels(stage, reason).inc()
+
+
+def record_circuit_state(circuit: str, is_open: bool) -> None:
+    CIRCUIT_OPEN.labels(circuit).set(1 if is_open else 0)
+
+
+def record_usage(model: str, usage) -> None:
+    """
+    Contabiliza os tokens do campo `usage` de uma resposta da OpenAI
+    """
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        tokens = getattr(usage, kind, None)
+        if tokens:
+            OPENAI_TOKENS.labels(model, kind.replace("_tokens", "")).inc(tokens)
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """
+    Conteúdo do endpoint /metrics, agregando todos os workers quando em modo multiprocesso
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
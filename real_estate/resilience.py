@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from real_estate.metrics import record_circuit_state, record_degraded
+
+
+# Proteções do caminho de busca contra lentidão e falhas da OpenAI: orçamento de tempo por requisição,
+# limite de chamadas simultâneas por worker e circuit breaker do modelo de resumo
+
+# Abaixo deste tempo restante não vale a pena iniciar uma chamada (s)
+MIN_CALL_SECONDS = 0.1
+
+
+class Degraded(Exception):
+    """
+    Estágio pulado para proteger a requisição ou o worker; `reason` vai para a resposta e para as métricas
+    """
+    reason = "error"
+
+
+class DeadlineExceeded(Degraded):
+    reason = "deadline"
+
+
+class CircuitOpen(Degraded):
+    reason = "circuit_open"
+
+
+class CapacityExceeded(Degraded):
+    reason = "capacity"
+
+
+class Deadline:
+    """
+    Orçamento de tempo de uma requisição, compartilhado pelos estágios que chamam a OpenAI
+    """
+
+    def __init__(self, budget: float):
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """
+        Timeout de uma chamada: o menor entre o limite do estágio e o tempo restante da requisição
+        """
+        timeout = min(cap, self.remaining())
+        if timeout < MIN_CALL_SECONDS:
+            raise DeadlineExceeded("Orçamento de tempo da requisição esgotado")
+        return timeout
+
+
+def call_timeout(deadline: Optional[Deadline], cap: float) -> float:
+    return deadline.timeout(cap) if deadline else cap
+
+
+class CircuitBreaker:
+    """
+    Depois de `failure_threshold` falhas seguidas, deixa de chamar o serviço por `reset_timeout` segundos;
+    passado esse tempo, uma única chamada de teste decide se o circuito fecha ou volta a abrir
+    (se a chamada de teste não terminar, por exemplo um streaming abandonado pelo cliente, outra é
+    liberada depois de mais `reset_timeout` segundos)
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            now = time.monotonic()
+            if state == "half_open" and (self._probe_started is None
+                                         or now - self._probe_started >= self.reset_timeout):
+                self._probe_started = now
+                return True
+            return False
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpen(f"Circuito {self.name} aberto")
+
+    def record_success(self) -> None:
+        with self._lock:
+            closing = self._opened_at is not None
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+        if closing:
+            record_circuit_state(self.name, False)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            opening = self._probe_started is not None or \
+                (self._opened_at is None and self._failures >= self.failure_threshold)
+            if opening:
+                self._opened_at = time.monotonic()
+            self._probe_started = None
+        if opening:
+            print(f"Aviso: circuito {self.name} aberto por {self.reset_timeout:.0f}s após {self._failures} falhas")
+            record_circuit_state(self.name, True)
+
+
+class ConcurrencyLimit:
+    """
+    Limite de chamadas simultâneas a um serviço externo por worker: quem não consegue uma vaga em
+    `max_wait` segundos (ou no tempo restante da requisição) desiste, em vez de ocupar uma thread do worker
+    """
+
+    def __init__(self, name: str, limit: int, max_wait: float):
+        self.name = name
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None):
+        wait = min(self.max_wait, deadline.remaining()) if deadline else self.max_wait
+        if not self._semaphore.acquire(timeout=wait):
+            raise CapacityExceeded(f"Limite de chamadas simultâneas ({self.name}) atingido")
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+class AsyncConcurrencyLimit:
+    """
+    Versão para o event loop (modo ASGI) do ConcurrencyLimit
+    """
+
+    def __init__(self, name: str, limit: int, max_wait: float):
+        self.name = name
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[Deadline] = None):
+        wait = min(self.max_wait, deadline.remaining()) if deadline else self.max_wait
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), wait)
+        except asyncio.TimeoutError:
+            raise CapacityExceeded(f"Limite de chamadas simultâneas ({self.name}) atingido")
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+def degraded_reason(error: Exception) -> str:
+    """
+    Motivo da degradação a partir da exceção do estágio
+    """
+    from openai import APITimeoutError
+
+    if isinstance(error, Degraded):
+        return error.reason
+    if isinstance(error, (APITimeoutError, asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    return "error"
+
+
+def record_degradation(stage: str, error: Exception) -> str:
+    reason = degraded_reason(error)
+    if not isinstance(error, Degraded):
+        print(f"Aviso: estágio {stage} indisponível: {type(error).__name__} {error}")
+    record_degraded(stage, reason)
+    return reason
@@ -1,26 +1,151 @@
-from flask import Blueprint, request, jsonify
-from openai import OpenAI
-from config import get_mongo_collection, openai_client as client
-from typing import List, Dict
+from flask import Blueprint, Response, g, has_request_context, request, jsonify, stream_with_context
+from config import (
+    get_mongo_collection, get_openai_client,
+    EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_SHARED,
+    SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL, BATCH_SEARCH_MAX_QUERIES, BATCH_SEARCH_WORKERS,
+    PROPERTY_CACHE_SIZE, PROPERTY_CACHE_TTL, PROPERTIES_MAX_IDS,
+    SEARCH_COALESCING, SEARCH_COALESCING_TIMEOUT, SEARCH_COALESCING_GRACE,
+    SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_THRESHOLD, SIMILAR_K,
+    SEARCH_DEADLINE, SEARCH_EMBED_TIMEOUT, SEARCH_SUMMARY_TIMEOUT, SEARCH_EMBED_MAX_CONCURRENCY,
+    SEARCH_SUMMARY_MAX_CONCURRENCY, OPENAI_QUEUE_TIMEOUT, SUMMARY_BREAKER_FAILURES, SUMMARY_BREAKER_RESET,
+    FACETS_CACHE_TTL, FACETS_CANDIDATES, SEARCH_MAX_LIMIT, WARM_UP_TIMEOUT
+)
+from real_estate.cache import (
+    EmbeddingCache, SummaryCache, PropertyCache, SemanticCache, build_embedding_store, normalize_query
+)
+from real_estate.coalescing import build_search_flight
+from real_estate.catalog import on_catalog_change, poll_catalog_changes
+from real_estate.embeddings import embedding_profile
+from real_estate.facets import FacetSummary, count_facets, parse_facet_fields
+from real_estate.filters import build_vector_filter
+from real_estate.metrics import (
+    Timings, stage, server_timing_header, record_request, record_results, record_usage
+)
+from real_estate.resilience import (
+    CircuitBreaker, ConcurrencyLimit, Deadline, DeadlineExceeded, call_timeout, degraded_reason,
+    record_degradation
+)
+from real_estate.search_backends import get_search_backend
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import timezone
+from typing import Iterator, List, Dict, Optional, Tuple
+import hashlib
+import json
+import threading
+import time
 
 
 real_estate = Blueprint('real_estate', __name__)
 
+# Cache de embeddings de busca compartilhado por todas as requisições do worker
+embedding_cache = EmbeddingCache(
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL,
+    shared=build_embedding_store(EMBEDDING_CACHE_SHARED, EMBEDDING_CACHE_TTL)
+)
 
-def get_search_embedding(query: str) -> List[float]:
+# Cache de resumos, invalidado quando algum dos imóveis citados é regravado pela ingestão
+summary_cache = SummaryCache(SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL)
+on_catalog_change(summary_cache.invalidate_properties)
+
+# Cache semântico (resultados + resumo de consultas parecidas), limpo a cada alteração do catálogo
+semantic_cache = SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_THRESHOLD)
+on_catalog_change(semantic_cache.invalidate_properties)
+
+# Cache dos detalhes de imóveis, invalidado quando o imóvel é regravado pela ingestão
+property_cache = PropertyCache(PROPERTY_CACHE_SIZE, PROPERTY_CACHE_TTL)
+on_catalog_change(property_cache.invalidate_properties)
+
+# Resumo de facetas do catálogo (GET /facets), relido após cada alteração do catálogo
+facet_summary = FacetSummary(FACETS_CACHE_TTL)
+on_catalog_change(facet_summary.invalidate_properties)
+
+# Pool usado pela busca em lote para executar as buscas vetoriais e os resumos em paralelo
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_SEARCH_WORKERS)
+
+# Buscas idênticas simultâneas compartilham uma única execução (embedding, busca vetorial e resumo)
+search_flight = build_search_flight(SEARCH_COALESCING, SEARCH_COALESCING_TIMEOUT, SEARCH_COALESCING_GRACE)
+
+# Chamadas simultâneas do worker à OpenAI na busca: um incidente na OpenAI não pode prender todas as threads
+embed_limit = ConcurrencyLimit("embed", SEARCH_EMBED_MAX_CONCURRENCY, OPENAI_QUEUE_TIMEOUT)
+summary_limit = ConcurrencyLimit("summary", SEARCH_SUMMARY_MAX_CONCURRENCY, OPENAI_QUEUE_TIMEOUT)
+
+# Enquanto o modelo de resumo estiver falhando, a busca responde sem resumo sem chamá-lo
+summary_breaker = CircuitBreaker("summary", SUMMARY_BREAKER_FAILURES, SUMMARY_BREAKER_RESET)
+
+# Indica se as conexões deste worker já foram abertas com sucesso (ver /ready)
+_ready = False
+
+
+@real_estate.before_request
+def apply_catalog_changes():
+    g.request_started = time.perf_counter()
+    poll_catalog_changes()
+
+
+@real_estate.after_request
+def add_server_timing(response):
     """
-    Gera embedding para o texto de busca
+    Publica os tempos de cada estágio no header Server-Timing e registra a duração da requisição.
+    Nas respostas em streaming os headers saem antes dos estágios terminarem: os tempos vão no evento "done".
     """
-    response = client.embeddings.create(
-        input=query,
-        model="text-embedding-3-small",
-        encoding_format="float"
-    )
-    return response.data[0].embedding
+    elapsed = time.perf_counter() - g.request_started
+    timings = g.get('server_timing')
+    if timings and not response.is_streamed:
+        response.headers['Server-Timing'] = server_timing_header(timings + [('total', elapsed)])
+    record_request(request.endpoint, response.status_code, elapsed)
+    return response
+
+
+def request_timings() -> Optional[Timings]:
+    """
+    Tempos da requisição atual para o Server-Timing (None fora do contexto de requisição,
+    como nas threads da busca em lote, onde só as métricas do Prometheus são registradas)
+    """
+    return g.setdefault('server_timing', []) if has_request_context() else None
+
+
+def search_openai_client():
+    """
+    Cliente da OpenAI usado pela busca: sem novas tentativas automáticas, que estourariam o orçamento da requisição
+    """
+    return get_openai_client().with_options(max_retries=0)
+
+def _create_search_embeddings(texts, deadline: Optional[Deadline] = None) -> List[List[float]]:
+    with embed_limit.slot(deadline):
+        response = search_openai_client().embeddings.create(
+            input=texts, timeout=call_timeout(deadline, SEARCH_EMBED_TIMEOUT), **embedding_profile.request_kwargs()
+        )
+    record_usage(embedding_profile.model, response.usage)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+def get_search_embedding(query: str, deadline: Optional[Deadline] = None) -> List[float]:
+    """
+    Gera embedding para o texto de busca, reaproveitando o cache quando possível
+    """
+    with stage('embed', request_timings()):
+        return embedding_cache.get_or_create(
+            query, embedding_profile.name, lambda text: _create_search_embeddings(text, deadline)[0]
+        )
+
+def get_search_embeddings(queries: List[str], deadline: Optional[Deadline] = None) -> List[List[float]]:
+    """
+    Gera os embeddings de várias buscas com uma única chamada à OpenAI para os textos fora do cache
+    (textos que outra requisição já está gerando são aguardados em vez de pedidos de novo)
+    """
+    with stage('embed', request_timings()):
+        return embedding_cache.get_or_create_many(
+            queries, embedding_profile.name, lambda texts: _create_search_embeddings(texts, deadline)
+        )
+
+SUMMARY_MODEL = "gpt-4o-mini"
+# Incrementar sempre que o prompt de resumo mudar, para não servir resumos antigos do cache
+SUMMARY_PROMPT_VERSION = "1"
+
 
-def generate_summary(results: List[Dict], query: str) -> str:
+def build_summary_messages(results: List[Dict], query: str) -> List[Dict]:
     """
-    Gera um resumo dos resultados da pesquisa usando a API da OpenAI
+    Monta as mensagens do prompt de resumo dos resultados
     """
     descriptions = [result['dados']['description'] for result in results]
     prompt = (
@@ -30,100 +155,647 @@ def generate_summary(results: List[Dict], query: str) -> str:
         f"Importante: Não use markdown ou formatação especial na resposta, apenas texto puro. "
         f"{', '.join(descriptions)}"
     )
-    
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Você é um agente de imóveis. Responda apenas com texto puro, sem markdown ou formatação especial."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=300,
-        temperature=0.7
-    )
+    return [
+        {"role": "system", "content": "Você é um agente de imóveis. Responda apenas com texto puro, sem markdown ou formatação especial."},
+        {"role": "user", "content": prompt}
+    ]
+
+def summary_request(results: List[Dict], query: str) -> Dict:
+    """
+    Parâmetros da chamada de chat completion do resumo
+    """
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": build_summary_messages(results, query),
+        "max_tokens": 300,
+        "temperature": 0.7
+    }
+
+def generate_summary(results: List[Dict], query: str, deadline: Optional[Deadline] = None) -> str:
+    """
+    Gera um resumo dos resultados da pesquisa usando a API da OpenAI, dentro do orçamento da requisição
+    """
+    summary_breaker.check()
+    with summary_limit.slot(deadline):
+        timeout = call_timeout(deadline, SEARCH_SUMMARY_TIMEOUT)
+        try:
+            response = search_openai_client().chat.completions.create(**summary_request(results, query), timeout=timeout)
+        except Exception:
+            summary_breaker.record_failure()
+            raise
+    summary_breaker.record_success()
+    record_usage(SUMMARY_MODEL, response.usage)
     
     return response.choices[0].message.content.strip()
 
+def summary_cache_key(results: List[Dict], query: str) -> str:
+    return SummaryCache.make_key(query, [r['id'] for r in results], SUMMARY_MODEL, SUMMARY_PROMPT_VERSION)
+
+def get_summary(results: List[Dict], query: str, use_cache: bool = True,
+                deadline: Optional[Deadline] = None) -> str:
+    """
+    Retorna o resumo dos resultados, reaproveitando o cache de resumos quando permitido
+    """
+    with stage('summary', request_timings()):
+        if not use_cache:
+            return generate_summary(results, query, deadline)
+
+        key = summary_cache_key(results, query)
+        summary = summary_cache.get(key)
+        if summary is None:
+            summary = generate_summary(results, query, deadline)
+            summary_cache.set(key, summary, [r['id'] for r in results])
+        return summary
+
+def get_summary_or_degraded(results: List[Dict], query: str, use_cache: bool = True,
+                            deadline: Optional[Deadline] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Resumo dos resultados, ou (None, motivo) quando ele não sai dentro do orçamento: os resultados
+    da busca vetorial continuam valendo sem o resumo
+    """
+    try:
+        return get_summary(results, query, use_cache, deadline), None
+    except Exception as e:
+        return None, record_degradation('summary', e)
+
+def generate_summary_stream(results: List[Dict], query: str, deadline: Optional[Deadline] = None) -> Iterator[str]:
+    """
+    Gera o resumo dos resultados em streaming, devolvendo os tokens conforme chegam da OpenAI.
+    O timeout da chamada vale entre um chunk e outro; o orçamento total é verificado a cada chunk.
+    """
+    summary_breaker.check()
+    with summary_limit.slot(deadline):
+        timeout = call_timeout(deadline, SEARCH_SUMMARY_TIMEOUT)
+        try:
+            stream = search_openai_client().chat.completions.create(
+                **summary_request(results, query), stream=True, stream_options={"include_usage": True},
+                timeout=timeout
+            )
+            for chunk in stream:
+                if deadline is not None and deadline.expired():
+                    stream.close()
+                    raise DeadlineExceeded("Orçamento de tempo da requisição esgotado")
+                # Com include_usage, o último chunk não tem choices e traz o consumo de tokens
+                if getattr(chunk, 'usage', None):
+                    record_usage(SUMMARY_MODEL, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception:
+            summary_breaker.record_failure()
+            raise
+    summary_breaker.record_success()
+
+def run_vector_search(query_embedding: List[float], limit: int, vector_filter: Optional[Dict] = None) -> List[Dict]:
+    """
+    Executa a busca vetorial (com pré-filtro estruturado opcional) e formata os resultados acima do limiar de pontuação
+    """
+    with stage('vector_search', request_timings()):
+        results = get_search_backend().search(query_embedding, limit, vector_filter)
+    formatted_results = format_search_results(results)
+    record_results('candidates', len(results))
+    record_results('returned', len(formatted_results))
+    return formatted_results
+
+def format_search_results(results: List[Dict]) -> List[Dict]:
+    """
+    Mantém os resultados acima do limiar de pontuação, no formato da resposta da API
+    """
+    # Define um limiar de pontuação para considerar um resultado satisfatório
+    score_threshold = 0.7
+    satisfactory_results = [r for r in results if r['score'] >= score_threshold]
+    
+    return [{
+        'id': r['_id'],
+        'score': r['score'],
+        'dados': r['dados'],
+        'anuncio': r['anuncio']
+    } for r in satisfactory_results]
+
+def parse_search_params(data: Optional[Dict]) -> Dict:
+    """
+    Lê os parâmetros comuns da busca; lança ValueError para parâmetros inválidos
+    """
+    data = data or {}
+    limit = data.get('limit', 5)
+    if isinstance(limit, bool) or not isinstance(limit, int):
+        raise ValueError("'limit' deve ser um número inteiro")
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise ValueError(f"'limit' deve estar entre 1 e {SEARCH_MAX_LIMIT}")
+    return {
+        'query': data.get('query', ''),
+        'limit': limit,
+        'vector_filter': build_vector_filter(data.get('filters')),
+        'use_summary_cache': data.get('use_summary_cache', True),
+        'facets': parse_facet_fields(data.get('facets'))
+    }
+
+def candidates_limit(params: Dict) -> int:
+    """
+    Quantidade de candidatos da busca vetorial: com facetas, mais candidatos que o limite, para as contagens
+    """
+    return max(params['limit'], FACETS_CANDIDATES) if params['facets'] else params['limit']
+
+def split_facets(results: List[Dict], params: Dict) -> Tuple[List[Dict], Optional[Dict]]:
+    """
+    Separa os `limit` primeiros resultados e conta as facetas de todos os candidatos em uma única passada
+    """
+    if not params['facets']:
+        return results, None
+    return results[:params['limit']], {
+        'candidates': len(results),
+        'counts': count_facets((r['dados'] for r in results), params['facets'])
+    }
+
+def parse_batch_search_params(data: Optional[Dict]) -> Dict:
+    """
+    Lê os parâmetros da busca em lote: uma lista de buscas (texto ou objeto com query, limit,
+    filters e use_summary_cache) e a opção de gerar os resumos
+    """
+    data = data or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("'queries' deve ser uma lista não vazia")
+    if len(queries) > BATCH_SEARCH_MAX_QUERIES:
+        raise ValueError(f"No máximo {BATCH_SEARCH_MAX_QUERIES} buscas por requisição")
+
+    items = []
+    for i, item in enumerate(queries):
+        if isinstance(item, str):
+            item = {'query': item}
+        if not isinstance(item, dict):
+            raise ValueError(f"queries[{i}]: use um texto ou um objeto")
+        try:
+            params = parse_search_params(item)
+        except ValueError as e:
+            raise ValueError(f"queries[{i}]: {e}")
+        if not params['query']:
+            raise ValueError(f"queries[{i}]: Query não fornecida")
+        items.append(params)
+
+    return {'items': items, 'summary': bool(data.get('summary', False))}
+
+def run_search(params: Dict, deadline: Optional[Deadline] = None) -> Dict:
+    """
+    Executa a busca completa: embedding, busca vetorial e resumo.
+    Consultas quase idênticas a uma recente são servidas pelo cache semântico logo após o embedding.
+    Se o resumo não sair dentro do orçamento, a resposta traz os resultados com summary None e o motivo em `degraded`.
+    """
+    query_embedding = get_search_embedding(params['query'], deadline)
+
+    context = semantic_cache_context(params)
+    if context:
+        cached = semantic_cache.get(query_embedding, context)
+        if cached is not None:
+            return cached
+
+    candidates = run_vector_search(query_embedding, candidates_limit(params), params['vector_filter'])
+    formatted_results, facets = split_facets(candidates, params)
+
+    summary, reason = get_summary_or_degraded(formatted_results, params['query'], params['use_summary_cache'], deadline)
+
+    payload = {
+        'results': formatted_results,
+        'summary': summary
+    }
+    if facets is not None:
+        payload['facets'] = facets
+    if reason:
+        payload['degraded'] = {'summary': reason}
+    elif context:
+        semantic_cache.set(query_embedding, context, payload)
+    return payload
+
+def semantic_cache_context(params: Dict) -> Optional[str]:
+    """
+    Parâmetros que precisam coincidir para reaproveitar um resultado do cache semântico;
+    None quando o cliente pediu um resumo novo (use_summary_cache=false)
+    """
+    if not params['use_summary_cache']:
+        return None
+    return SemanticCache.make_context(
+        params['limit'], params['vector_filter'], params['facets'], embedding_profile.name, SUMMARY_MODEL,
+        SUMMARY_PROMPT_VERSION
+    )
+
+def search_flight_key(params: Dict) -> str:
+    """
+    Chave da coalescência: buscas com o mesmo texto normalizado, limite, filtros, facetas e uso do cache de resumo
+    """
+    key = [normalize_query(params['query']), params['limit'], params['vector_filter'], params['use_summary_cache'],
+           params['facets']]
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _parse_search_request() -> Dict:
+    return parse_search_params(request.get_json(silent=True))
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def unavailable_response(stage_name: str, error: Exception):
+    """
+    Resposta 503 quando a busca não pode continuar sem o estágio (embedding) por timeout, capacidade ou falha
+    """
+    reason = record_degradation(stage_name, error)
+    response = jsonify({'error': 'Busca temporariamente indisponível', 'degraded': {stage_name: reason}})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def is_unavailable(error: Exception) -> bool:
+    return degraded_reason(error) != 'error'
+
 @real_estate.route('/search', methods=['POST'])
 def search():
     """
     Endpoint para busca vetorial de imóveis
     """
-    data = request.get_json()
-    query = data.get('query', '')
-    limit = data.get('limit', 5)
+    try:
+        params = _parse_search_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    query = params['query']
 
     if not query:
         return jsonify({'error': 'Query não fornecida'}), 400
 
+    deadline = Deadline(SEARCH_DEADLINE)
     try:
-        query_embedding = get_search_embedding(query)
-        
-        collection = get_mongo_collection("properties")
-        
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "vector_index",
-                    "path": "embedding",
-                    "queryVector": query_embedding,
-                    "numCandidates": limit * 10,
-                    "limit": limit
-                }
-            },
-            {
-                "$project": {
-                    "_id": 1,
-                    "score": {"$meta": "vectorSearchScore"},
-                    "dados": 1,
-                    "anuncio": 1
-                }
-            }
-        ]
-
-        results = list(collection.aggregate(pipeline))
-        
-        # Define um limiar de pontuação para considerar um resultado satisfatório
-        score_threshold = 0.7
-        satisfactory_results = [r for r in results if r['score'] >= score_threshold]
-        
-        formatted_results = [{
-            'id': r['_id'],
-            'score': r['score'],
-            'dados': r['dados'],
-            'anuncio': r['anuncio']
-        } for r in satisfactory_results]
+        if search_flight is None:
+            return jsonify(run_search(params, deadline))
+        return jsonify(search_flight.do(search_flight_key(params), lambda: run_search(params, deadline), deadline))
 
-        summary = generate_summary(formatted_results, query)
+    except Exception as e:
+        if is_unavailable(e):
+            return unavailable_response('embed', e)
+        return jsonify({'error': str(e)}), 500 
 
-        return jsonify({
-            'results': formatted_results,
-            'summary': summary
-        })
 
+@real_estate.route('/search/stream', methods=['POST'])
+def search_stream():
+    """
+    Endpoint de busca em streaming (Server-Sent Events): envia os resultados assim que
+    a busca vetorial termina e depois os tokens do resumo conforme são gerados.
+    Eventos: "results", "summary" (um por token), "degraded" (resumo interrompido ou pulado, com o motivo),
+    "done" (tempos em ms) e "error".
+    """
+    try:
+        params = _parse_search_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    query = params['query']
+
+    if not query:
+        return jsonify({'error': 'Query não fornecida'}), 400
+
+    deadline = Deadline(SEARCH_DEADLINE)
+
+    def events():
+        timings = {}
+        started = time.perf_counter()
+        try:
+            stage_started = time.perf_counter()
+            query_embedding = get_search_embedding(query, deadline)
+            timings['embedding_ms'] = (time.perf_counter() - stage_started) * 1000
+
+            context = semantic_cache_context(params)
+            cached = semantic_cache.get(query_embedding, context) if context else None
+            if cached is not None:
+                yield sse_event('results', {key: cached[key] for key in ('results', 'facets') if key in cached})
+                timings['time_to_results_ms'] = timings['time_to_first_token_ms'] = (time.perf_counter() - started) * 1000
+                yield sse_event('summary', {'token': cached['summary'], 'cached': True})
+                timings['total_ms'] = (time.perf_counter() - started) * 1000
+                yield sse_event('done', {'timings': {k: round(v, 1) for k, v in timings.items()}})
+                return
+
+            stage_started = time.perf_counter()
+            candidates = run_vector_search(query_embedding, candidates_limit(params), params['vector_filter'])
+            formatted_results, facets = split_facets(candidates, params)
+            timings['search_ms'] = (time.perf_counter() - stage_started) * 1000
+            yield sse_event('results', {'results': formatted_results, **({'facets': facets} if facets else {})})
+            timings['time_to_results_ms'] = (time.perf_counter() - started) * 1000
+
+            stage_started = time.perf_counter()
+            with stage('summary'):
+                key = summary_cache_key(formatted_results, query)
+                summary = summary_cache.get(key) if params['use_summary_cache'] else None
+                if summary is not None:
+                    timings['time_to_first_token_ms'] = (time.perf_counter() - started) * 1000
+                    yield sse_event('summary', {'token': summary, 'cached': True})
+                else:
+                    tokens = []
+                    try:
+                        for token in generate_summary_stream(formatted_results, query, deadline):
+                            if 'time_to_first_token_ms' not in timings:
+                                timings['time_to_first_token_ms'] = (time.perf_counter() - started) * 1000
+                            tokens.append(token)
+                            yield sse_event('summary', {'token': token})
+                    except Exception as e:
+                        summary = None
+                        yield sse_event('degraded', {'stage': 'summary', 'reason': record_degradation('summary', e)})
+                    else:
+                        summary = ''.join(tokens).strip()
+                        if params['use_summary_cache']:
+                            summary_cache.set(key, summary, [r['id'] for r in formatted_results])
+            timings['summary_ms'] = (time.perf_counter() - stage_started) * 1000
+            if context and summary is not None:
+                semantic_cache.set(query_embedding, context, {'results': formatted_results, 'summary': summary,
+                                                              **({'facets': facets} if facets else {})})
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+
+        timings['total_ms'] = (time.perf_counter() - started) * 1000
+        yield sse_event('done', {'timings': {k: round(v, 1) for k, v in timings.items()}})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@real_estate.route('/search/batch', methods=['POST'])
+def search_batch():
+    """
+    Endpoint para várias buscas em uma requisição: um único embedding em lote para todas as
+    buscas, buscas vetoriais em paralelo e resumos opcionais (também em paralelo)
+    """
+    try:
+        params = parse_batch_search_params(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    items = params['items']
+    deadline = Deadline(SEARCH_DEADLINE)
+
+    try:
+        embeddings = get_search_embeddings([item['query'] for item in items], deadline)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
+        if is_unavailable(e):
+            return unavailable_response('embed', e)
+        return jsonify({'error': str(e)}), 500
+
+    def run(item: Dict, query_embedding: List[float]) -> Dict:
+        result = {'query': item['query']}
+        try:
+            candidates = run_vector_search(query_embedding, candidates_limit(item), item['vector_filter'])
+            result['results'], facets = split_facets(candidates, item)
+            if facets is not None:
+                result['facets'] = facets
+            if params['summary']:
+                result['summary'], reason = get_summary_or_degraded(
+                    result['results'], item['query'], item['use_summary_cache'], deadline
+                )
+                if reason:
+                    result['degraded'] = {'summary': reason}
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+
+    return jsonify({'results': list(batch_executor.map(run, items, embeddings))})
+
+
+def warm_up() -> Dict[str, str]:
+    """
+    Abre em paralelo as conexões do worker com o MongoDB e a OpenAI, esperando no máximo WARM_UP_TIMEOUT
+    segundos (a chamada à OpenAI tem o mesmo timeout e nenhuma retentativa). Marca o worker como pronto
+    quando as duas respondem; retorna os erros por serviço.
+    """
+    global _ready
+    openai_client = get_openai_client().with_options(timeout=WARM_UP_TIMEOUT, max_retries=0)
+    checks = {
+        'mongo': batch_executor.submit(lambda: get_mongo_collection("properties").database.command("ping")),
+        'openai': batch_executor.submit(lambda: openai_client.models.retrieve(embedding_profile.model))
+    }
+    deadline = time.monotonic() + WARM_UP_TIMEOUT
+    errors = {}
+    for name, future in checks.items():
+        try:
+            future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            errors[name] = f"sem resposta em {WARM_UP_TIMEOUT:g}s"
+        except Exception as e:
+            errors[name] = str(e)
+        if name in errors:
+            print(f"Aviso: falha ao aquecer conexões ({name}): {errors[name]}")
+    if not errors:
+        _ready = True
+    return errors
+
+def start_warm_up() -> None:
+    """
+    Aquece as conexões em segundo plano: a inicialização do worker não espera pelo MongoDB nem pela
+    OpenAI, e o /ready responde 503 até o aquecimento dar certo
+    """
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+@real_estate.route('/ready', methods=['GET'])
+def ready():
+    """
+    Endpoint de readiness: 200 depois que as conexões do worker foram abertas, 503 enquanto falharem
+    """
+    if not _ready:
+        errors = warm_up()
+        if errors:
+            return jsonify({'status': 'unavailable', 'errors': errors}), 503
+    return jsonify({'status': 'ready'})
+
+
+@real_estate.route('/facets', methods=['GET'])
+def facets():
+    """
+    Endpoint com as contagens por faceta do catálogo inteiro (resumo materializado pela ingestão).
+    Parâmetro opcional `fields`: facetas separadas por vírgula.
+    """
+    try:
+        fields = parse_facet_fields(request.args.get('fields')) if request.args.get('fields') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        return jsonify(facet_summary.get(fields))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@real_estate.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Endpoint com os contadores de hit/miss dos caches do worker
+    """
+    return jsonify({
+        'embeddings': embedding_cache.get_stats(),
+        'summaries': summary_cache.get_stats(),
+        'semantic': semantic_cache.get_stats(),
+        'properties': property_cache.get_stats()
+    })
+
+
+# Campos lidos nos detalhes do imóvel: nunca trazer o embedding (~30 KB de BSON por documento)
+PROPERTY_PROJECTION = {'dados': 1, 'anuncio': 1, 'score': 1, 'indexed_at': 1}
+
 
+def property_entry(property: Dict) -> Dict:
+    """
+    Formata o documento para a resposta e calcula o ETag e o Last-Modified
+    """
+    formatted_property = {
+        'id': property['_id'],
+        'score': property.get('score', 0),
+        'dados': property['dados'],
+        'anuncio': property['anuncio']
+    }
+    etag = hashlib.sha1(
+        json.dumps(formatted_property, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    ).hexdigest()
+    last_modified = property.get('indexed_at')
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return {'property': formatted_property, 'etag': etag, 'last_modified': last_modified}
+
+def missing_property_ids(property_ids: List[str], entries: Dict[str, Dict]) -> List[str]:
+    """
+    Consulta o cache e preenche `entries`; retorna os ids que precisam ser lidos do MongoDB
+    """
+    missing = []
+    for property_id in dict.fromkeys(property_ids):
+        entry = property_cache.get(property_id)
+        if entry is None:
+            missing.append(property_id)
+        else:
+            entries[property_id] = entry
+    return missing
+
+def cache_property_documents(documents, entries: Dict[str, Dict]) -> None:
+    for document in documents:
+        entry = property_entry(document)
+        property_cache.set(document['_id'], entry)
+        entries[document['_id']] = entry
+
+def get_property_entries(property_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Retorna os imóveis pedidos, servindo do cache e lendo os ausentes com uma única consulta $in
+    """
+    entries = {}
+    missing = missing_property_ids(property_ids, entries)
+    if missing:
+        collection = get_mongo_collection("properties")
+        cache_property_documents(collection.find({'_id': {'$in': missing}}, PROPERTY_PROJECTION), entries)
+    return entries
+
+def is_not_modified(entry: Dict, req) -> bool:
+    """
+    Verifica If-None-Match / If-Modified-Since da requisição contra a versão em cache
+    """
+    if req.if_none_match:
+        return req.if_none_match.contains_weak(entry['etag'])
+    if req.if_modified_since and entry['last_modified']:
+        return entry['last_modified'].replace(microsecond=0) <= req.if_modified_since
+    return False
+
+def parse_property_ids(value: Optional[str]) -> List[str]:
+    """
+    Lê o parâmetro `ids` (separado por vírgulas); lança ValueError se vazio ou grande demais
+    """
+    property_ids = [property_id.strip() for property_id in (value or '').split(',') if property_id.strip()]
+    if not property_ids:
+        raise ValueError("Parâmetro 'ids' não fornecido")
+    if len(property_ids) > PROPERTIES_MAX_IDS:
+        raise ValueError(f"No máximo {PROPERTIES_MAX_IDS} ids por requisição")
+    return property_ids
+
+def set_validators(response, entry: Dict):
+    response.set_etag(entry['etag'])
+    if entry['last_modified']:
+        response.last_modified = entry['last_modified']
+    # O cliente pode guardar a resposta, mas deve revalidar com o ETag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @real_estate.route('/property/<property_id>', methods=['GET'])
 def get_property(property_id: str):
     """
-    Endpoint para buscar detalhes de um imóvel específico por ID
+    Endpoint para buscar detalhes de um imóvel específico por ID (com ETag/Last-Modified e 304)
     """
     try:
-        collection = get_mongo_collection("properties")
-        property = collection.find_one({"_id": property_id})
+        entry = get_property_entries([property_id]).get(property_id)
         
-        if not property:
+        if not entry:
             return jsonify({'error': 'Imóvel não encontrado'}), 404
-            
-        formatted_property = {
-            'id': property['_id'],
-            'score': property.get('score', 0),
-            'dados': property['dados'],
-            'anuncio': property['anuncio']
-        }
+
+        if is_not_modified(entry, request):
+            return set_validators(Response(status=304), entry)
         
-        return jsonify(formatted_property)
+        return set_validators(jsonify(entry['property']), entry)
         
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Campos lidos no endpoint de semelhantes: a lista pré-calculada pela ingestão (real_estate/similar.py)
+SIMILAR_PROJECTION = {'similar': 1}
+
+
+def parse_similar_params(args) -> Dict:
+    """
+    Lê os parâmetros do endpoint de semelhantes; lança ValueError para parâmetros inválidos
+    """
+    try:
+        limit = int(args.get('limit', SIMILAR_K))
+    except ValueError:
+        raise ValueError("'limit' deve ser um número inteiro")
+    if not 1 <= limit <= SIMILAR_K:
+        raise ValueError(f"'limit' deve estar entre 1 e {SIMILAR_K}")
+    return {'limit': limit, 'details': args.get('details', 'false').lower() in ('1', 'true', 'yes')}
+
+def similar_response(property_id: str, similar: List[Dict], entries: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    Monta a resposta com os vizinhos (id e score) e, se pedido, os detalhes de cada um
+    """
+    if entries is not None:
+        similar = [{**entries[neighbor['id']]['property'], 'score': neighbor['score']}
+                   for neighbor in similar if neighbor['id'] in entries]
+    return {'id': property_id, 'results': similar}
+
+@real_estate.route('/property/<property_id>/similar', methods=['GET'])
+def get_similar_properties(property_id: str):
+    """
+    Endpoint de imóveis semelhantes: uma leitura por _id da lista pré-calculada na ingestão.
+    Com details=true, os detalhes dos vizinhos vêm do cache de imóveis (ou de uma consulta $in).
+    """
+    try:
+        params = parse_similar_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        document = get_mongo_collection("properties").find_one({'_id': property_id}, SIMILAR_PROJECTION)
+
+        if not document:
+            return jsonify({'error': 'Imóvel não encontrado'}), 404
+
+        similar = document.get('similar', [])[:params['limit']]
+        entries = get_property_entries([neighbor['id'] for neighbor in similar]) if params['details'] else None
+        return jsonify(similar_response(property_id, similar, entries))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@real_estate.route('/properties', methods=['GET'])
+def get_properties():
+    """
+    Endpoint para buscar vários imóveis de uma vez: GET /api/properties?ids=id1,id2,...
+    """
+    try:
+        property_ids = parse_property_ids(request.args.get('ids'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        entries = get_property_entries(property_ids)
+        return jsonify({
+            'results': [entries[property_id]['property'] for property_id in property_ids if property_id in entries],
+            'missing': [property_id for property_id in property_ids if property_id not in entries]
+        })
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500 
\ No newline at end of file
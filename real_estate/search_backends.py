@@ -0,0 +1,364 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    get_mongo_collection, get_async_mongo_collection, SEARCH_BACKEND, LOCAL_INDEX_PATH, EMBEDDING_RESCORE_FACTOR
+)
+from real_estate.embeddings import embedding_profile
+
+
+# Máximo de numCandidates aceito pelo $vectorSearch do Atlas
+ATLAS_MAX_CANDIDATES = 10000
+
+# Documentos por lote ao ler os _id que passam no filtro (backend local)
+FILTER_BATCH_SIZE = 10000
+
+
+class SearchBackend:
+    """
+    Interface dos backends de busca vetorial.
+    `search` retorna documentos com `_id`, `score`, `dados` e `anuncio`,
+    ordenados por score decrescente, com o score na escala do vectorSearchScore do Atlas.
+    `filter` é uma expressão MQL (ver real_estate.filters) aplicada antes do top-k.
+    """
+
+    def search(self, query_embedding: List[float], limit: int, filter: Optional[Dict] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    async def aprefilter(self, filter: Optional[Dict]):
+        """
+        Parte da busca que não depende do embedding da consulta, para a rota assíncrona executar em
+        paralelo com ele; o resultado volta para `asearch` em `prefiltered`. Por padrão não há nada a adiantar.
+        """
+        return None
+
+    async def asearch(self, query_embedding: List[float], limit: int, filter: Optional[Dict] = None,
+                      prefiltered=None) -> List[Dict]:
+        """
+        Versão assíncrona de `search`; por padrão executa a busca síncrona em uma thread
+        """
+        return await asyncio.to_thread(self.search, query_embedding, limit, filter)
+
+
+class AtlasSearchBackend(SearchBackend):
+    """
+    Busca vetorial através do estágio $vectorSearch do MongoDB Atlas
+    """
+
+    def __init__(self, collection_name: str = "properties", index_name: str = "vector_index"):
+        self.collection_name = collection_name
+        self.index_name = index_name
+
+    def pipeline(self, query_embedding: List[float], limit: int, filter: Optional[Dict] = None) -> List[Dict]:
+        # Com vetores quantizados e reordenação, busca mais candidatos para reordenar em precisão total
+        if embedding_profile.rescore:
+            limit *= EMBEDDING_RESCORE_FACTOR
+
+        vector_search = {
+            "index": self.index_name,
+            "path": "embedding",
+            "queryVector": embedding_profile.encode_query(query_embedding),
+            "numCandidates": min(limit * 10, ATLAS_MAX_CANDIDATES),
+            "limit": limit
+        }
+        # Pré-filtro aplicado dentro da busca ANN (campos declarados como "filter" no índice)
+        if filter:
+            vector_search["filter"] = filter
+
+        projection = {
+            "_id": 1,
+            "score": {"$meta": "vectorSearchScore"},
+            "dados": 1,
+            "anuncio": 1
+        }
+        if embedding_profile.local_scores:
+            projection["embedding"] = 1
+        if embedding_profile.rescore:
+            projection["embedding_full"] = 1
+
+        return [
+            {"$vectorSearch": vector_search},
+            {"$project": projection}
+        ]
+
+    @staticmethod
+    def rescore(results: List[Dict], query_embedding: List[float], limit: int) -> List[Dict]:
+        """
+        Com vetores int8, recalcula o score de todos os candidatos na escala (1 + dot) / 2: com o vetor em
+        precisão total (`embedding_full`, com EMBEDDING_RESCORE) ou, na falta dele, com o vetor int8
+        desquantizado. Mantém os `limit` melhores.
+        """
+        if not embedding_profile.local_scores:
+            return results
+        query = np.asarray(query_embedding, dtype=np.float32)
+        for result in results:
+            full = result.pop("embedding_full", None)
+            stored = result.pop("embedding", None)
+            vector = full if full is not None else stored
+            if vector is not None:
+                result["score"] = float((1 + embedding_profile.decode(vector) @ query) / 2)
+        results.sort(key=lambda result: result["score"], reverse=True)
+        return results[:limit]
+
+    def search(self, query_embedding: List[float], limit: int, filter: Optional[Dict] = None) -> List[Dict]:
+        collection = get_mongo_collection(self.collection_name)
+        results = list(collection.aggregate(self.pipeline(query_embedding, limit, filter)))
+        return self.rescore(results, query_embedding, limit)
+
+    async def asearch(self, query_embedding: List[float], limit: int, filter: Optional[Dict] = None,
+                      prefiltered=None) -> List[Dict]:
+        # O filtro é aplicado dentro do $vectorSearch: não há leitura a adiantar
+        collection = get_async_mongo_collection(self.collection_name)
+        cursor = await collection.aggregate(self.pipeline(query_embedding, limit, filter))
+        return self.rescore(await cursor.to_list(), query_embedding, limit)
+
+
+def _read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(path: str, manifest: Dict) -> None:
+    tmp_manifest = path + ".json.tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, path + ".json")
+
+
+def _write_index(path: str, ids: List[str], rows: Iterable[np.ndarray], dimensions: int) -> None:
+    """
+    Grava uma nova versão da matriz (float32 contígua) e troca o manifesto de forma atômica.
+    Os workers que ainda mapeiam a versão anterior continuam lendo o arquivo antigo até recarregar.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    previous = _read_manifest(path)
+
+    matrix_file = f"{path}.{time.time_ns()}.f32"
+    with open(matrix_file, "wb") as f:
+        for row in rows:
+            np.asarray(row, dtype=np.float32).tofile(f)
+
+    _write_manifest(path, {
+        "matrix": os.path.basename(matrix_file),
+        "previous": previous["matrix"] if previous else None,
+        "dimensions": dimensions,
+        "ids": ids
+    })
+
+    # Mantém a versão anterior para workers que acabaram de ler o manifesto antigo
+    if previous and previous.get("previous"):
+        try:
+            os.remove(os.path.join(directory, previous["previous"]))
+        except FileNotFoundError:
+            pass
+
+
+def build_local_index(path: str = LOCAL_INDEX_PATH, collection_name: str = "properties") -> int:
+    """
+    Reconstrói o índice local com todos os embeddings da coleção
+    """
+    collection = get_mongo_collection(collection_name)
+    ids, rows = [], []
+    for doc in collection.find({"embedding": {"$exists": True}}, {"embedding": 1, "embedding_full": 1}):
+        ids.append(doc["_id"])
+        rows.append(embedding_profile.decode(doc.get("embedding_full", doc["embedding"])))
+
+    dimensions = rows[0].shape[0] if rows else 0
+    _write_index(path, ids, rows, dimensions)
+    return len(ids)
+
+
+def refresh_local_index(embeddings: Dict, path: str = LOCAL_INDEX_PATH) -> int:
+    """
+    Atualiza o índice local com os embeddings recém gravados (novos ou alterados), sem reler a coleção
+    inteira do MongoDB nem regravar a matriz: as linhas alteradas são sobrescritas no próprio arquivo,
+    as novas são acrescentadas ao final e o manifesto passa a incluir os novos ids. Os workers que ainda
+    usam o manifesto anterior continuam mapeando as linhas antigas do mesmo arquivo.
+    """
+    if not embeddings:
+        return 0
+    embeddings = {property_id: embedding_profile.decode(value) for property_id, value in embeddings.items()}
+
+    manifest = _read_manifest(path)
+    if manifest is None:
+        return build_local_index(path)
+
+    ids = manifest["ids"]
+    dimensions = manifest["dimensions"] if ids else next(iter(embeddings.values())).shape[0]
+    if any(embedding.shape[0] != dimensions for embedding in embeddings.values()):
+        # Perfil de embedding alterado: a matriz inteira muda de formato
+        return build_local_index(path)
+
+    matrix_file = os.path.join(os.path.dirname(os.path.abspath(path)), manifest["matrix"])
+    positions = {property_id: i for i, property_id in enumerate(ids)}
+    changed = [(positions[property_id], embedding) for property_id, embedding in embeddings.items()
+               if property_id in positions]
+    new_ids = [property_id for property_id in embeddings if property_id not in positions]
+
+    if changed:
+        matrix = np.memmap(matrix_file, dtype=np.float32, mode="r+", shape=(len(ids), dimensions))
+        for row, embedding in changed:
+            matrix[row] = embedding
+        matrix.flush()
+        del matrix
+    if new_ids:
+        with open(matrix_file, "r+b") as f:
+            # Descarta linhas de um acréscimo anterior interrompido antes de atualizar o manifesto
+            f.truncate(len(ids) * dimensions * 4)
+            f.seek(0, os.SEEK_END)
+            for property_id in new_ids:
+                np.asarray(embeddings[property_id], dtype=np.float32).tofile(f)
+
+    _write_manifest(path, {**manifest, "dimensions": dimensions, "ids": ids + new_ids})
+    return len(ids) + len(new_ids)
+
+
+def _open_matrix(path: str, manifest: Dict) -> np.ndarray:
+    matrix_file = os.path.join(os.path.dirname(os.path.abspath(path)), manifest["matrix"])
+    if not manifest["ids"]:
+        return np.zeros((0, manifest["dimensions"]), dtype=np.float32)
+    # Memory-map somente leitura: os workers compartilham as páginas do page cache
+    return np.memmap(matrix_file, dtype=np.float32, mode="r",
+                     shape=(len(manifest["ids"]), manifest["dimensions"]))
+
+
+class LocalSearchBackend(SearchBackend):
+    """
+    Busca vetorial exata em memória sobre uma matriz float32 mapeada de arquivo.
+    O índice é recarregado automaticamente quando o manifesto é atualizado.
+    """
+
+    def __init__(self, path: str = LOCAL_INDEX_PATH, collection_name: str = "properties"):
+        self.path = path
+        self.collection_name = collection_name
+        self._lock = threading.Lock()
+        self._mtime = None
+        # (ids, matriz, ids ordenados, linha de cada id ordenado) trocados juntos para que uma busca
+        # nunca misture versões; os ids ordenados permitem mapear os ids do filtro para linhas com searchsorted
+        self._index: Tuple[List[str], Optional[np.ndarray], np.ndarray, np.ndarray] = \
+            ([], None, np.array([], dtype=str), np.array([], dtype=np.int64))
+
+    def _maybe_reload(self) -> None:
+        try:
+            mtime = os.stat(self.path + ".json").st_mtime_ns
+        except FileNotFoundError:
+            raise RuntimeError(f"Índice local não encontrado em {self.path}.json")
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            manifest = _read_manifest(self.path)
+            ids = manifest["ids"]
+            order = np.argsort(np.asarray(ids, dtype=str), kind="stable")
+            self._index = (ids, _open_matrix(self.path, manifest), np.asarray(ids, dtype=str)[order], order)
+            self._mtime = mtime
+
+    def top_k(self, query_embedding: List[float], limit: int,
+              allowed_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Retorna os `limit` pares (id, score) de maior produto escalar,
+        opcionalmente restritos aos ids em `allowed_ids`
+        """
+        self._maybe_reload()
+        ids, matrix, sorted_ids, order = self._index
+        if not ids or limit <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if allowed_ids is None:
+            rows = None
+            scores = matrix @ query
+        else:
+            allowed = np.asarray(list(allowed_ids), dtype=str)
+            found = np.minimum(np.searchsorted(sorted_ids, allowed), len(sorted_ids) - 1)
+            # Linhas em ordem crescente: leitura sequencial das páginas da matriz mapeada
+            rows = np.sort(order[found[sorted_ids[found] == allowed]])
+            if rows.size == 0:
+                return []
+            scores = matrix[rows] @ query
+
+        k = min(limit, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # Mesma escala do vectorSearchScore do Atlas para dotProduct: (1 + dot) / 2
+        return [(ids[i if rows is None else rows[i]], float((1 + scores[i]) / 2)) for i in top]
+
+    @staticmethod
+    def _merge(hits: List[Tuple[str, float]], docs: Iterable[Dict]) -> List[Dict]:
+        docs = {doc["_id"]: doc for doc in docs}
+        return [
+            {"_id": property_id, "score": score, "dados": docs[property_id]["dados"],
+             "anuncio": docs[property_id]["anuncio"]}
+            for property_id, score in hits if property_id in docs
+        ]
+
+    def search(self, query_embedding: List[float], limit: int, filter: Optional[Dict] = None) -> List[Dict]:
+        collection = get_mongo_collection(self.collection_name)
+        # Cursor só com os _id (sem o limite de 16 MB do distinct), consumido direto pelo top_k
+        allowed_ids = (doc["_id"] for doc in collection.find(filter, {"_id": 1}, batch_size=FILTER_BATCH_SIZE)) \
+            if filter else None
+
+        hits = self.top_k(query_embedding, limit, allowed_ids)
+        if not hits:
+            return []
+
+        docs = collection.find({"_id": {"$in": [property_id for property_id, _ in hits]}},
+                               {"dados": 1, "anuncio": 1})
+        return self._merge(hits, docs)
+
+    async def aprefilter(self, filter: Optional[Dict]) -> Optional[List[str]]:
+        """
+        Ids que passam no filtro, lidos do MongoDB enquanto o embedding da consulta é gerado
+        """
+        if not filter:
+            return None
+        collection = get_async_mongo_collection(self.collection_name)
+        return [doc["_id"] async for doc in collection.find(filter, {"_id": 1}, batch_size=FILTER_BATCH_SIZE)]
+
+    async def asearch(self, query_embedding: List[float], limit: int, filter: Optional[Dict] = None,
+                      prefiltered: Optional[List[str]] = None) -> List[Dict]:
+        collection = get_async_mongo_collection(self.collection_name)
+        allowed_ids = prefiltered if prefiltered is not None else await self.aprefilter(filter)
+
+        # O produto matriz-vetor do NumPy libera o GIL: roda em thread sem bloquear o event loop
+        hits = await asyncio.to_thread(self.top_k, query_embedding, limit, allowed_ids)
+        if not hits:
+            return []
+
+        cursor = collection.find({"_id": {"$in": [property_id for property_id, _ in hits]}},
+                                 {"dados": 1, "anuncio": 1})
+        return self._merge(hits, await cursor.to_list())
+
+
+_backend = None
+
+
+def get_search_backend() -> SearchBackend:
+    """
+    Retorna o backend de busca configurado em SEARCH_BACKEND ("atlas" ou "local")
+    """
+    global _backend
+    if _backend is None:
+        if SEARCH_BACKEND == "local":
+            _backend = LocalSearchBackend()
+        elif SEARCH_BACKEND == "atlas":
+            _backend = AtlasSearchBackend()
+        else:
+            raise ValueError(f"SEARCH_BACKEND inválido: {SEARCH_BACKEND}")
+    return _backend
+
+
+if __name__ == "__main__":
+    total = build_local_index()
+    print(f"Índice local gerado em {LOCAL_INDEX_PATH} com {total} imóveis")
@@ -0,0 +1,196 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+
+from config import get_mongo_collection, SIMILAR_K, SIMILAR_BLOCK_SIZE
+from real_estate.embeddings import embedding_profile
+
+
+# Listas de imóveis semelhantes pré-calculadas e gravadas em cada documento:
+# - similar: [{"id", "score"}] dos SIMILAR_K vizinhos mais próximos (score no mesmo formato do $vectorSearch)
+# - similar_min_score: score do último vizinho da lista (0 quando a lista tem menos de SIMILAR_K itens),
+#   usado na atualização incremental para saber quais listas um imóvel alterado pode mudar
+
+WRITE_BATCH_SIZE = 1000
+
+
+def _to_score(dot: np.ndarray) -> np.ndarray:
+    # Mesmo formato do score do $vectorSearch com dotProduct
+    return (1 + dot) / 2
+
+
+def load_embeddings(collection, query: Optional[Dict] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    Lê os embeddings da coleção como uma matriz float32 com linhas normalizadas
+    """
+    query = {"embedding": {"$exists": True}, **(query or {})}
+    ids, rows = [], []
+    for doc in collection.find(query, {"embedding": 1, "embedding_full": 1}):
+        ids.append(doc["_id"])
+        rows.append(embedding_profile.decode(doc.get("embedding_full", doc["embedding"])))
+    if not rows:
+        return ids, np.zeros((0, embedding_profile.dimensions), dtype=np.float32)
+    matrix = np.vstack(rows).astype(np.float32, copy=False)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return ids, matrix
+
+
+def top_k_neighbors(queries: np.ndarray, matrix: np.ndarray, k: int, exclude: Optional[np.ndarray] = None,
+                    block_size: int = SIMILAR_BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k por produto escalar de cada linha de `queries` contra todas as linhas de `matrix`.
+    A multiplicação é feita em blocos (linhas de `queries` x linhas de `matrix`) para limitar a memória
+    a block_size² floats, mantendo os k melhores de cada consulta entre um bloco e outro.
+    `exclude[i]` é a posição de queries[i] em `matrix` (o próprio imóvel), ou -1.
+    Retorna (posições, produtos escalares), ordenados do mais próximo para o mais distante.
+    """
+    m, n = len(queries), len(matrix)
+    k = min(k, n)
+    positions = np.zeros((m, k), dtype=np.int64)
+    dots = np.full((m, k), -np.inf, dtype=np.float32)
+    if not m or not k:
+        return positions, dots
+
+    for q_start in range(0, m, block_size):
+        block = queries[q_start:q_start + block_size]
+        rows = np.arange(len(block))
+        best_dots = np.full((len(block), 0), -np.inf, dtype=np.float32)
+        best_positions = np.zeros((len(block), 0), dtype=np.int64)
+
+        for c_start in range(0, n, block_size):
+            scores = block @ matrix[c_start:c_start + block_size].T
+            if exclude is not None:
+                columns = exclude[q_start:q_start + block_size] - c_start
+                inside = (columns >= 0) & (columns < scores.shape[1])
+                scores[rows[inside], columns[inside]] = -np.inf
+
+            candidate_dots = np.concatenate([best_dots, scores], axis=1)
+            candidate_positions = np.concatenate(
+                [best_positions, np.broadcast_to(np.arange(c_start, c_start + scores.shape[1]), scores.shape)], axis=1
+            )
+            if candidate_dots.shape[1] > k:
+                keep = np.argpartition(-candidate_dots, k - 1, axis=1)[:, :k]
+                candidate_dots = np.take_along_axis(candidate_dots, keep, axis=1)
+                candidate_positions = np.take_along_axis(candidate_positions, keep, axis=1)
+            best_dots, best_positions = candidate_dots, candidate_positions
+
+        order = np.argsort(-best_dots, axis=1)
+        dots[q_start:q_start + len(block)] = np.take_along_axis(best_dots, order, axis=1)
+        positions[q_start:q_start + len(block)] = np.take_along_axis(best_positions, order, axis=1)
+
+    return positions, dots
+
+
+def _neighbor_fields(neighbors: List[Dict], k: int) -> Dict:
+    return {
+        "similar": neighbors,
+        "similar_min_score": neighbors[-1]["score"] if len(neighbors) >= k else 0.0
+    }
+
+
+def _neighbor_lists(ids: List[str], positions: np.ndarray, dots: np.ndarray) -> List[List[Dict]]:
+    scores = _to_score(dots)
+    return [
+        [{"id": ids[j], "score": round(float(score), 6)} for j, score in zip(row_positions, row_scores)
+         if np.isfinite(score)]
+        for row_positions, row_scores in zip(positions, scores)
+    ]
+
+
+def _write(collection, updates: Dict[str, Dict]) -> None:
+    operations = [UpdateOne({"_id": property_id}, {"$set": fields}) for property_id, fields in updates.items()]
+    for i in range(0, len(operations), WRITE_BATCH_SIZE):
+        collection.bulk_write(operations[i:i + WRITE_BATCH_SIZE], ordered=False)
+
+
+def _compute(collection, ids: List[str], matrix: np.ndarray, targets: List[int], k: int, block_size: int) -> None:
+    positions, dots = top_k_neighbors(matrix[targets], matrix, k, np.asarray(targets), block_size)
+    neighbors = _neighbor_lists(ids, positions, dots)
+    _write(collection, {ids[target]: _neighbor_fields(neighbors[i], k) for i, target in enumerate(targets)})
+
+
+def compute_similar(collection_name: str = "properties", k: int = SIMILAR_K,
+                    block_size: int = SIMILAR_BLOCK_SIZE) -> int:
+    """
+    Recalcula as listas de semelhantes de todo o catálogo
+    """
+    collection = get_mongo_collection(collection_name)
+    collection.create_index("similar.id")
+    ids, matrix = load_embeddings(collection)
+    _compute(collection, ids, matrix, list(range(len(ids))), k, block_size)
+    return len(ids)
+
+
+def update_similar(changed_ids: Iterable[str], collection_name: str = "properties", k: int = SIMILAR_K,
+                   block_size: int = SIMILAR_BLOCK_SIZE) -> int:
+    """
+    Atualiza as listas de semelhantes depois que alguns imóveis foram gravados (novos ou alterados):
+    recalcula a lista dos imóveis alterados e mescla os alterados nas listas dos demais imóveis
+    que podem mudar. Retorna o número de listas regravadas.
+    """
+    changed_ids = list(dict.fromkeys(changed_ids))
+    if not changed_ids:
+        return 0
+    collection = get_mongo_collection(collection_name)
+    collection.create_index("similar.id")
+
+    # Catálogo ainda sem listas (primeira execução): cálculo completo
+    if collection.count_documents({"embedding": {"$exists": True}, "similar": {"$exists": False},
+                                   "_id": {"$nin": changed_ids}}, limit=1):
+        return compute_similar(collection_name, k, block_size)
+
+    ids, matrix = load_embeddings(collection)
+    positions = {property_id: i for i, property_id in enumerate(ids)}
+    changed = [positions[property_id] for property_id in changed_ids if property_id in positions]
+    if not changed:
+        return 0
+    changed_set = set(ids[i] for i in changed)
+
+    # Maior score de cada imóvel contra os alterados (sem contar ele mesmo)
+    best_changed = np.full(len(ids), -np.inf, dtype=np.float32)
+    for start in range(0, len(ids), block_size):
+        scores = _to_score(matrix[start:start + block_size] @ matrix[changed].T)
+        for column, position in enumerate(changed):
+            if start <= position < start + len(scores):
+                scores[position - start, column] = -np.inf
+        best_changed[start:start + len(scores)] = scores.max(axis=1)
+
+    # Imóveis afetados: citam um alterado, ou um alterado passou a superar o último vizinho da lista
+    min_scores = {doc["_id"]: doc.get("similar_min_score", 0.0)
+                  for doc in collection.find({"embedding": {"$exists": True}}, {"similar_min_score": 1})}
+    affected = {property_id for property_id, min_score in min_scores.items()
+                if property_id in positions and property_id not in changed_set
+                and best_changed[positions[property_id]] > min_score}
+    affected.update(doc["_id"] for doc in collection.find({"similar.id": {"$in": list(changed_set)}}, {"_id": 1})
+                    if doc["_id"] not in changed_set)
+
+    updates, recompute = {}, list(changed)
+    for doc in collection.find({"_id": {"$in": list(affected)}}, {"similar": 1, "similar_min_score": 1}):
+        if doc["_id"] not in positions:
+            continue
+        position = positions[doc["_id"]]
+        current = doc.get("similar", [])
+        kept = [neighbor for neighbor in current if neighbor["id"] not in changed_set]
+        scores = _to_score(matrix[changed] @ matrix[position])
+        candidates = [{"id": ids[j], "score": round(float(score), 6)}
+                      for j, score in zip(changed, scores) if j != position]
+        merged = sorted(kept + candidates, key=lambda neighbor: -neighbor["score"])[:k]
+        # Se algum alterado saiu da lista, imóveis fora dela (todos abaixo do antigo último vizinho)
+        # podem superar os alterados que ficaram abaixo desse valor ou ocupar posições vagas:
+        # nesses casos só o recálculo completo é exato
+        min_score = doc.get("similar_min_score", 0.0)
+        if len(kept) < len(current) and (len(merged) < min(k, len(ids) - 1)
+                                         or any(neighbor["score"] < min_score for neighbor in merged)):
+            recompute.append(position)
+        else:
+            updates[doc["_id"]] = _neighbor_fields(merged, k)
+
+    _write(collection, updates)
+    _compute(collection, ids, matrix, recompute, k, block_size)
+    return len(updates) + len(recompute)
+
+
+if __name__ == "__main__":
+    print(f"Listas de semelhantes calculadas para {compute_similar()} imóveis")
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# O config lê estas variáveis na importação; os testes não usam os serviços reais
+os.environ.setdefault("MONGODB_DATABASE", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from benchmarks.fakes import FakeDatabase  # noqa: E402
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """
+    FakeDatabase (benchmarks/fakes.py) no lugar do MongoDB em todos os módulos que abrem coleções
+    """
+    import config
+    import generate_listings_and_embeddings
+    import import_catalog
+    from real_estate import catalog, facets, routes, search_backends, similar
+
+    db = FakeDatabase()
+    for module in (config, catalog, facets, routes, search_backends, similar, import_catalog,
+                   generate_listings_and_embeddings):
+        monkeypatch.setattr(module, "get_mongo_collection", db.get_collection)
+    return db
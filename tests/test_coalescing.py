@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from real_estate.coalescing import AsyncSingleFlight, SingleFlight
+
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight, calls, started = SingleFlight("test"), [], threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {"value": 42}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", compute)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", compute))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"value": 42}] * 5
+    # Terminada a chamada, a chave volta a ser calculada
+    assert flight.do("key", lambda: "novo") == "novo"
+
+
+def test_single_flight_shares_the_exception_and_releases_the_key():
+    flight, started, release = SingleFlight("test"), threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait()
+        raise RuntimeError("falhou")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait()
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["falhou", "falhou"]
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_single_flight_do_many_computes_only_missing_keys():
+    flight, started, release, batches = SingleFlight("test"), threading.Event(), threading.Event(), []
+
+    def slow():
+        started.set()
+        release.wait()
+        return "a-em-curso"
+
+    leader = threading.Thread(target=lambda: flight.do("a", slow))
+    leader.start()
+    started.wait()
+
+    def compute(keys):
+        batches.append(keys)
+        return {key: key.upper() for key in keys}
+
+    results = {}
+    batch = threading.Thread(target=lambda: results.update(flight.do_many(["a", "b", "c", "b"], compute)))
+    batch.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    batch.join()
+
+    assert batches == [["b", "c"]]
+    assert results == {"a": "a-em-curso", "b": "B", "c": "C"}
+
+
+def test_async_single_flight_coalesces_do_and_do_many():
+    flight, calls = AsyncSingleFlight("test"), []
+
+    async def compute():
+        calls.append("do")
+        await asyncio.sleep(0.05)
+        return 1
+
+    async def compute_many(keys):
+        calls.append(keys)
+        await asyncio.sleep(0.05)
+        return {key: len(key) for key in keys}
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("a", compute))
+        await asyncio.sleep(0)
+        return await asyncio.gather(first, flight.do("a", compute), flight.do_many(["a", "bb", "bb"], compute_many))
+
+    assert asyncio.run(main()) == [1, 1, {"a": 1, "bb": 2}]
+    assert calls == ["do", ["bb"]]
+
+
+def test_async_single_flight_cancelled_caller_does_not_cancel_followers():
+    flight = AsyncSingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("a", compute))
+        follower = asyncio.ensure_future(flight.do("a", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "ok"
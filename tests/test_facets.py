@@ -0,0 +1,125 @@
+from collections import Counter
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from benchmarks.fakes import FakeOpenAI
+from config import EMBEDDING_DIMENSIONS
+from generate_listings_and_embeddings import process_batch, save_property_data
+from import_catalog import write_batch
+from real_estate.embeddings import NATIVE_DIMENSIONS, embedding_profile
+from real_estate.facets import COLLECTION_NAME, TOTAL_KEY, facet_keys, rebuild_facets, write_with_facets
+
+
+def property(id, city="Curitiba", bedrooms=3, amenities=("piscina",), **prices):
+    return {"id": id, "title": f"Casa {id}", "type": "Casa", "business_type": "venda", "description": "",
+            "features": {"area": 120, "bedrooms": bedrooms}, "location": {"neighborhood": "Centro", "city": city,
+                                                                         "state": "PR"},
+            "prices": prices or {"sale_price": 450000}, "amenities": list(amenities)}
+
+
+def summary(database):
+    return {doc["_id"]: doc["count"] for doc in database.get_collection(COLLECTION_NAME).documents.values()}
+
+
+def expected_summary(database):
+    """
+    Contagens recalculadas do zero a partir do `dados` gravado em cada imóvel
+    """
+    counts = Counter({TOTAL_KEY: 0})
+    for doc in database.get_collection("properties").documents.values():
+        counts.update(facet_keys(doc["dados"]))
+    return dict(counts)
+
+
+def write(collection, properties):
+    return write_with_facets(collection, [(p, {"$set": {"dados": p}}) for p in properties])
+
+
+def test_write_with_facets_counts_creates_and_moves_keys(database):
+    collection = database.get_collection("properties")
+
+    assert write(collection, [property("a"), property("b"), property("c", city="Londrina")]) == 3
+    assert summary(database) == expected_summary(database)
+    assert summary(database)["city:Curitiba"] == 2
+
+    # Regravar com outros valores soma nas chaves novas e desconta das antigas; chaves zeradas somem
+    assert write(collection, [property("c", city="Maringá", amenities=()), property("a")]) == 0
+    assert summary(database) == expected_summary(database)
+    assert "city:Londrina" not in summary(database)
+    assert summary(database)["amenities:piscina"] == 2
+    assert summary(database)[TOTAL_KEY] == 3
+    assert collection.documents["c"]["facet_keys"] == facet_keys(property("c", city="Maringá", amenities=()))
+
+
+def test_write_with_facets_retries_properties_rewritten_concurrently(database):
+    collection = database.get_collection("properties")
+    write(collection, [property("a"), property("b")])
+    original, raced = collection.bulk_write, []
+
+    def racing_bulk_write(operations, ordered=True):
+        # Outra gravação do mesmo imóvel entre a leitura das facet_keys e o bulk_write
+        if not raced:
+            raced.append(True)
+            write(collection, [property("a", city="Maringá")])
+        return original(operations, ordered=ordered)
+
+    collection.bulk_write = racing_bulk_write
+    assert write(collection, [property("a", city="Londrina"), property("b", bedrooms=4)]) == 0
+
+    assert collection.documents["a"]["dados"]["location"]["city"] == "Londrina"
+    assert summary(database) == expected_summary(database)
+    assert "city:Maringá" not in summary(database)
+    assert (summary(database)["city:Londrina"], summary(database)["city:Curitiba"]) == (1, 1)
+
+
+def test_write_with_facets_applies_successful_writes_before_raising(database):
+    collection = database.get_collection("properties")
+    write(collection, [property("a")])
+    original = collection.bulk_write
+
+    def failing_bulk_write(operations, ordered=True):
+        # A primeira gravação passa; a segunda falha com um erro que não é de chave duplicada
+        result = original(operations[:1], ordered=ordered).bulk_api_result
+        raise BulkWriteError({**result, "writeErrors": [{"index": 1, "code": 121, "errmsg": "validation"}]})
+
+    collection.bulk_write = failing_bulk_write
+    with pytest.raises(BulkWriteError):
+        write(collection, [property("a", city="Londrina"), property("b")])
+
+    assert "b" not in collection.documents
+    assert summary(database) == expected_summary(database)
+
+
+def test_rebuild_facets_replaces_the_summary(database):
+    collection = database.get_collection("properties")
+    write(collection, [property("a"), property("b", city="Londrina")])
+    database.get_collection(COLLECTION_NAME).insert_one({"_id": "city:Fantasma", "count": 7})
+    database.get_collection(COLLECTION_NAME).update_one({"_id": TOTAL_KEY}, {"$set": {"count": 40}})
+
+    assert rebuild_facets() == 2
+
+    assert summary(database) == expected_summary(database)
+    assert not database.get_collection(f"{COLLECTION_NAME}_rebuild").documents
+
+
+def test_rebuild_facets_on_an_empty_catalog_records_the_total(database):
+    assert rebuild_facets() == 0
+    assert summary(database) == {TOTAL_KEY: 0}
+
+
+def test_import_save_and_enrichment_keep_the_counts(database):
+    collection = database.get_collection("properties")
+    write_batch(collection, [property("a"), property("b"), property("c", city="Londrina")])
+    assert summary(database) == expected_summary(database)
+
+    # Só `dados` mudou (save_property_data) e depois o lote recebe anúncios e embeddings (process_batch)
+    assert save_property_data(collection, [property("b", sale_price=900000), property("a")]) == ["b"]
+    assert summary(database) == expected_summary(database)
+
+    batch = [collection.documents[id]["dados"] for id in ("a", "b", "c")]
+    client = FakeOpenAI(EMBEDDING_DIMENSIONS or NATIVE_DIMENSIONS.get(embedding_profile.model, 1536))
+    assert len(process_batch(client, batch, collection)) == 3
+
+    assert summary(database) == expected_summary(database)
+    assert not any("pending_enrichment" in doc for doc in collection.documents.values())
@@ -0,0 +1,90 @@
+import csv
+import json
+
+import pytest
+
+from import_catalog import import_catalog, map_record
+
+
+def record(**overrides):
+    flat = {"id": "x1", "type": "Casa", "business_type": "venda", "area": "120", "bedrooms": "3",
+            "neighborhood": "Centro", "city": "Curitiba", "state": "CWB", "sale_price": "500000"}
+    flat.update(overrides)
+    return flat
+
+
+@pytest.mark.parametrize("field, value", [
+    ("area", "inf"), ("bedrooms", "-inf"), ("area", "Infinity"), ("area", float("inf")),
+    ("sale_price", "nan"), ("sale_price", float("nan")), ("condo_fee", "NaN"),
+    ("area", "12abc"), ("sale_price", "1.000,00"), ("bedrooms", "três"),
+])
+def test_map_record_rejects_non_finite_and_malformed_numbers(field, value):
+    with pytest.raises(ValueError, match=field):
+        map_record(record(**{field: value}))
+
+
+def test_map_record_accepts_decimal_comma():
+    assert map_record(record(sale_price="450000,50"))["prices"]["sale_price"] == 450000.5
+
+
+def test_import_counts_bad_numbers_as_rejected_and_keeps_going(database, tmp_path):
+    path, rejects = tmp_path / "catalog.csv", tmp_path / "rejects.ndjson"
+    rows = [record(id="ok1"), record(id="inf", area="inf"), record(id="nan", sale_price="nan"),
+            record(id="bad", bedrooms="3x"), record(id="ok2")]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    totals = import_catalog(str(path), rejects=str(rejects))
+
+    assert (totals["read"], totals["rejected"], totals["upserted"]) == (5, 3, 2)
+    assert set(database.get_collection("properties").documents) == {"ok1", "ok2"}
+    assert [json.loads(line)["record"]["id"] for line in open(rejects, encoding="utf-8")] == ["inf", "nan", "bad"]
+
+
+def test_import_rejects_nan_and_infinity_json_literals(database, tmp_path):
+    path = tmp_path / "catalog.ndjson"
+    path.write_text("\n".join([
+        '{"id": "a", "type": "Casa", "business_type": "venda", "area": 90, "bedrooms": 2, "neighborhood": "Centro",'
+        ' "city": "Curitiba", "state": "CWB", "sale_price": NaN}',
+        '{"id": "b", "type": "Casa", "business_type": "venda", "area": Infinity, "bedrooms": 2, "neighborhood": "Centro",'
+        ' "city": "Curitiba", "state": "CWB", "sale_price": 100000}',
+    ]), encoding="utf-8")
+
+    totals = import_catalog(str(path))
+
+    assert (totals["read"], totals["rejected"]) == (2, 2)
+    assert not database.get_collection("properties").documents
+
+
+def test_reimport_counts_modified_and_keeps_the_facet_summary(database, tmp_path):
+    path = tmp_path / "catalog.ndjson"
+    rows = [record(id="a"), record(id="b", city="Londrina"), record(id="c")]
+    path.write_text("\n".join(json.dumps(row) for row in rows), encoding="utf-8")
+    first = import_catalog(str(path), batch_size=2)
+
+    rows[1]["city"] = "Maringá"
+    path.write_text("\n".join(json.dumps(row) for row in rows + [record(id="d")]), encoding="utf-8")
+    second = import_catalog(str(path), batch_size=2)
+
+    assert (first["upserted"], first["modified"], first["pending"]) == (3, 0, 3)
+    assert (second["upserted"], second["modified"]) == (1, 3)
+    counts = {doc["_id"]: doc["count"] for doc in database.get_collection("facet_counts").documents.values()}
+    assert counts["total:all"] == 4
+    assert counts["city:Curitiba"] == 3 and counts["city:Maringá"] == 1 and "city:Londrina" not in counts
+    properties = database.get_collection("properties").documents
+    assert all(doc["pending_enrichment"] for doc in properties.values())
+
+
+def test_import_splits_batches_on_repeated_ids(database, tmp_path):
+    path = tmp_path / "catalog.ndjson"
+    rows = [record(id="a"), record(id="a", city="Londrina"), record(id="b")]
+    path.write_text("\n".join(json.dumps(row) for row in rows), encoding="utf-8")
+
+    totals = import_catalog(str(path), writers=1)
+
+    assert (totals["upserted"], totals["modified"]) == (2, 1)
+    assert database.get_collection("properties").documents["a"]["dados"]["location"]["city"] == "Londrina"
+    counts = {doc["_id"]: doc["count"] for doc in database.get_collection("facet_counts").documents.values()}
+    assert counts["total:all"] == 2 and "city:Curitiba" in counts and counts["city:Londrina"] == 1
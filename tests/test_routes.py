@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app import app
+from config import BATCH_SEARCH_MAX_QUERIES, PROPERTIES_MAX_IDS, SEARCH_MAX_LIMIT, SIMILAR_K
+from real_estate.catalog import notify_catalog_change
+
+
+@pytest.fixture
+def client(database):
+    return app.test_client()
+
+
+@pytest.fixture
+def stored(database):
+    documents = [{
+        "_id": id,
+        "dados": {"id": id, "title": f"Casa {id}", "location": {"city": "Curitiba"}},
+        "anuncio": f"Anúncio {id}",
+        "indexed_at": datetime(2026, 1, 2, 3, 4, 5, 678000),
+        "similar": [{"id": other, "score": 0.9} for other in ("p1", "p2", "p3") if other != id]
+    } for id in ("p1", "p2", "p3")]
+    database.get_collection("properties").load(documents)
+    yield database.get_collection("properties")
+    # Os caches do worker são globais: não deixar os imóveis do teste para os próximos
+    notify_catalog_change([document["_id"] for document in documents])
+
+
+@pytest.mark.parametrize("limit", [0, -1, SEARCH_MAX_LIMIT + 1, "5", 2.5, True, None])
+def test_search_rejects_invalid_limit(client, limit):
+    response = client.post("/api/search", json={"query": "casa", "limit": limit})
+    assert response.status_code == 400
+    assert "'limit'" in response.get_json()["error"]
+
+
+def test_batch_search_reports_the_invalid_item(client):
+    response = client.post("/api/search/batch", json={"queries": ["casa", {"query": "apto", "limit": 0}]})
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("queries[1]: 'limit'")
+
+    response = client.post("/api/search/batch", json={"queries": ["casa"] * (BATCH_SEARCH_MAX_QUERIES + 1)})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("limit", ["0", str(SIMILAR_K + 1), "dez"])
+def test_similar_rejects_invalid_limit(client, stored, limit):
+    assert client.get(f"/api/property/p1/similar?limit={limit}").status_code == 400
+
+
+def test_similar_returns_the_precomputed_list(client, stored):
+    response = client.get("/api/property/p1/similar?limit=1&details=true")
+    assert response.status_code == 200
+    assert response.get_json() == {"id": "p1", "results": [{
+        "id": "p2", "score": 0.9, "dados": stored.documents["p2"]["dados"], "anuncio": "Anúncio p2"
+    }]}
+
+
+def test_properties_rejects_missing_or_too_many_ids(client):
+    assert client.get("/api/properties").status_code == 400
+    ids = ",".join(f"p{i}" for i in range(PROPERTIES_MAX_IDS + 1))
+    assert client.get(f"/api/properties?ids={ids}").status_code == 400
+
+
+def test_property_etag_and_not_modified(client, stored):
+    response = client.get("/api/property/p1")
+    assert response.status_code == 200
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.get_json()["id"] == "p1"
+
+    not_modified = client.get("/api/property/p1", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not not_modified.data
+    assert not_modified.headers["ETag"] == etag
+    assert client.get("/api/property/p1", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/api/property/p1", headers={"If-None-Match": '"outro"'}).status_code == 200
+
+
+def test_property_etag_changes_when_the_property_is_rewritten(client, stored):
+    etag = client.get("/api/property/p2").headers["ETag"]
+
+    stored.update_one({"_id": "p2"}, {"$set": {"anuncio": "Anúncio novo", "indexed_at": datetime.now(timezone.utc)}})
+    notify_catalog_change(["p2"])
+
+    response = client.get("/api/property/p2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["anuncio"] == "Anúncio novo"
+
+
+def test_unknown_property_is_404(client, stored):
+    assert client.get("/api/property/nao-existe").status_code == 404
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from real_estate import search_backends
+from real_estate.embeddings import EmbeddingProfile
+from real_estate.routes import format_search_results
+
+DIMENSIONS = 64
+# Cossenos dos imóveis com a consulta, bem separados entre si e do limiar de 0.7 (cosseno 0.4)
+COSINES = (0.95, 0.85, 0.75, 0.6, 0.5, 0.3, 0.1, -0.2)
+PROFILES = {
+    "float32": EmbeddingProfile("text-embedding-3-small", DIMENSIONS, "float32"),
+    "int8": EmbeddingProfile("text-embedding-3-small", DIMENSIONS, "int8"),
+    "int8+rescore": EmbeddingProfile("text-embedding-3-small", DIMENSIONS, "int8", rescore=True),
+}
+
+
+def unit(vector):
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(7)
+    query = unit(rng.standard_normal(DIMENSIONS))
+    documents = {}
+    for i, cosine in enumerate(COSINES):
+        noise = rng.standard_normal(DIMENSIONS)
+        noise = unit(noise - (noise @ query) * query)
+        documents[f"property_{i}"] = cosine * query + np.sqrt(1 - cosine ** 2) * noise
+    return query, documents
+
+
+def search(database, monkeypatch, name, query, documents, limit=len(COSINES)):
+    profile = PROFILES[name]
+    monkeypatch.setattr(search_backends, "embedding_profile", profile)
+    collection = database.get_collection(f"properties_{name}")
+    collection.load({"_id": property_id, "dados": {}, "anuncio": "", **profile.document_fields(vector.tolist())}
+                    for property_id, vector in documents.items())
+    return search_backends.AtlasSearchBackend(collection.name).search(query.tolist(), limit)
+
+
+@pytest.mark.parametrize("name", ["int8", "int8+rescore"])
+def test_int8_profiles_rank_and_threshold_like_float32(database, monkeypatch, vectors, name):
+    query, documents = vectors
+    expected = search(database, monkeypatch, "float32", query, documents)
+    results = search(database, monkeypatch, name, query, documents)
+
+    assert [r["_id"] for r in results] == [r["_id"] for r in expected]
+    assert [r["score"] for r in results] == pytest.approx([r["score"] for r in expected], abs=0.02)
+    assert [r["id"] for r in format_search_results(results)] == [r["id"] for r in format_search_results(expected)]
+    assert all("embedding" not in r and "embedding_full" not in r for r in results)
+
+
+def test_float32_scores_are_on_the_cosine_scale(database, monkeypatch, vectors):
+    query, documents = vectors
+    results = search(database, monkeypatch, "float32", query, documents)
+    assert [r["score"] for r in results] == pytest.approx([(1 + cosine) / 2 for cosine in COSINES], abs=1e-5)
+
+
+def test_int8_rescore_keeps_the_limit(database, monkeypatch, vectors):
+    query, documents = vectors
+    results = search(database, monkeypatch, "int8+rescore", query, documents, limit=3)
+    assert [r["_id"] for r in results] == ["property_0", "property_1", "property_2"]
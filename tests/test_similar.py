@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from benchmarks.fakes import FakeDatabase
+from real_estate import similar
+from real_estate.embeddings import embedding_profile
+from real_estate.similar import compute_similar, top_k_neighbors, update_similar
+
+K = 5
+
+
+def unit_vectors(rng, count):
+    vectors = rng.standard_normal((count, embedding_profile.dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def documents(ids, vectors):
+    return [{"_id": id, **embedding_profile.document_fields(vector.tolist())} for id, vector in zip(ids, vectors)]
+
+
+def neighbor_lists(collection):
+    return {id: [(neighbor["id"], neighbor["score"]) for neighbor in doc["similar"]]
+            for id, doc in collection.documents.items()}
+
+
+def test_top_k_neighbors_matches_brute_force_across_blocks():
+    matrix = unit_vectors(np.random.default_rng(1), 50)
+    positions, dots = top_k_neighbors(matrix, matrix, K, np.arange(50), block_size=7)
+
+    scores = matrix @ matrix.T
+    np.fill_diagonal(scores, -np.inf)
+    assert (positions == np.argsort(-scores, axis=1)[:, :K]).all()
+    assert np.allclose(dots, np.sort(scores, axis=1)[:, ::-1][:, :K], atol=1e-5)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_update_similar_matches_a_full_recompute(database, monkeypatch, seed):
+    rng = np.random.default_rng(seed)
+    ids = [f"p{i}" for i in range(40)]
+    vectors = unit_vectors(rng, len(ids))
+    collection = database.get_collection("properties")
+    collection.load(documents(ids, vectors))
+    compute_similar(k=K, block_size=16)
+
+    # Alguns imóveis mudam de embedding (saem das listas em que estavam) e outros são novos
+    changed = [ids[i] for i in rng.choice(len(ids), 6, replace=False)] + ["n1", "n2"]
+    for document in documents(changed, unit_vectors(rng, len(changed))):
+        collection.update_one({"_id": document["_id"]}, {"$set": document}, upsert=True)
+    assert update_similar(changed, k=K, block_size=16) >= len(changed)
+
+    reference = FakeDatabase()
+    reference.get_collection("properties").load(
+        {key: value for key, value in doc.items() if not key.startswith("similar")}
+        for doc in collection.documents.values()
+    )
+    with monkeypatch.context() as patch:
+        patch.setattr(similar, "get_mongo_collection", reference.get_collection)
+        compute_similar(k=K, block_size=16)
+
+    expected = neighbor_lists(reference.get_collection("properties"))
+    assert {id: [neighbor for neighbor, _ in lists] for id, lists in neighbor_lists(collection).items()} == \
+        {id: [neighbor for neighbor, _ in lists] for id, lists in expected.items()}
+    for id, lists in neighbor_lists(collection).items():
+        assert [score for _, score in lists] == pytest.approx([score for _, score in expected[id]], abs=1e-5)